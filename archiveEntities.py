@@ -0,0 +1,67 @@
+"""_summary_ command to archive the entities of delivered sale orders
+    move the sale_order_item_entity links of orders delivered before the
+    retention and their sold purchase_item_entity rows to the archive
+    tables, an interrupted run is resumed from its cursor on the next call
+
+    python archiveEntities.py [--retention-days 90] [--batch-size 500]
+                              [--throttle-ms 100] [--interval 0]
+"""
+
+import argparse
+import asyncio
+
+import settings
+from services.archival import EntityArchivalService
+from tortoise import Tortoise, run_async
+
+
+async def main(
+    retention_days: int, batch_size: int, throttle_ms: int, interval: int
+):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    handler = EntityArchivalService(
+        retention_days=retention_days,
+        batch_size=batch_size,
+        throttle_ms=throttle_ms,
+    )
+    while True:
+        res = await handler.run()
+        if res:
+            print(
+                f"archived {res.moved_rows} rows, "
+                f"{res.rows_per_second:.0f} rows/s"
+            )
+        if not interval:
+            break
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--retention-days", type=int, default=settings.ARCHIVE_RETENTION_DAYS
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--throttle-ms",
+        type=int,
+        default=settings.ARCHIVE_THROTTLE_MS,
+        help="pause between batches",
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=0,
+        help="seconds between runs, run once when 0",
+    )
+    args = parser.parse_args()
+    run_async(
+        main(
+            args.retention_days,
+            args.batch_size,
+            args.throttle_ms,
+            args.interval,
+        )
+    )
@@ -0,0 +1,164 @@
+"""_summary_ command to measure the cancel throughput of
+    BulkTransitionSaleOrders: for each of --batch-sizes, --orders one-unit
+    sale orders are bought, created and confirmed by auto-fill, then all
+    cancelled, batch_size orders per transaction. the orders per second and
+    the entities released are reported, a batch size of 1 is the cost of
+    cancelling the orders one by one
+    the purchases and orders stay in DATABASE_URI: run it against a
+    scratch database
+
+    python benchmarkCancelOrders.py [--orders 10000]
+                                    [--batch-sizes 1,100,1000]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import settings
+from models import SaleOrderStatusType
+from services.purchase import CreatePurchaseItemReq, CreatePurchaseService
+from services.sale_order import (
+    AutoFillSaleOrdersReq,
+    BulkAutoFillSaleOrders,
+    BulkTransitionSaleOrders,
+    CreateSaleOrderReq,
+    CreateSaleOrdersReq,
+    CreateSaleOrdersService,
+    SaleItemReq,
+    TransitionSaleOrdersReq,
+)
+from services.sharding import sharded_transaction
+from tortoise import Tortoise
+
+_CREATE_BATCH_SIZE = 1000
+
+
+async def _buy(product_id: uuid.UUID, quantity: int):
+    handler = CreatePurchaseService(
+        purchase_id=None,
+        purchase_items=[
+            CreatePurchaseItemReq(
+                product_id=product_id,
+                sku="default",
+                quantity=quantity,
+                price=1,
+            )
+        ],
+    )
+    async with sharded_transaction():
+        purchase = await handler.create_purchase()
+        purchase_items = await handler.create_purchase_items(purchase)
+        await handler.create_stock_transaction(purchase, purchase_items)
+        await handler.create_purchase_item_entities(purchase, purchase_items)
+
+
+async def confirmed_orders(count: int) -> list:
+    """one-unit orders of a new product, all confirmed by auto-fill"""
+    product_id = uuid.uuid4()
+    await _buy(product_id, count)
+
+    sale_ids = []
+    for i in range(0, count, _CREATE_BATCH_SIZE):
+        handler = CreateSaleOrdersService(
+            data=CreateSaleOrdersReq(
+                orders=[
+                    CreateSaleOrderReq(
+                        sale_items=[
+                            SaleItemReq(
+                                product_id=product_id,
+                                sku="default",
+                                quantity=1,
+                                price=1,
+                            )
+                        ]
+                    )
+                    for _ in range(min(_CREATE_BATCH_SIZE, count - i))
+                ]
+            )
+        )
+        res = await handler.create_reserved()
+        sale_ids.extend(ele.id for ele in res.results if not ele.error)
+
+    for i in range(0, len(sale_ids), settings.AUTO_FILL_BATCH_LIMIT):
+        handler = BulkAutoFillSaleOrders(
+            data=AutoFillSaleOrdersReq(
+                sale_ids=sale_ids[i : i + settings.AUTO_FILL_BATCH_LIMIT]
+            )
+        )
+        async with sharded_transaction():
+            await handler.auto_fill()
+    return sale_ids
+
+
+async def measure(batch_size: int, args) -> dict:
+    started = time.perf_counter()
+    sale_ids = await confirmed_orders(args.orders)
+    setup_seconds = time.perf_counter() - started
+
+    handler = BulkTransitionSaleOrders(
+        data=TransitionSaleOrdersReq(
+            sale_ids=sale_ids, status=SaleOrderStatusType.CANCELLED
+        ),
+        batch_size=batch_size,
+    )
+    started = time.perf_counter()
+    res = await handler.transition()
+    cancel_seconds = time.perf_counter() - started
+
+    return {
+        "batch_size": batch_size,
+        "setup_seconds": setup_seconds,
+        "cancelled": len(res.transitioned_ids),
+        "skipped": len(res.skipped_ids),
+        "released": res.released_entities,
+        "cancel_seconds": cancel_seconds,
+        "orders_per_second": len(res.transitioned_ids) / cancel_seconds,
+    }
+
+
+async def run_command(args):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    try:
+        results = [
+            await measure(int(ele), args)
+            for ele in args.batch_sizes.split(",")
+        ]
+    finally:
+        await Tortoise.close_connections()
+
+    print(
+        "%-6s %9s %9s %8s %9s %9s %10s"
+        % (
+            "batch",
+            "setup s",
+            "cancelled",
+            "skipped",
+            "released",
+            "cancel s",
+            "orders/s",
+        )
+    )
+    for result in results:
+        print(
+            "%-6d %9.1f %9d %8d %9d %9.2f %10.0f"
+            % (
+                result["batch_size"],
+                result["setup_seconds"],
+                result["cancelled"],
+                result["skipped"],
+                result["released"],
+                result["cancel_seconds"],
+                result["orders_per_second"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the cancel throughput of the sale orders"
+    )
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--batch-sizes", default="1,100,1000")
+    asyncio.run(run_command(parser.parse_args()))
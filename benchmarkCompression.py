@@ -0,0 +1,144 @@
+"""_summary_ command to measure the CPU cost of compressing the responses
+    against the bytes saved, to choose GRPC_COMPRESSION_MIN_SIZE,
+    HTTP_GZIP_MIN_SIZE and HTTP_GZIP_LEVEL
+    the payloads are built like the real ones, no database is needed:
+    - grpc-sale-orders: a GetSaleOrdersRes page
+    - grpc-sale-order: a CreateSaleOrder echo with its items
+    - http-purchase-items: a /purchases/{id}/items/ body
+
+    python benchmarkCompression.py [--sizes 1 10 100 1000]
+                                   [--levels 1 6 9] [--repeat 20]
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+from generated import inventory_pb2
+from google.protobuf.timestamp_pb2 import Timestamp
+
+
+def _timestamp() -> Timestamp:
+    timestamp = Timestamp()
+    timestamp.FromDatetime(datetime.now(timezone.utc))
+    return timestamp
+
+
+def _product_ids(size: int) -> list:
+    # a catalog smaller than the payload, like real orders
+    return [
+        str(uuid.UUID(int=random.getrandbits(128)))
+        for _ in range(max(1, size // 10))
+    ]
+
+
+def grpc_sale_orders(size: int) -> bytes:
+    return inventory_pb2.GetSaleOrdersRes(
+        results=[
+            inventory_pb2.SaleOrderSummary(
+                id=i,
+                status=random.choice(["draft", "confirmed", "shipped"]),
+                total_price=random.randint(100, 10**6),
+                total_units=random.randint(1, 100),
+                created=_timestamp(),
+                modified=_timestamp(),
+            )
+            for i in range(size)
+        ],
+        total=size * 10,
+    ).SerializeToString()
+
+
+def grpc_sale_order(size: int) -> bytes:
+    product_ids = _product_ids(size)
+    return inventory_pb2.SaleOrderRes(
+        id=1,
+        status="draft",
+        location="default",
+        created=_timestamp(),
+        modified=_timestamp(),
+        total_price=random.randint(100, 10**6),
+        total_units=size,
+        items=[
+            inventory_pb2.SaleOrderItem(
+                product_id=random.choice(product_ids),
+                sku=f"SKU-{random.randint(0, size)}",
+                quantity=random.randint(1, 10),
+                price=random.randint(100, 10**4),
+            )
+            for _ in range(size)
+        ],
+    ).SerializeToString()
+
+
+def http_purchase_items(size: int) -> bytes:
+    product_ids = _product_ids(size)
+    now = datetime.now(timezone.utc).isoformat()
+    return json.dumps(
+        [
+            {
+                "product_id": random.choice(product_ids),
+                "sku": f"SKU-{random.randint(0, size)}",
+                "quantity": random.randint(1, 100),
+                "price": random.randint(100, 10**4),
+                "unique_identifier": None,
+                "id": str(uuid.uuid4()),
+                "created": now,
+                "modified": now,
+            }
+            for _ in range(size)
+        ],
+        separators=(",", ":"),
+    ).encode()
+
+
+PAYLOADS = {
+    "grpc-sale-orders": grpc_sale_orders,
+    "grpc-sale-order": grpc_sale_order,
+    "http-purchase-items": http_purchase_items,
+}
+
+
+def measure(body: bytes, level: int, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        # gzip framing as sent by both servers
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        compressed = compressor.compress(body) + compressor.flush()
+    elapsed_us = (time.perf_counter() - start) / repeat * 1e6
+    return len(compressed), elapsed_us
+
+
+def main(args: argparse.Namespace):
+    random.seed(0)
+    print(
+        f"{'payload':<20} {'rows':>6} {'level':>5} {'bytes':>9} "
+        f"{'gzip':>9} {'saved':>6} {'us':>9} {'MB/s':>7} {'B saved/us':>10}"
+    )
+    for name, build in PAYLOADS.items():
+        for size in args.sizes:
+            body = build(size)
+            for level in args.levels:
+                compressed, elapsed_us = measure(body, level, args.repeat)
+                saved = len(body) - compressed
+                print(
+                    f"{name:<20} {size:>6} {level:>5} {len(body):>9} "
+                    f"{compressed:>9} {saved / len(body):>6.0%} "
+                    f"{elapsed_us:>9.1f} "
+                    f"{len(body) / elapsed_us:>7.1f} "
+                    f"{saved / elapsed_us:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000]
+    )
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
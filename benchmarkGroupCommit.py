@@ -0,0 +1,179 @@
+"""_summary_ command to measure the group commit of CreateSaleOrder: the
+    same concurrent single-order load is committed one transaction per
+    order, as with GROUP_COMMIT_ENABLED unset, then through a
+    SaleOrderGroupCommitter, and the orders and commits per second are
+    compared
+    the orders sell one product stocked by an ADJUSTMENT ledger row at the
+    start, they stay in DATABASE_URI: run it against a scratch database
+
+    python benchmarkGroupCommit.py [--concurrency 50] [--seconds 10]
+                                   [--items 2] [--max-delay-ms 5]
+                                   [--max-batch-size 100]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import List
+
+import settings
+from models import TransactionType
+from services.sale_order import (
+    CreateSaleOrderReq,
+    CreateSaleOrderService,
+    SaleItemReq,
+    SaleOrderGroupCommitter,
+)
+from services.sharding import shard_connection, shard_of, sharded_transaction
+from services.stock_counter import get_stock_counter
+from services.utils import uuid7
+from tortoise import Tortoise
+
+_STOCK_UNITS = 1_000_000_000
+
+
+class _CountingCommitter(SaleOrderGroupCommitter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commits = 0
+
+    async def commit(self, batch: List[tuple]):
+        self.commits += 1
+        await super().commit(batch)
+
+
+async def _add_stock(product_id: uuid.UUID, sku: str):
+    async with sharded_transaction():
+        conn = await shard_connection(shard_of(product_id))
+        await conn.execute_query(
+            """
+            INSERT INTO inventory_transaction (
+                id, location, product_id, sku, quantity, transaction_type
+            )
+            VALUES ($1, $2, $3, $4, $5, $6)
+            """,
+            [
+                uuid7(),
+                settings.DEFAULT_LOCATION,
+                product_id,
+                sku,
+                _STOCK_UNITS,
+                TransactionType.ADJUSTMENT.value,
+            ],
+        )
+        await get_stock_counter().publish(
+            {(str(product_id), sku): _STOCK_UNITS}
+        )
+
+
+async def measure(mode: str, args, product_id: uuid.UUID) -> dict:
+    committer = _CountingCommitter(
+        max_delay_ms=args.max_delay_ms, max_batch_size=args.max_batch_size
+    )
+    latencies: List[float] = []
+    commits = 0
+    deadline = time.monotonic() + args.seconds
+
+    def _request() -> CreateSaleOrderReq:
+        return CreateSaleOrderReq(
+            sale_items=[
+                SaleItemReq(
+                    product_id=product_id, sku=f"sku-{i}", quantity=1, price=1
+                )
+                for i in range(args.items)
+            ]
+        )
+
+    async def _worker():
+        nonlocal commits
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            if mode == "batched":
+                await committer.submit(_request())
+            else:
+                async with sharded_transaction():
+                    await CreateSaleOrderService(data=_request()).create()
+                commits += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    if committer.worker:
+        committer.worker.cancel()
+    if mode == "batched":
+        commits = committer.commits
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "orders": len(latencies),
+        "commits": commits,
+        "orders_per_second": len(latencies) / elapsed,
+        "commits_per_second": commits / elapsed,
+        "orders_per_commit": len(latencies) / commits if commits else 0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+async def run_command(args):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    try:
+        product_id = uuid.uuid4()
+        for i in range(args.items):
+            await _add_stock(product_id, f"sku-{i}")
+        results = [
+            await measure(mode, args, product_id)
+            for mode in ("unbatched", "batched")
+        ]
+    finally:
+        await Tortoise.close_connections()
+
+    print(
+        "%-10s %8s %8s %10s %10s %10s %8s %8s"
+        % (
+            "mode",
+            "orders",
+            "commits",
+            "orders/s",
+            "commits/s",
+            "per commit",
+            "p50 ms",
+            "p99 ms",
+        )
+    )
+    for result in results:
+        print(
+            "%-10s %8d %8d %10.0f %10.0f %10.1f %8.1f %8.1f"
+            % (
+                result["mode"],
+                result["orders"],
+                result["commits"],
+                result["orders_per_second"],
+                result["commits_per_second"],
+                result["orders_per_commit"],
+                result["p50_ms"],
+                result["p99_ms"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare CreateSaleOrder with and without group commit"
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--items", type=int, default=2)
+    parser.add_argument(
+        "--max-delay-ms", type=int, default=settings.GROUP_COMMIT_MAX_DELAY_MS
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=settings.GROUP_COMMIT_MAX_BATCH_SIZE,
+    )
+    asyncio.run(run_command(parser.parse_args()))
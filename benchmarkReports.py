@@ -0,0 +1,165 @@
+"""_summary_ command to measure the sales reports on a large ledger
+    - synthetic: --rows sale transactions over --skus SKUs and --days days
+      are generated in memory, then the vectorized units-sold and velocity
+      reports are timed against a loop accumulating the same rows one by
+      one (on a sample of --loop-rows, extrapolated), no database needed
+    - --from-db: the window [--start, --end) of DATABASE_URI is loaded
+      with COPY and reported, the load and the computation timed apart
+
+    python benchmarkReports.py [--rows 10000000] [--skus 50000] [--days 90]
+                               [--loop-rows 1000000]
+    python benchmarkReports.py --from-db [--start 2026-07-01]
+                               [--end 2026-10-01]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import settings
+from services.report import (
+    ReportPeriodType,
+    SalesReportService,
+    units_sold_frame,
+    velocity_frame,
+)
+from tortoise import Tortoise
+
+
+def _synthetic_sales(rows: int, skus: int, days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    product_ids = [str(uuid.UUID(int=i + 1)) for i in range(skus)]
+    # a few SKUs sell most, like a real catalog
+    codes = np.minimum(rng.zipf(1.3, rows) - 1, skus - 1).astype(np.int32)
+    return pd.DataFrame(
+        {
+            "product_id": pd.Categorical.from_codes(codes, product_ids),
+            "sku": pd.Categorical.from_codes(
+                np.zeros(rows, dtype=np.int8), ["default"]
+            ),
+            "day": rng.integers(0, days, rows, dtype=np.int32),
+            "units": rng.integers(1, 4, rows, dtype=np.int64),
+        }
+    )
+
+
+def _loop_units_sold(sales: pd.DataFrame) -> dict:
+    # what a per-row aggregation does, without any database round trip
+    totals: dict = {}
+    for product_id, sku, day, units in zip(
+        sales["product_id"].astype(str),
+        sales["sku"].astype(str),
+        sales["day"].tolist(),
+        sales["units"].tolist(),
+    ):
+        key = (product_id, sku, day)
+        totals[key] = totals.get(key, 0) + units
+    return totals
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - started
+
+
+def run_synthetic(args):
+    sales, elapsed = _timed(_synthetic_sales, args.rows, args.skus, args.days)
+    print(f"generated {len(sales)} rows in {elapsed:.2f}s")
+    start = date(2026, 1, 1)
+    on_hand = pd.DataFrame(
+        {
+            "product_id": sales["product_id"].cat.categories.astype(str),
+            "sku": "default",
+            "on_hand": np.int64(100),
+        }
+    )
+    revenue = sales.rename(columns={"units": "revenue"})[
+        ["product_id", "sku", "revenue"]
+    ]
+    for period in ReportPeriodType:
+        frame, elapsed = _timed(
+            units_sold_frame,
+            sales,
+            start,
+            args.days,
+            period,
+            SalesReportService.default_rolling(period),
+        )
+        print(
+            f"units-sold {period.value}: {len(frame)} rows in "
+            f"{elapsed:.2f}s, {len(sales) / elapsed:,.0f} ledger rows/s"
+        )
+    frame, elapsed = _timed(velocity_frame, sales, revenue, on_hand, args.days)
+    print(
+        f"velocity: {len(frame)} rows in {elapsed:.2f}s, "
+        f"{len(sales) / elapsed:,.0f} ledger rows/s"
+    )
+    sample = sales.iloc[: args.loop_rows]
+    _, elapsed = _timed(_loop_units_sold, sample)
+    print(
+        f"row loop: {len(sample) / elapsed:,.0f} ledger rows/s, "
+        f"~{elapsed * len(sales) / len(sample):.1f}s for {len(sales)} rows"
+    )
+
+
+async def run_from_db(args):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    try:
+        handler = SalesReportService(start=args.start, end=args.end)
+        started = time.perf_counter()
+        sales = await handler.load_sales()
+        loaded = time.perf_counter() - started
+        print(
+            f"loaded {len(sales)} ledger rows in {loaded:.2f}s, "
+            f"{sales.memory_usage(deep=True).sum() / 2**20:.0f} MiB"
+        )
+        for period in ReportPeriodType:
+            frame, elapsed = _timed(
+                units_sold_frame,
+                sales,
+                handler.start,
+                handler.days,
+                period,
+                handler.default_rolling(period),
+            )
+            print(
+                f"units-sold {period.value}: {len(frame)} rows in "
+                f"{elapsed:.2f}s"
+            )
+        started = time.perf_counter()
+        frame = await handler.velocity()
+        print(
+            f"velocity with its loads: {len(frame)} rows in "
+            f"{time.perf_counter() - started:.2f}s"
+        )
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the sales reports on a large ledger"
+    )
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--skus", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--loop-rows", type=int, default=1_000_000)
+    parser.add_argument("--from-db", action="store_true")
+    parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        default=date.today() - timedelta(90),
+    )
+    parser.add_argument(
+        "--end", type=date.fromisoformat, default=date.today() + timedelta(1)
+    )
+    args = parser.parse_args()
+    if args.from_db:
+        asyncio.run(run_from_db(args))
+    else:
+        run_synthetic(args)
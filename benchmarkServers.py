@@ -0,0 +1,199 @@
+"""_summary_ command to compare the two-process layout (server_grpc.py and
+    uvicorn server_fastapi:app) against server_combined.py: the resident
+    memory of the processes and the database connections they hold, idle
+    and under a concurrent gRPC GetQuantity + HTTP GET /purchases/ load
+    the servers are started on the given ports against DATABASE_URI and
+    stopped at the end, Linux only (/proc)
+
+    python benchmarkServers.py [--grpc-port 50071] [--http-port 8071]
+                               [--concurrency 20] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from typing import Dict, List
+
+import grpc
+import settings
+from generated import inventory_pb2, inventory_pb2_grpc
+from tortoise import Tortoise
+
+
+def _rss_kb(pid: int) -> int:
+    with open("/proc/%s/status" % pid) as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def _connections() -> int:
+    # excluding the benchmark's own connection
+    _, rows = await Tortoise.get_connection(
+        settings.TORTOISE_DEFAULT_CONN_NAME
+    ).execute_query(
+        "SELECT count(*) AS count FROM pg_stat_activity"
+        " WHERE datname = current_database() AND pid <> pg_backend_pid()"
+    )
+    return rows[0]["count"]
+
+
+def _start(
+    layout: str, grpc_port: str, http_port: str
+) -> List[subprocess.Popen]:
+    env = dict(os.environ, GRPC_PORT=grpc_port, HTTP_PORT=http_port)
+    if layout == "combined":
+        commands = [[sys.executable, "server_combined.py"]]
+    else:
+        commands = [
+            [sys.executable, "server_grpc.py"],
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "server_fastapi:app",
+                "--port",
+                http_port,
+            ],
+        ]
+    return [
+        subprocess.Popen(
+            command,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for command in commands
+    ]
+
+
+async def _wait_ready(http_port: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await asyncio.to_thread(
+                urllib.request.urlopen,
+                "http://localhost:%s/ready" % http_port,
+            )
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError("servers not ready in %ss" % timeout)
+
+
+async def _load(
+    grpc_port: str, http_port: str, concurrency: int, seconds: float
+) -> Dict[str, int]:
+    counts = {"grpc": 0, "http": 0}
+    deadline = time.monotonic() + seconds
+
+    # an unknown product still runs the quantity query
+    request = inventory_pb2.GetQuantityReq(product_id=str(uuid.uuid4()))
+
+    async def _grpc_worker(stub):
+        while time.monotonic() < deadline:
+            await stub.GetQuantity(request)
+            counts["grpc"] += 1
+
+    def _http_get():
+        urllib.request.urlopen(
+            "http://localhost:%s/purchases/" % http_port
+        ).read()
+
+    async def _http_worker():
+        while time.monotonic() < deadline:
+            await asyncio.to_thread(_http_get)
+            counts["http"] += 1
+
+    async with grpc.aio.insecure_channel(
+        "localhost:%s" % grpc_port
+    ) as channel:
+        stub = inventory_pb2_grpc.InventoryServiceStub(channel)
+        await asyncio.gather(
+            *[_grpc_worker(stub) for _ in range(concurrency)],
+            *[_http_worker() for _ in range(concurrency)],
+        )
+    return counts
+
+
+async def measure(layout: str, args) -> dict:
+    processes = _start(layout, args.grpc_port, args.http_port)
+    try:
+        await _wait_ready(args.http_port)
+        idle_rss = sum(_rss_kb(p.pid) for p in processes)
+        idle_connections = await _connections()
+        # sampled at the end of the load, the pools have grown by then
+        counts = await _load(
+            args.grpc_port, args.http_port, args.concurrency, args.seconds
+        )
+        return {
+            "layout": layout,
+            "processes": len(processes),
+            "idle_rss_mb": idle_rss / 1024,
+            "load_rss_mb": sum(_rss_kb(p.pid) for p in processes) / 1024,
+            "idle_connections": idle_connections,
+            "load_connections": await _connections(),
+            "grpc_rps": counts["grpc"] / args.seconds,
+            "http_rps": counts["http"] / args.seconds,
+        }
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+
+
+async def run_command(args):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    try:
+        results = [
+            await measure(layout, args) for layout in ("separate", "combined")
+        ]
+    finally:
+        await Tortoise.close_connections()
+
+    print(
+        "%-10s %5s %12s %12s %9s %9s %9s %9s"
+        % (
+            "layout",
+            "procs",
+            "idle rss MB",
+            "load rss MB",
+            "idle conn",
+            "load conn",
+            "grpc rps",
+            "http rps",
+        )
+    )
+    for result in results:
+        print(
+            "%-10s %5d %12.1f %12.1f %9d %9d %9.0f %9.0f"
+            % (
+                result["layout"],
+                result["processes"],
+                result["idle_rss_mb"],
+                result["load_rss_mb"],
+                result["idle_connections"],
+                result["load_connections"],
+                result["grpc_rps"],
+                result["http_rps"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the separate and the combined servers"
+    )
+    parser.add_argument("--grpc-port", default="50071")
+    parser.add_argument("--http-port", default="8071")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    asyncio.run(run_command(parser.parse_args()))
@@ -0,0 +1,136 @@
+"""_summary_ command to compare random UUIDv4 and time-ordered UUIDv7
+    primary keys: --rows keys of each kind are generated in Python and
+    inserted --batch-size at a time into a scratch table with a uuid
+    primary key, the way the services insert the entity and ledger rows.
+    the key generation and the inserts are timed apart, the insert rate of
+    the last batches and the size of the table and of its primary key
+    index are reported. the tables are dropped at the end unless --keep
+
+    python benchmarkUuidKeys.py [--rows 10000000] [--batch-size 10000]
+                                [--keep]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import settings
+from services.utils import uuid7_batch
+from tortoise import Tortoise
+
+_TABLE = "benchmark_uuid_%s"
+
+
+def _uuid4_batch(count: int):
+    return [uuid.uuid4() for _ in range(count)]
+
+
+async def measure(version: str, generate, args) -> dict:
+    conn = Tortoise.get_connection(settings.TORTOISE_DEFAULT_CONN_NAME)
+    table = _TABLE % version
+    await conn.execute_script(
+        """
+        DROP TABLE IF EXISTS {table};
+        CREATE TABLE {table} (
+            id UUID NOT NULL PRIMARY KEY,
+            quantity INT NOT NULL
+        );
+        """.format(
+            table=table
+        )
+    )
+
+    generate_seconds = insert_seconds = tail_seconds = 0.0
+    tail_rows = 0
+    # the last tenth shows the insert rate once the index is large
+    tail_from = args.rows - args.rows // 10
+    inserted = 0
+    while inserted < args.rows:
+        count = min(args.batch_size, args.rows - inserted)
+        started = time.perf_counter()
+        ids = generate(count)
+        generate_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        await conn.execute_query(
+            "INSERT INTO %s (id, quantity) SELECT unnest($1::uuid[]), 1"
+            % table,
+            [ids],
+        )
+        elapsed = time.perf_counter() - started
+        insert_seconds += elapsed
+        if inserted >= tail_from:
+            tail_seconds += elapsed
+            tail_rows += count
+        inserted += count
+
+    _, rows = await conn.execute_query(
+        """
+        SELECT pg_relation_size($1::regclass) AS table_bytes,
+               pg_relation_size($2::regclass) AS index_bytes
+        """,
+        [table, "%s_pkey" % table],
+    )
+    if not args.keep:
+        await conn.execute_script("DROP TABLE %s" % table)
+
+    return {
+        "version": version,
+        "generate_seconds": generate_seconds,
+        "insert_seconds": insert_seconds,
+        "rows_per_second": args.rows / insert_seconds,
+        "tail_rows_per_second": tail_rows / tail_seconds
+        if tail_seconds
+        else 0,
+        "table_mb": rows[0]["table_bytes"] / 2**20,
+        "index_mb": rows[0]["index_bytes"] / 2**20,
+    }
+
+
+async def run_command(args):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    try:
+        results = [
+            await measure("v4", _uuid4_batch, args),
+            await measure("v7", uuid7_batch, args),
+        ]
+    finally:
+        await Tortoise.close_connections()
+
+    print("%d rows, batches of %d" % (args.rows, args.batch_size))
+    print(
+        "%-4s %10s %10s %10s %12s %10s %10s"
+        % (
+            "key",
+            "gen s",
+            "insert s",
+            "rows/s",
+            "last 10%/s",
+            "table MB",
+            "index MB",
+        )
+    )
+    for result in results:
+        print(
+            "%-4s %10.1f %10.1f %10.0f %12.0f %10.1f %10.1f"
+            % (
+                result["version"],
+                result["generate_seconds"],
+                result["insert_seconds"],
+                result["rows_per_second"],
+                result["tail_rows_per_second"],
+                result["table_mb"],
+                result["index_mb"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare UUIDv4 and UUIDv7 primary key inserts"
+    )
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--keep", action="store_true")
+    asyncio.run(run_command(parser.parse_args()))
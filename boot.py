@@ -0,0 +1,8 @@
+"""
+the start time of the process, the server entry points import this module
+before anything else so the startup time they report counts the imports
+"""
+
+import time
+
+STARTED = time.perf_counter()
@@ -0,0 +1,52 @@
+"""_summary_ command to compact the inventory ledger
+    roll inventory_transaction rows older than the retention into
+    inventory_checkpoint and move them to inventory_transaction_archive
+    an interrupted run is resumed from its cursor on the next call,
+    every stock shard is compacted in turn
+
+    python compactLedger.py [--retention-days 30] [--batch-size 500]
+                            [--interval 0]
+"""
+
+import argparse
+import asyncio
+
+import settings
+from services.compaction import LedgerCompactionService
+from tortoise import Tortoise, run_async
+
+
+async def main(retention_days: int, batch_size: int, interval: int):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    handlers = [
+        LedgerCompactionService(
+            retention_days=retention_days,
+            batch_size=batch_size,
+            conn_name=conn_name,
+        )
+        for conn_name in settings.STOCK_SHARD_CONN_NAMES
+    ]
+    while True:
+        for handler in handlers:
+            await handler.run()
+        if not interval:
+            break
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--retention-days", type=int, default=settings.LEDGER_RETENTION_DAYS
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.LEDGER_COMPACTION_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=0,
+        help="seconds between runs, run once when 0",
+    )
+    args = parser.parse_args()
+    run_async(main(args.retention_days, args.batch_size, args.interval))
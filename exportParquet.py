@@ -0,0 +1,71 @@
+"""_summary_ command to export the new ledger and order item rows to
+    Parquet files partitioned by day, under --export-dir/<source>/day=...
+    every source continues from its high-water mark, an interrupted run
+    writes its last batch again on the next call, the rows of transactions
+    still open wait for the next run
+
+    python exportParquet.py [--sources inventory_transaction ...]
+                            [--export-dir exports] [--batch-size 10000]
+                            [--interval 0]
+
+    read back with pyarrow.dataset.dataset(path, partitioning="hive")
+"""
+
+import argparse
+import asyncio
+
+import settings
+from services.export import EXPORT_SOURCES, ParquetExportService
+from tortoise import Tortoise, run_async
+
+
+async def main(
+    sources: list,
+    export_dir: str,
+    batch_size: int,
+    interval: int,
+):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    handler = ParquetExportService(
+        export_dir=export_dir, batch_size=batch_size
+    )
+    while True:
+        for res in await handler.run(sources):
+            print(
+                f"{res.source} from {res.conn_name}: "
+                f"{res.exported_rows} rows in {res.files} files, "
+                f"{res.rows_per_second:.0f} rows/s, "
+                f"up to {res.last_created}"
+            )
+        if not interval:
+            break
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        choices=list(EXPORT_SOURCES),
+        default=list(EXPORT_SOURCES),
+    )
+    parser.add_argument("--export-dir", default=settings.EXPORT_DIR)
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=0,
+        help="seconds between runs, run once when 0",
+    )
+    args = parser.parse_args()
+    run_async(
+        main(
+            args.sources,
+            args.export_dir,
+            args.batch_size,
+            args.interval,
+        )
+    )
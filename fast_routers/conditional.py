@@ -0,0 +1,78 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Union
+
+from fastapi import Request, Response, status
+from services.utils import ListVersion
+from settings import VERSION
+
+
+def make_etag(*parts) -> str:
+    """
+    weak ETag of the parts, the build version included so a deploy
+    changing the body invalidates the cached ones
+    """
+    digest = hashlib.sha1(
+        "|".join(str(ele) for ele in (VERSION, *parts)).encode()
+    ).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def list_etag(version: ListVersion, *parts) -> str:
+    return make_etag(version.total, version.last_modified, *parts)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        ele.strip().removeprefix("W/") == opaque_tag
+        for ele in if_none_match.split(",")
+    )
+
+
+def _not_modified_since(
+    if_modified_since: str, last_modified: datetime
+) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified has a precision of one second
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Union[datetime, None] = None,
+    cache_control: str = "no-cache",
+) -> Union[Response, None]:
+    """
+    set the validators on response, return a 304 response when the
+    validators of the request still match, None when the body is needed.
+    the version must be read before the body, so a body is never older
+    than its ETag
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(
+            last_modified.astimezone(timezone.utc), usegmt=True
+        )
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    elif if_modified_since is not None and last_modified:
+        not_modified = _not_modified_since(if_modified_since, last_modified)
+    else:
+        not_modified = False
+    if not not_modified:
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, List
+
+from fastapi.responses import StreamingResponse
+from services.logger import logger
+
+
+class ExportFormatType(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+_MEDIA_TYPES = {
+    ExportFormatType.CSV: "text/csv",
+    ExportFormatType.NDJSON: "application/x-ndjson",
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _encode_csv(rows: List[dict], columns: List[str]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_value(row[name]) for name in columns] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows: List[dict], columns: List[str]) -> bytes:
+    return "".join(
+        json.dumps({name: _value(row[name]) for name in columns}) + "\n"
+        for row in rows
+    ).encode()
+
+
+def export_response(
+    batches: AsyncIterator[List[dict]],
+    columns: List[str],
+    export_format: ExportFormatType,
+    filename: str,
+) -> StreamingResponse:
+    """
+    one chunk of the body per batch, so the memory holds one batch
+    whatever the size of the export. the status is sent before the first
+    row, an error after that can only cut the body short
+    """
+
+    async def _body():
+        if export_format == ExportFormatType.CSV:
+            encode = _encode_csv
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(columns)
+            yield buffer.getvalue().encode()
+        else:
+            encode = _encode_ndjson
+        try:
+            async for rows in batches:
+                yield encode(rows, columns)
+        except Exception as e:
+            logger.error("[export] %s failed, error: %s" % (filename, e))
+            raise
+
+    return StreamingResponse(
+        _body(),
+        media_type=_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": 'attachment; filename="%s.%s"'
+            % (filename, export_format.value)
+        },
+    )
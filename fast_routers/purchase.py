@@ -1,22 +1,35 @@
-from typing import List
+from datetime import datetime
+from typing import List, Union
 
-import tortoise.transactions
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from models import PurchaseModel
+from services.id_allocator import AllocateIdsRes, IdSequenceType, allocate_ids
 from services.logger import logger
 from services.purchase import (
     CreatePurchaseItemRes,
     CreatePurchaseReq,
     CreatePurchaseRes,
     CreatePurchaseService,
+    ExportPurchaseService,
     GetLatestPurchaseIdRes,
     GetListPurchaseRes,
     GetListPurchaseService,
     get_latest_purchase_id,
     list_purchase_items,
 )
+from services.purchase_import import (
+    ImportFormatType,
+    PurchaseImportRes,
+    PurchaseImportService,
+)
+from services.sharding import sharded_transaction
+from settings import PURCHASE_ITEMS_MAX_AGE
 from tortoise.exceptions import IntegrityError
 
+from fast_routers.conditional import conditional_response, list_etag, make_etag
+from fast_routers.export import ExportFormatType, export_response
+
 
 class PurchaseRouter(APIRouter):
     def __init__(self, *args, **kwargs):
@@ -33,35 +46,61 @@ class PurchaseRouter(APIRouter):
             "/",
             self._list_purchases,
             methods=["GET"],
+            # the fields left out of `fields` are not serialized
+            response_model_exclude_unset=True,
+        )
+        self.add_api_route(
+            "/export/",
+            self._export_purchases,
+            methods=["GET"],
         )
         self.add_api_route(
             "/{purchase_id}/items/",
             self._list_purchase_items,
             methods=["GET"],
         )
+        self.add_api_route(
+            "/import/",
+            self._import_purchase,
+            methods=["POST"],
+        )
+        self.add_api_route(
+            "/ids/",
+            self._allocate_ids,
+            methods=["POST"],
+        )
         self.add_api_route(
             "/latest-purchase-id/",
             self._get_latest_purchase_id,
             methods=["GET"],
         )
 
-    @tortoise.transactions.atomic()
     async def _create_purchase(
         self, body: CreatePurchaseReq
     ) -> CreatePurchaseRes:
-        handler = CreatePurchaseService(
-            purchase_id=body.id, purchase_items=body.purchase_items
-        )
         try:
-            purchase = await handler.create_purchase()
-            purchase_items = await handler.create_purchase_items(purchase)
-            await handler.create_stock_transaction(purchase, purchase_items)
-            await handler.create_purchase_item_entities(
-                purchase, purchase_items
+            handler = CreatePurchaseService(
+                purchase_id=body.id,
+                purchase_items=body.purchase_items,
+                location=body.location,
             )
-            res = await handler.run_aggregation(
-                purchase=purchase, purchase_items=purchase_items
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
             )
+        try:
+            async with sharded_transaction():
+                purchase = await handler.create_purchase()
+                purchase_items = await handler.create_purchase_items(purchase)
+                await handler.create_stock_transaction(
+                    purchase, purchase_items
+                )
+                await handler.create_purchase_item_entities(
+                    purchase, purchase_items
+                )
+                res = await handler.run_aggregation(
+                    purchase=purchase, purchase_items=purchase_items
+                )
             return res
         except IntegrityError as e:
             logger.error(
@@ -82,16 +121,91 @@ class PurchaseRouter(APIRouter):
                 detail="create purchase failed",
             )
 
+    @classmethod
+    async def _import_purchase(
+        cls,
+        request: Request,
+        format: ImportFormatType = ImportFormatType.CSV,
+        purchase_id: Union[int, None] = None,
+        strict: bool = True,
+        location: Union[str, None] = None,
+    ) -> PurchaseImportRes:
+        """
+        the body is read as a stream, a CSV needs a header line with the
+        CreatePurchaseItemReq field names
+        """
+        try:
+            handler = PurchaseImportService(
+                purchase_id=purchase_id,
+                import_format=format,
+                strict=strict,
+                location=location,
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        res = await handler.run(request.stream())
+        if not res.committed:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=res.model_dump(mode="json"),
+            )
+        return res
+
     @classmethod
     async def _list_purchases(
-        cls, limit: int = 10, offset: int = 0
+        cls,
+        request: Request,
+        response: Response,
+        limit: int = 10,
+        offset: int = 0,
+        fields: Union[str, None] = None,
     ) -> GetListPurchaseRes:
-        handler = GetListPurchaseService()
+        """
+        fields is a comma separated sparse fieldset, e.g. `id,created`,
+        the totals are only computed when requested
+        """
+        try:
+            handler = GetListPurchaseService(
+                fields=fields.split(",") if fields else None
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        version = await handler.get_version()
+        not_modified = conditional_response(
+            request,
+            response,
+            etag=list_etag(version, *handler.fields),
+            last_modified=version.last_modified,
+        )
+        if not_modified:
+            return not_modified
         return await handler.get_list_purchases(limit=limit, offset=offset)
 
+    @classmethod
+    async def _export_purchases(
+        cls,
+        format: ExportFormatType = ExportFormatType.CSV,
+        created_from: Union[datetime, None] = None,
+        created_to: Union[datetime, None] = None,
+    ) -> StreamingResponse:
+        """
+        every purchase created in [created_from, created_to) with its
+        totals, streamed from a database cursor instead of paging
+        """
+        handler = ExportPurchaseService(
+            created_from=created_from, created_to=created_to
+        )
+        return export_response(
+            handler.batches(), handler.columns, format, "purchases"
+        )
+
     @classmethod
     async def _list_purchase_items(
-        cls, purchase_id: int
+        cls, request: Request, response: Response, purchase_id: int
     ) -> List[CreatePurchaseItemRes]:
         purchase = await PurchaseModel.get_or_none(id=purchase_id)
         if not purchase:
@@ -99,8 +213,29 @@ class PurchaseRouter(APIRouter):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Purchase id not found",
             )
+        # the items are created with the purchase and never change
+        not_modified = conditional_response(
+            request,
+            response,
+            etag=make_etag(purchase.id, purchase.created),
+            last_modified=purchase.created,
+            cache_control=f"public, max-age={PURCHASE_ITEMS_MAX_AGE}, "
+            "immutable",
+        )
+        if not_modified:
+            return not_modified
         return await list_purchase_items(purchase=purchase)
 
     async def _get_latest_purchase_id(self) -> GetLatestPurchaseIdRes:
         logger.info("[%s] get latest purchase id" % self.__class__.__name__)
         return await get_latest_purchase_id()
+
+    @classmethod
+    async def _allocate_ids(cls, count: int = 1) -> AllocateIdsRes:
+        try:
+            ids = await allocate_ids(IdSequenceType.PURCHASE, count)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        return AllocateIdsRes(ids=ids)
@@ -0,0 +1,91 @@
+from datetime import date
+from typing import Union
+
+from fastapi import APIRouter, HTTPException, status
+from services.report import (
+    ReportPeriodType,
+    SalesReportService,
+    UnitsSoldRes,
+    VelocityRes,
+    to_records,
+)
+
+
+class ReportRouter(APIRouter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_routers()
+
+    def _init_routers(self):
+        self.add_api_route(
+            "/units-sold/",
+            self._units_sold,
+            methods=["GET"],
+        )
+        self.add_api_route(
+            "/velocity/",
+            self._velocity,
+            methods=["GET"],
+        )
+
+    @classmethod
+    def _handler(
+        cls,
+        start: Union[date, None],
+        end: Union[date, None],
+        location: Union[str, None],
+    ) -> SalesReportService:
+        try:
+            return SalesReportService(start=start, end=end, location=location)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+
+    @classmethod
+    async def _units_sold(
+        cls,
+        start: Union[date, None] = None,
+        end: Union[date, None] = None,
+        period: ReportPeriodType = ReportPeriodType.DAY,
+        rolling: Union[int, None] = None,
+        location: Union[str, None] = None,
+    ) -> UnitsSoldRes:
+        """
+        units sold per SKU and day or week of [start, end), with their
+        trailing mean over `rolling` periods (7 days or 4 weeks)
+        """
+        handler = cls._handler(start, end, location)
+        try:
+            frame = await handler.units_sold(period, rolling)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        return UnitsSoldRes(
+            start=handler.start,
+            end=handler.end,
+            period=period,
+            rolling=(
+                handler.default_rolling(period) if rolling is None else rolling
+            ),
+            results=to_records(frame),
+        )
+
+    @classmethod
+    async def _velocity(
+        cls,
+        start: Union[date, None] = None,
+        end: Union[date, None] = None,
+        location: Union[str, None] = None,
+    ) -> VelocityRes:
+        """
+        units sold, revenue, days of cover and sell-through per SKU over
+        [start, end)
+        """
+        handler = cls._handler(start, end, location)
+        return VelocityRes(
+            start=handler.start,
+            end=handler.end,
+            results=to_records(await handler.velocity()),
+        )
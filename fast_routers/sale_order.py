@@ -1,12 +1,32 @@
-import tortoise.transactions  # noqa
-from fastapi import APIRouter
+from datetime import datetime
+from typing import List, Union
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from models import SaleOrderStatusType
+from services.archival import SaleOrderEntityRes, get_sale_order_entities
+from services.id_allocator import AllocateIdsRes, IdSequenceType, allocate_ids
 from services.sale_order import (
     AutoFillSaleOrder,
+    AutoFillSaleOrdersReq,
+    AutoFillSaleOrdersRes,
+    BulkAutoFillSaleOrders,
+    BulkTransitionSaleOrders,
+    CreateSaleOrdersReq,
+    CreateSaleOrdersRes,
+    CreateSaleOrdersService,
+    ExportSaleOrderService,
     GetListSaleOrderRes,
     GetListSaleOrderService,
     SaleOrderRes,
+    TransitionSaleOrdersReq,
+    TransitionSaleOrdersRes,
 )
+from services.sharding import sharded_atomic
+from services.utils import retry_moved_rows
+
+from fast_routers.conditional import conditional_response, list_etag
+from fast_routers.export import ExportFormatType, export_response
 
 
 class SaleOrderRouter(APIRouter):
@@ -19,6 +39,38 @@ class SaleOrderRouter(APIRouter):
             "/",
             self._get_list_sale_orders,
             methods=["GET"],
+            # the fields left out of `fields` are not serialized
+            response_model_exclude_unset=True,
+        )
+        self.add_api_route(
+            "/export/",
+            self._export_sale_orders,
+            methods=["GET"],
+        )
+        self.add_api_route(
+            "/bulk/",
+            self._create_sale_orders,
+            methods=["POST"],
+        )
+        self.add_api_route(
+            "/ids/",
+            self._allocate_ids,
+            methods=["POST"],
+        )
+        self.add_api_route(
+            "/auto-fill/",
+            self._auto_fill_sale_orders,
+            methods=["POST"],
+        )
+        self.add_api_route(
+            "/transition/",
+            self._transition_sale_orders,
+            methods=["POST"],
+        )
+        self.add_api_route(
+            "/{sale_id}/entities/",
+            self._list_sale_order_entities,
+            methods=["GET"],
         )
         self.add_api_route(
             "/{sale_id}/auto-fill/",
@@ -26,17 +78,105 @@ class SaleOrderRouter(APIRouter):
             methods=["POST"],
         )
 
-    @tortoise.transactions.atomic()
+    async def _create_sale_orders(
+        self, body: CreateSaleOrdersReq
+    ) -> CreateSaleOrdersRes:
+        handler = CreateSaleOrdersService(data=body)
+        return await handler.create_reserved()
+
+    @retry_moved_rows()
+    @sharded_atomic()
     async def _auto_fill_sale_order(self, sale_id: int) -> SaleOrderRes:
         handler = AutoFillSaleOrder(sale_id=sale_id)
         return await handler.auto_fill()
 
+    @retry_moved_rows()
+    @sharded_atomic()
+    async def _auto_fill_sale_orders(
+        self, body: AutoFillSaleOrdersReq
+    ) -> AutoFillSaleOrdersRes:
+        handler = BulkAutoFillSaleOrders(data=body)
+        return await handler.auto_fill()
+
+    @classmethod
+    async def _transition_sale_orders(
+        cls, body: TransitionSaleOrdersReq
+    ) -> TransitionSaleOrdersRes:
+        try:
+            handler = BulkTransitionSaleOrders(data=body)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        return await handler.transition()
+
+    @classmethod
+    async def _list_sale_order_entities(
+        cls, sale_id: int
+    ) -> List[SaleOrderEntityRes]:
+        return await get_sale_order_entities(sale_id)
+
     @classmethod
     async def _get_list_sale_orders(
         cls,
+        request: Request,
+        response: Response,
         limit: int = 10,
         offset: int = 0,
         status_filter: SaleOrderStatusType = None,
+        fields: Union[str, None] = None,
     ) -> GetListSaleOrderRes:
-        handler = GetListSaleOrderService()
+        """
+        fields is a comma separated sparse fieldset, e.g. `id,status`,
+        the totals are only computed when requested
+        """
+        try:
+            handler = GetListSaleOrderService(
+                fields=fields.split(",") if fields else None
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        version = await handler.get_version(status_filter)
+        not_modified = conditional_response(
+            request,
+            response,
+            etag=list_etag(version, *handler.fields),
+            last_modified=version.last_modified,
+        )
+        if not_modified:
+            return not_modified
         return await handler.get_list_sale_orders(limit, offset, status_filter)
+
+    @classmethod
+    async def _export_sale_orders(
+        cls,
+        format: ExportFormatType = ExportFormatType.CSV,
+        status_filter: SaleOrderStatusType = None,
+        created_from: Union[datetime, None] = None,
+        created_to: Union[datetime, None] = None,
+    ) -> StreamingResponse:
+        """
+        every sale order of status_filter created in
+        [created_from, created_to) with its totals, streamed from a
+        database cursor instead of paging
+        """
+        handler = ExportSaleOrderService(
+            status_filter=status_filter,
+            created_from=created_from,
+            created_to=created_to,
+        )
+        return export_response(
+            handler.batches(), handler.columns, format, "sale-orders"
+        )
+
+    @classmethod
+    async def _allocate_ids(cls, count: int = 1) -> AllocateIdsRes:
+        try:
+            ids = await allocate_ids(IdSequenceType.SALE_ORDER, count)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        return AllocateIdsRes(ids=ids)
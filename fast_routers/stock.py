@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException, status
+from services.stock_take import StockTakeReq, StockTakeRes, StockTakeService
+
+
+class StockRouter(APIRouter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_routers()
+
+    def _init_routers(self):
+        self.add_api_route(
+            "/stock-take/",
+            self._stock_take,
+            methods=["POST"],
+        )
+
+    @classmethod
+    async def _stock_take(cls, body: StockTakeReq) -> StockTakeRes:
+        try:
+            handler = StockTakeService(data=body)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+        try:
+            return await handler.reconcile()
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
@@ -0,0 +1,66 @@
+import uuid
+from datetime import datetime
+from typing import List, Union
+
+from fastapi import APIRouter, HTTPException, Query, status
+from services.valuation import (
+    CostOfGoodsRes,
+    StockValueRes,
+    get_cost_of_goods,
+    get_stock_value,
+)
+
+
+class ValuationRouter(APIRouter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_routers()
+
+    def _init_routers(self):
+        self.add_api_route(
+            "/cost-of-goods/",
+            self._cost_of_goods,
+            methods=["GET"],
+        )
+        self.add_api_route(
+            "/stock/",
+            self._stock_value,
+            methods=["GET"],
+        )
+
+    @classmethod
+    async def _cost_of_goods(
+        cls,
+        sale_order_ids: List[int] = Query(default=[]),
+        created_from: Union[datetime, None] = None,
+        created_to: Union[datetime, None] = None,
+    ) -> CostOfGoodsRes:
+        """
+        FIFO cost of goods sold and revenue per sale order, as of the last
+        run of valuateStock.py
+        """
+        try:
+            return await get_cost_of_goods(
+                sale_order_ids, created_from, created_to
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
+
+    @classmethod
+    async def _stock_value(
+        cls,
+        product_id: Union[uuid.UUID, None] = None,
+        skus: List[str] = Query(default=[]),
+        location: Union[str, None] = None,
+    ) -> StockValueRes:
+        """
+        units and value at purchase price of the stock per SKU
+        """
+        try:
+            return await get_stock_value(product_id, skus, location)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+            )
@@ -12,35 +12,70 @@ _sym_db = _symbol_database.Default()
 
 
 from google.protobuf import timestamp_pb2 as google_dot_protobuf_dot_timestamp__pb2
+from google.protobuf import field_mask_pb2 as google_dot_protobuf_dot_field__mask__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0finventory.proto\x12\tinventory\x1a\x1fgoogle/protobuf/timestamp.proto\"2\n\x0eGetQuantityReq\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0c\n\x04skus\x18\x02 \x03(\t\"B\n\rQuantityBySku\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0b\n\x03sku\x18\x02 \x01(\t\x12\x10\n\x08quantity\x18\x03 \x01(\x05\";\n\x0eGetQuantityRes\x12)\n\x07results\x18\x01 \x03(\x0b\x32\x18.inventory.QuantityBySku\"l\n\rSaleOrderItem\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0b\n\x03sku\x18\x02 \x01(\t\x12\x10\n\x08quantity\x18\x03 \x01(\x05\x12\r\n\x05price\x18\x04 \x01(\x03\x12\x19\n\x11unique_identifier\x18\x05 \x01(\t\"I\n\x12\x43reateSaleOrderReq\x12\n\n\x02id\x18\x01 \x01(\x05\x12\'\n\x05items\x18\x02 \x03(\x0b\x32\x18.inventory.SaleOrderItem\"\xe6\x01\n\x0cSaleOrderRes\x12\x0c\n\x04note\x18\x01 \x01(\t\x12+\n\x07\x63reated\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12,\n\x08modified\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x13\n\x0btotal_units\x18\x04 \x01(\x05\x12\x13\n\x0btotal_price\x18\x05 \x01(\x03\x12\'\n\x05items\x18\x06 \x03(\x0b\x32\x18.inventory.SaleOrderItem\x12\n\n\x02id\x18\x07 \x01(\x05\x12\x0e\n\x06status\x18\x08 \x01(\t\"p\n\x10GetSaleOrdersReq\x12\x11\n\torder_ids\x18\x01 \x03(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x0e\n\x06offset\x18\x03 \x01(\x05\x12*\n\x06status\x18\x04 \x01(\x0e\x32\x1a.inventory.SaleOrderStatus\"\xb3\x01\n\x10SaleOrderSummary\x12\n\n\x02id\x18\x01 \x01(\x05\x12+\n\x07\x63reated\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12,\n\x08modified\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x13\n\x0btotal_units\x18\x04 \x01(\x05\x12\x13\n\x0btotal_price\x18\x05 \x01(\x03\x12\x0e\n\x06status\x18\x06 \x01(\t\"O\n\x10GetSaleOrdersRes\x12,\n\x07results\x18\x01 \x03(\x0b\x32\x1b.inventory.SaleOrderSummary\x12\r\n\x05total\x18\x02 \x01(\x05*c\n\x0fSaleOrderStatus\x12\x0b\n\x07NOT_SET\x10\x00\x12\t\n\x05\x44RAFT\x10\x01\x12\r\n\tCONFIRMED\x10\x02\x12\x0b\n\x07SHIPPED\x10\x03\x12\r\n\tDELIVERED\x10\x04\x12\r\n\tCANCELLED\x10\x05\x32\xed\x01\n\x10InventoryService\x12\x43\n\x0bGetQuantity\x12\x19.inventory.GetQuantityReq\x1a\x19.inventory.GetQuantityRes\x12I\n\x0f\x43reateSaleOrder\x12\x1d.inventory.CreateSaleOrderReq\x1a\x17.inventory.SaleOrderRes\x12I\n\rGetSaleOrders\x12\x1b.inventory.GetSaleOrdersReq\x1a\x1b.inventory.GetSaleOrdersResb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0finventory.proto\x12\tinventory\x1a\x1fgoogle/protobuf/timestamp.proto\x1a google/protobuf/field_mask.proto\"o\n\x0eGetQuantityReq\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0c\n\x04skus\x18\x02 \x03(\t\x12)\n\x05\x61s_of\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x10\n\x08location\x18\x04 \x01(\t\"T\n\rQuantityBySku\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0b\n\x03sku\x18\x02 \x01(\t\x12\x10\n\x08quantity\x18\x03 \x01(\x05\x12\x10\n\x08location\x18\x04 \x01(\t\";\n\x0eGetQuantityRes\x12)\n\x07results\x18\x01 \x03(\x0b\x32\x18.inventory.QuantityBySku\"5\n\x10WatchQuantityReq\x12\x13\n\x0bproduct_ids\x18\x01 \x03(\t\x12\x0c\n\x04skus\x18\x02 \x03(\t\"R\n\x0eQuantityChange\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0b\n\x03sku\x18\x02 \x01(\t\x12\x10\n\x08quantity\x18\x03 \x01(\x05\x12\r\n\x05\x64\x65lta\x18\x04 \x01(\x05\"P\n\x10WatchQuantityRes\x12\x10\n\x08snapshot\x18\x01 \x01(\x08\x12*\n\x07\x63hanges\x18\x02 \x03(\x0b\x32\x19.inventory.QuantityChange\"l\n\rSaleOrderItem\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0b\n\x03sku\x18\x02 \x01(\t\x12\x10\n\x08quantity\x18\x03 \x01(\x05\x12\r\n\x05price\x18\x04 \x01(\x03\x12\x19\n\x11unique_identifier\x18\x05 \x01(\t\"[\n\x12\x43reateSaleOrderReq\x12\n\n\x02id\x18\x01 \x01(\x05\x12\'\n\x05items\x18\x02 \x03(\x0b\x32\x18.inventory.SaleOrderItem\x12\x10\n\x08location\x18\x03 \x01(\t\"\xf8\x01\n\x0cSaleOrderRes\x12\x0c\n\x04note\x18\x01 \x01(\t\x12+\n\x07\x63reated\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12,\n\x08modified\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x13\n\x0btotal_units\x18\x04 \x01(\x05\x12\x13\n\x0btotal_price\x18\x05 \x01(\x03\x12\'\n\x05items\x18\x06 \x03(\x0b\x32\x18.inventory.SaleOrderItem\x12\n\n\x02id\x18\x07 \x01(\x05\x12\x0e\n\x06status\x18\x08 \x01(\t\x12\x10\n\x08location\x18\t \x01(\t\"D\n\x13\x43reateSaleOrdersReq\x12-\n\x06orders\x18\x01 \x03(\x0b\x32\x1d.inventory.CreateSaleOrderReq\"Z\n\x15\x43reateSaleOrderResult\x12\n\n\x02id\x18\x01 \x01(\x05\x12&\n\x05order\x18\x02 \x01(\x0b\x32\x17.inventory.SaleOrderRes\x12\r\n\x05\x65rror\x18\x03 \x01(\t\"H\n\x13\x43reateSaleOrdersRes\x12\x31\n\x07results\x18\x01 \x03(\x0b\x32 .inventory.CreateSaleOrderResult\"8\n\x15\x41utoFillSaleOrdersReq\x12\x10\n\x08sale_ids\x18\x01 \x03(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\"A\n\x15\x41utoFillSaleOrdersRes\x12\x15\n\rconfirmed_ids\x18\x01 \x03(\x05\x12\x11\n\tshort_ids\x18\x02 \x03(\x05\"H\n\x0e\x41llocateIdsReq\x12\'\n\x08sequence\x18\x01 \x01(\x0e\x32\x15.inventory.IdSequence\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\"\x1d\n\x0e\x41llocateIdsRes\x12\x0b\n\x03ids\x18\x01 \x03(\x05\"W\n\x17TransitionSaleOrdersReq\x12\x10\n\x08sale_ids\x18\x01 \x03(\x05\x12*\n\x06status\x18\x02 \x01(\x0e\x32\x1a.inventory.SaleOrderStatus\"c\n\x17TransitionSaleOrdersRes\x12\x18\n\x10transitioned_ids\x18\x01 \x03(\x05\x12\x13\n\x0bskipped_ids\x18\x02 \x03(\x05\x12\x19\n\x11released_entities\x18\x03 \x01(\x05\"\x81\x01\n\x11ImportPurchaseReq\x12\x13\n\x0bpurchase_id\x18\x01 \x01(\x05\x12\'\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x17.inventory.ImportFormat\x12\x0e\n\x06strict\x18\x03 \x01(\x08\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\x12\x10\n\x08location\x18\x05 \x01(\t\"-\n\x0eImportRowError\x12\x0c\n\x04line\x18\x01 \x01(\x05\x12\r\n\x05\x65rror\x18\x02 \x01(\t\"\x9e\x01\n\x11ImportPurchaseRes\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x11\n\tcommitted\x18\x02 \x01(\x08\x12\x15\n\rimported_rows\x18\x03 \x01(\x05\x12\x13\n\x0btotal_units\x18\x04 \x01(\x05\x12\x13\n\x0btotal_price\x18\x05 \x01(\x03\x12)\n\x06\x65rrors\x18\x06 \x03(\x0b\x32\x19.inventory.ImportRowError\"\x9c\x01\n\x10GetSaleOrdersReq\x12\x11\n\torder_ids\x18\x01 \x03(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x0e\n\x06offset\x18\x03 \x01(\x05\x12*\n\x06status\x18\x04 \x01(\x0e\x32\x1a.inventory.SaleOrderStatus\x12*\n\x06\x66ields\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.FieldMask\"\xb3\x01\n\x10SaleOrderSummary\x12\n\n\x02id\x18\x01 \x01(\x05\x12+\n\x07\x63reated\x18\x02 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12,\n\x08modified\x18\x03 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x13\n\x0btotal_units\x18\x04 \x01(\x05\x12\x13\n\x0btotal_price\x18\x05 \x01(\x03\x12\x0e\n\x06status\x18\x06 \x01(\t\"O\n\x10GetSaleOrdersRes\x12,\n\x07results\x18\x01 \x03(\x0b\x32\x1b.inventory.SaleOrderSummary\x12\r\n\x05total\x18\x02 \x01(\x05*2\n\nIdSequence\x12\x12\n\x0eSALE_ORDER_IDS\x10\x00\x12\x10\n\x0cPURCHASE_IDS\x10\x01*#\n\x0cImportFormat\x12\x07\n\x03\x43SV\x10\x00\x12\n\n\x06NDJSON\x10\x01*c\n\x0fSaleOrderStatus\x12\x0b\n\x07NOT_SET\x10\x00\x12\t\n\x05\x44RAFT\x10\x01\x12\r\n\tCONFIRMED\x10\x02\x12\x0b\n\x07SHIPPED\x10\x03\x12\r\n\tDELIVERED\x10\x04\x12\r\n\tCANCELLED\x10\x05\x32\xdd\x05\n\x10InventoryService\x12\x43\n\x0bGetQuantity\x12\x19.inventory.GetQuantityReq\x1a\x19.inventory.GetQuantityRes\x12K\n\rWatchQuantity\x12\x1b.inventory.WatchQuantityReq\x1a\x1b.inventory.WatchQuantityRes0\x01\x12I\n\x0f\x43reateSaleOrder\x12\x1d.inventory.CreateSaleOrderReq\x1a\x17.inventory.SaleOrderRes\x12R\n\x10\x43reateSaleOrders\x12\x1e.inventory.CreateSaleOrdersReq\x1a\x1e.inventory.CreateSaleOrdersRes\x12X\n\x12\x41utoFillSaleOrders\x12 .inventory.AutoFillSaleOrdersReq\x1a .inventory.AutoFillSaleOrdersRes\x12\x43\n\x0b\x41llocateIds\x12\x19.inventory.AllocateIdsReq\x1a\x19.inventory.AllocateIdsRes\x12^\n\x14TransitionSaleOrders\x12\".inventory.TransitionSaleOrdersReq\x1a\".inventory.TransitionSaleOrdersRes\x12N\n\x0eImportPurchase\x12\x1c.inventory.ImportPurchaseReq\x1a\x1c.inventory.ImportPurchaseRes(\x01\x12I\n\rGetSaleOrders\x12\x1b.inventory.GetSaleOrdersReq\x1a\x1b.inventory.GetSaleOrdersResb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'inventory_pb2', _globals)
 if _descriptor._USE_C_DESCRIPTORS == False:
   DESCRIPTOR._options = None
-  _globals['_SALEORDERSTATUS']._serialized_start=1039
-  _globals['_SALEORDERSTATUS']._serialized_end=1138
-  _globals['_GETQUANTITYREQ']._serialized_start=63
-  _globals['_GETQUANTITYREQ']._serialized_end=113
-  _globals['_QUANTITYBYSKU']._serialized_start=115
-  _globals['_QUANTITYBYSKU']._serialized_end=181
-  _globals['_GETQUANTITYRES']._serialized_start=183
-  _globals['_GETQUANTITYRES']._serialized_end=242
-  _globals['_SALEORDERITEM']._serialized_start=244
-  _globals['_SALEORDERITEM']._serialized_end=352
-  _globals['_CREATESALEORDERREQ']._serialized_start=354
-  _globals['_CREATESALEORDERREQ']._serialized_end=427
-  _globals['_SALEORDERRES']._serialized_start=430
-  _globals['_SALEORDERRES']._serialized_end=660
-  _globals['_GETSALEORDERSREQ']._serialized_start=662
-  _globals['_GETSALEORDERSREQ']._serialized_end=774
-  _globals['_SALEORDERSUMMARY']._serialized_start=777
-  _globals['_SALEORDERSUMMARY']._serialized_end=956
-  _globals['_GETSALEORDERSRES']._serialized_start=958
-  _globals['_GETSALEORDERSRES']._serialized_end=1037
-  _globals['_INVENTORYSERVICE']._serialized_start=1141
-  _globals['_INVENTORYSERVICE']._serialized_end=1378
+  _globals['_IDSEQUENCE']._serialized_start=2450
+  _globals['_IDSEQUENCE']._serialized_end=2500
+  _globals['_IMPORTFORMAT']._serialized_start=2502
+  _globals['_IMPORTFORMAT']._serialized_end=2537
+  _globals['_SALEORDERSTATUS']._serialized_start=2539
+  _globals['_SALEORDERSTATUS']._serialized_end=2638
+  _globals['_GETQUANTITYREQ']._serialized_start=97
+  _globals['_GETQUANTITYREQ']._serialized_end=208
+  _globals['_QUANTITYBYSKU']._serialized_start=210
+  _globals['_QUANTITYBYSKU']._serialized_end=294
+  _globals['_GETQUANTITYRES']._serialized_start=296
+  _globals['_GETQUANTITYRES']._serialized_end=355
+  _globals['_WATCHQUANTITYREQ']._serialized_start=357
+  _globals['_WATCHQUANTITYREQ']._serialized_end=410
+  _globals['_QUANTITYCHANGE']._serialized_start=412
+  _globals['_QUANTITYCHANGE']._serialized_end=494
+  _globals['_WATCHQUANTITYRES']._serialized_start=496
+  _globals['_WATCHQUANTITYRES']._serialized_end=576
+  _globals['_SALEORDERITEM']._serialized_start=578
+  _globals['_SALEORDERITEM']._serialized_end=686
+  _globals['_CREATESALEORDERREQ']._serialized_start=688
+  _globals['_CREATESALEORDERREQ']._serialized_end=779
+  _globals['_SALEORDERRES']._serialized_start=782
+  _globals['_SALEORDERRES']._serialized_end=1030
+  _globals['_CREATESALEORDERSREQ']._serialized_start=1032
+  _globals['_CREATESALEORDERSREQ']._serialized_end=1100
+  _globals['_CREATESALEORDERRESULT']._serialized_start=1102
+  _globals['_CREATESALEORDERRESULT']._serialized_end=1192
+  _globals['_CREATESALEORDERSRES']._serialized_start=1194
+  _globals['_CREATESALEORDERSRES']._serialized_end=1266
+  _globals['_AUTOFILLSALEORDERSREQ']._serialized_start=1268
+  _globals['_AUTOFILLSALEORDERSREQ']._serialized_end=1324
+  _globals['_AUTOFILLSALEORDERSRES']._serialized_start=1326
+  _globals['_AUTOFILLSALEORDERSRES']._serialized_end=1391
+  _globals['_ALLOCATEIDSREQ']._serialized_start=1393
+  _globals['_ALLOCATEIDSREQ']._serialized_end=1465
+  _globals['_ALLOCATEIDSRES']._serialized_start=1467
+  _globals['_ALLOCATEIDSRES']._serialized_end=1496
+  _globals['_TRANSITIONSALEORDERSREQ']._serialized_start=1498
+  _globals['_TRANSITIONSALEORDERSREQ']._serialized_end=1585
+  _globals['_TRANSITIONSALEORDERSRES']._serialized_start=1587
+  _globals['_TRANSITIONSALEORDERSRES']._serialized_end=1686
+  _globals['_IMPORTPURCHASEREQ']._serialized_start=1689
+  _globals['_IMPORTPURCHASEREQ']._serialized_end=1818
+  _globals['_IMPORTROWERROR']._serialized_start=1820
+  _globals['_IMPORTROWERROR']._serialized_end=1865
+  _globals['_IMPORTPURCHASERES']._serialized_start=1868
+  _globals['_IMPORTPURCHASERES']._serialized_end=2026
+  _globals['_GETSALEORDERSREQ']._serialized_start=2029
+  _globals['_GETSALEORDERSREQ']._serialized_end=2185
+  _globals['_SALEORDERSUMMARY']._serialized_start=2188
+  _globals['_SALEORDERSUMMARY']._serialized_end=2367
+  _globals['_GETSALEORDERSRES']._serialized_start=2369
+  _globals['_GETSALEORDERSRES']._serialized_end=2448
+  _globals['_INVENTORYSERVICE']._serialized_start=2641
+  _globals['_INVENTORYSERVICE']._serialized_end=3374
 # @@protoc_insertion_point(module_scope)
@@ -5,6 +5,7 @@ isort:skip_file
 import builtins
 import collections.abc
 import google.protobuf.descriptor
+import google.protobuf.field_mask_pb2
 import google.protobuf.internal.containers
 import google.protobuf.internal.enum_type_wrapper
 import google.protobuf.message
@@ -19,6 +20,36 @@ else:
 
 DESCRIPTOR: google.protobuf.descriptor.FileDescriptor
 
+class _IdSequence:
+    ValueType = typing.NewType("ValueType", builtins.int)
+    V: typing_extensions.TypeAlias = ValueType
+
+class _IdSequenceEnumTypeWrapper(google.protobuf.internal.enum_type_wrapper._EnumTypeWrapper[_IdSequence.ValueType], builtins.type):
+    DESCRIPTOR: google.protobuf.descriptor.EnumDescriptor
+    SALE_ORDER_IDS: _IdSequence.ValueType  # 0
+    PURCHASE_IDS: _IdSequence.ValueType  # 1
+
+class IdSequence(_IdSequence, metaclass=_IdSequenceEnumTypeWrapper): ...
+
+SALE_ORDER_IDS: IdSequence.ValueType  # 0
+PURCHASE_IDS: IdSequence.ValueType  # 1
+global___IdSequence = IdSequence
+
+class _ImportFormat:
+    ValueType = typing.NewType("ValueType", builtins.int)
+    V: typing_extensions.TypeAlias = ValueType
+
+class _ImportFormatEnumTypeWrapper(google.protobuf.internal.enum_type_wrapper._EnumTypeWrapper[_ImportFormat.ValueType], builtins.type):
+    DESCRIPTOR: google.protobuf.descriptor.EnumDescriptor
+    CSV: _ImportFormat.ValueType  # 0
+    NDJSON: _ImportFormat.ValueType  # 1
+
+class ImportFormat(_ImportFormat, metaclass=_ImportFormatEnumTypeWrapper): ...
+
+CSV: ImportFormat.ValueType  # 0
+NDJSON: ImportFormat.ValueType  # 1
+global___ImportFormat = ImportFormat
+
 class _SaleOrderStatus:
     ValueType = typing.NewType("ValueType", builtins.int)
     V: typing_extensions.TypeAlias = ValueType
@@ -48,16 +79,26 @@ class GetQuantityReq(google.protobuf.message.Message):
 
     PRODUCT_ID_FIELD_NUMBER: builtins.int
     SKUS_FIELD_NUMBER: builtins.int
+    AS_OF_FIELD_NUMBER: builtins.int
+    LOCATION_FIELD_NUMBER: builtins.int
     product_id: builtins.str
     @property
     def skus(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.str]: ...
+    @property
+    def as_of(self) -> google.protobuf.timestamp_pb2.Timestamp:
+        """quantity at this point in time, current quantity when unset"""
+    location: builtins.str
+    """quantity of this location, summed over all locations when empty"""
     def __init__(
         self,
         *,
         product_id: builtins.str = ...,
         skus: collections.abc.Iterable[builtins.str] | None = ...,
+        as_of: google.protobuf.timestamp_pb2.Timestamp | None = ...,
+        location: builtins.str = ...,
     ) -> None: ...
-    def ClearField(self, field_name: typing_extensions.Literal["product_id", b"product_id", "skus", b"skus"]) -> None: ...
+    def HasField(self, field_name: typing_extensions.Literal["as_of", b"as_of"]) -> builtins.bool: ...
+    def ClearField(self, field_name: typing_extensions.Literal["as_of", b"as_of", "location", b"location", "product_id", b"product_id", "skus", b"skus"]) -> None: ...
 
 global___GetQuantityReq = GetQuantityReq
 
@@ -68,17 +109,20 @@ class QuantityBySku(google.protobuf.message.Message):
     PRODUCT_ID_FIELD_NUMBER: builtins.int
     SKU_FIELD_NUMBER: builtins.int
     QUANTITY_FIELD_NUMBER: builtins.int
+    LOCATION_FIELD_NUMBER: builtins.int
     product_id: builtins.str
     sku: builtins.str
     quantity: builtins.int
+    location: builtins.str
     def __init__(
         self,
         *,
         product_id: builtins.str = ...,
         sku: builtins.str = ...,
         quantity: builtins.int = ...,
+        location: builtins.str = ...,
     ) -> None: ...
-    def ClearField(self, field_name: typing_extensions.Literal["product_id", b"product_id", "quantity", b"quantity", "sku", b"sku"]) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["location", b"location", "product_id", b"product_id", "quantity", b"quantity", "sku", b"sku"]) -> None: ...
 
 global___QuantityBySku = QuantityBySku
 
@@ -98,6 +142,71 @@ class GetQuantityRes(google.protobuf.message.Message):
 
 global___GetQuantityRes = GetQuantityRes
 
+@typing_extensions.final
+class WatchQuantityReq(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    PRODUCT_IDS_FIELD_NUMBER: builtins.int
+    SKUS_FIELD_NUMBER: builtins.int
+    @property
+    def product_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.str]: ...
+    @property
+    def skus(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.str]: ...
+    def __init__(
+        self,
+        *,
+        product_ids: collections.abc.Iterable[builtins.str] | None = ...,
+        skus: collections.abc.Iterable[builtins.str] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["product_ids", b"product_ids", "skus", b"skus"]) -> None: ...
+
+global___WatchQuantityReq = WatchQuantityReq
+
+@typing_extensions.final
+class QuantityChange(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    PRODUCT_ID_FIELD_NUMBER: builtins.int
+    SKU_FIELD_NUMBER: builtins.int
+    QUANTITY_FIELD_NUMBER: builtins.int
+    DELTA_FIELD_NUMBER: builtins.int
+    product_id: builtins.str
+    sku: builtins.str
+    quantity: builtins.int
+    """summed over all locations"""
+    delta: builtins.int
+    """since the previous message, 0 in the snapshot"""
+    def __init__(
+        self,
+        *,
+        product_id: builtins.str = ...,
+        sku: builtins.str = ...,
+        quantity: builtins.int = ...,
+        delta: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["delta", b"delta", "product_id", b"product_id", "quantity", b"quantity", "sku", b"sku"]) -> None: ...
+
+global___QuantityChange = QuantityChange
+
+@typing_extensions.final
+class WatchQuantityRes(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SNAPSHOT_FIELD_NUMBER: builtins.int
+    CHANGES_FIELD_NUMBER: builtins.int
+    snapshot: builtins.bool
+    @property
+    def changes(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___QuantityChange]: ...
+    def __init__(
+        self,
+        *,
+        snapshot: builtins.bool = ...,
+        changes: collections.abc.Iterable[global___QuantityChange] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["changes", b"changes", "snapshot", b"snapshot"]) -> None: ...
+
+global___WatchQuantityRes = WatchQuantityRes
+
 @typing_extensions.final
 class SaleOrderItem(google.protobuf.message.Message):
     DESCRIPTOR: google.protobuf.descriptor.Descriptor
@@ -132,16 +241,21 @@ class CreateSaleOrderReq(google.protobuf.message.Message):
 
     ID_FIELD_NUMBER: builtins.int
     ITEMS_FIELD_NUMBER: builtins.int
+    LOCATION_FIELD_NUMBER: builtins.int
     id: builtins.int
+    """allocated by the server when 0"""
     @property
     def items(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___SaleOrderItem]: ...
+    location: builtins.str
+    """served from this location first, the default location when empty"""
     def __init__(
         self,
         *,
         id: builtins.int = ...,
         items: collections.abc.Iterable[global___SaleOrderItem] | None = ...,
+        location: builtins.str = ...,
     ) -> None: ...
-    def ClearField(self, field_name: typing_extensions.Literal["id", b"id", "items", b"items"]) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["id", b"id", "items", b"items", "location", b"location"]) -> None: ...
 
 global___CreateSaleOrderReq = CreateSaleOrderReq
 
@@ -157,6 +271,7 @@ class SaleOrderRes(google.protobuf.message.Message):
     ITEMS_FIELD_NUMBER: builtins.int
     ID_FIELD_NUMBER: builtins.int
     STATUS_FIELD_NUMBER: builtins.int
+    LOCATION_FIELD_NUMBER: builtins.int
     note: builtins.str
     @property
     def created(self) -> google.protobuf.timestamp_pb2.Timestamp: ...
@@ -168,6 +283,7 @@ class SaleOrderRes(google.protobuf.message.Message):
     def items(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___SaleOrderItem]: ...
     id: builtins.int
     status: builtins.str
+    location: builtins.str
     def __init__(
         self,
         *,
@@ -179,12 +295,265 @@ class SaleOrderRes(google.protobuf.message.Message):
         items: collections.abc.Iterable[global___SaleOrderItem] | None = ...,
         id: builtins.int = ...,
         status: builtins.str = ...,
+        location: builtins.str = ...,
     ) -> None: ...
     def HasField(self, field_name: typing_extensions.Literal["created", b"created", "modified", b"modified"]) -> builtins.bool: ...
-    def ClearField(self, field_name: typing_extensions.Literal["created", b"created", "id", b"id", "items", b"items", "modified", b"modified", "note", b"note", "status", b"status", "total_price", b"total_price", "total_units", b"total_units"]) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["created", b"created", "id", b"id", "items", b"items", "location", b"location", "modified", b"modified", "note", b"note", "status", b"status", "total_price", b"total_price", "total_units", b"total_units"]) -> None: ...
 
 global___SaleOrderRes = SaleOrderRes
 
+@typing_extensions.final
+class CreateSaleOrdersReq(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    ORDERS_FIELD_NUMBER: builtins.int
+    @property
+    def orders(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___CreateSaleOrderReq]: ...
+    def __init__(
+        self,
+        *,
+        orders: collections.abc.Iterable[global___CreateSaleOrderReq] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["orders", b"orders"]) -> None: ...
+
+global___CreateSaleOrdersReq = CreateSaleOrdersReq
+
+@typing_extensions.final
+class CreateSaleOrderResult(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    ID_FIELD_NUMBER: builtins.int
+    ORDER_FIELD_NUMBER: builtins.int
+    ERROR_FIELD_NUMBER: builtins.int
+    id: builtins.int
+    @property
+    def order(self) -> global___SaleOrderRes:
+        """unset when error is set"""
+    error: builtins.str
+    def __init__(
+        self,
+        *,
+        id: builtins.int = ...,
+        order: global___SaleOrderRes | None = ...,
+        error: builtins.str = ...,
+    ) -> None: ...
+    def HasField(self, field_name: typing_extensions.Literal["order", b"order"]) -> builtins.bool: ...
+    def ClearField(self, field_name: typing_extensions.Literal["error", b"error", "id", b"id", "order", b"order"]) -> None: ...
+
+global___CreateSaleOrderResult = CreateSaleOrderResult
+
+@typing_extensions.final
+class CreateSaleOrdersRes(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    RESULTS_FIELD_NUMBER: builtins.int
+    @property
+    def results(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___CreateSaleOrderResult]: ...
+    def __init__(
+        self,
+        *,
+        results: collections.abc.Iterable[global___CreateSaleOrderResult] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["results", b"results"]) -> None: ...
+
+global___CreateSaleOrdersRes = CreateSaleOrdersRes
+
+@typing_extensions.final
+class AutoFillSaleOrdersReq(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SALE_IDS_FIELD_NUMBER: builtins.int
+    LIMIT_FIELD_NUMBER: builtins.int
+    @property
+    def sale_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    limit: builtins.int
+    def __init__(
+        self,
+        *,
+        sale_ids: collections.abc.Iterable[builtins.int] | None = ...,
+        limit: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["limit", b"limit", "sale_ids", b"sale_ids"]) -> None: ...
+
+global___AutoFillSaleOrdersReq = AutoFillSaleOrdersReq
+
+@typing_extensions.final
+class AutoFillSaleOrdersRes(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    CONFIRMED_IDS_FIELD_NUMBER: builtins.int
+    SHORT_IDS_FIELD_NUMBER: builtins.int
+    @property
+    def confirmed_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    @property
+    def short_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    def __init__(
+        self,
+        *,
+        confirmed_ids: collections.abc.Iterable[builtins.int] | None = ...,
+        short_ids: collections.abc.Iterable[builtins.int] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["confirmed_ids", b"confirmed_ids", "short_ids", b"short_ids"]) -> None: ...
+
+global___AutoFillSaleOrdersRes = AutoFillSaleOrdersRes
+
+@typing_extensions.final
+class AllocateIdsReq(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SEQUENCE_FIELD_NUMBER: builtins.int
+    COUNT_FIELD_NUMBER: builtins.int
+    sequence: global___IdSequence.ValueType
+    count: builtins.int
+    def __init__(
+        self,
+        *,
+        sequence: global___IdSequence.ValueType = ...,
+        count: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["count", b"count", "sequence", b"sequence"]) -> None: ...
+
+global___AllocateIdsReq = AllocateIdsReq
+
+@typing_extensions.final
+class AllocateIdsRes(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    IDS_FIELD_NUMBER: builtins.int
+    @property
+    def ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    def __init__(
+        self,
+        *,
+        ids: collections.abc.Iterable[builtins.int] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["ids", b"ids"]) -> None: ...
+
+global___AllocateIdsRes = AllocateIdsRes
+
+@typing_extensions.final
+class TransitionSaleOrdersReq(google.protobuf.message.Message):
+    """status is SHIPPED, DELIVERED or CANCELLED"""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    SALE_IDS_FIELD_NUMBER: builtins.int
+    STATUS_FIELD_NUMBER: builtins.int
+    @property
+    def sale_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    status: global___SaleOrderStatus.ValueType
+    def __init__(
+        self,
+        *,
+        sale_ids: collections.abc.Iterable[builtins.int] | None = ...,
+        status: global___SaleOrderStatus.ValueType = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["sale_ids", b"sale_ids", "status", b"status"]) -> None: ...
+
+global___TransitionSaleOrdersReq = TransitionSaleOrdersReq
+
+@typing_extensions.final
+class TransitionSaleOrdersRes(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    TRANSITIONED_IDS_FIELD_NUMBER: builtins.int
+    SKIPPED_IDS_FIELD_NUMBER: builtins.int
+    RELEASED_ENTITIES_FIELD_NUMBER: builtins.int
+    @property
+    def transitioned_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    @property
+    def skipped_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
+    released_entities: builtins.int
+    def __init__(
+        self,
+        *,
+        transitioned_ids: collections.abc.Iterable[builtins.int] | None = ...,
+        skipped_ids: collections.abc.Iterable[builtins.int] | None = ...,
+        released_entities: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["released_entities", b"released_entities", "skipped_ids", b"skipped_ids", "transitioned_ids", b"transitioned_ids"]) -> None: ...
+
+global___TransitionSaleOrdersRes = TransitionSaleOrdersRes
+
+@typing_extensions.final
+class ImportPurchaseReq(google.protobuf.message.Message):
+    """purchase_id, format and strict are read from the first message only"""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    PURCHASE_ID_FIELD_NUMBER: builtins.int
+    FORMAT_FIELD_NUMBER: builtins.int
+    STRICT_FIELD_NUMBER: builtins.int
+    DATA_FIELD_NUMBER: builtins.int
+    LOCATION_FIELD_NUMBER: builtins.int
+    purchase_id: builtins.int
+    format: global___ImportFormat.ValueType
+    strict: builtins.bool
+    data: builtins.bytes
+    location: builtins.str
+    """receiving location, the default location when empty"""
+    def __init__(
+        self,
+        *,
+        purchase_id: builtins.int = ...,
+        format: global___ImportFormat.ValueType = ...,
+        strict: builtins.bool = ...,
+        data: builtins.bytes = ...,
+        location: builtins.str = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["data", b"data", "format", b"format", "location", b"location", "purchase_id", b"purchase_id", "strict", b"strict"]) -> None: ...
+
+global___ImportPurchaseReq = ImportPurchaseReq
+
+@typing_extensions.final
+class ImportRowError(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    LINE_FIELD_NUMBER: builtins.int
+    ERROR_FIELD_NUMBER: builtins.int
+    line: builtins.int
+    error: builtins.str
+    def __init__(
+        self,
+        *,
+        line: builtins.int = ...,
+        error: builtins.str = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["error", b"error", "line", b"line"]) -> None: ...
+
+global___ImportRowError = ImportRowError
+
+@typing_extensions.final
+class ImportPurchaseRes(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    ID_FIELD_NUMBER: builtins.int
+    COMMITTED_FIELD_NUMBER: builtins.int
+    IMPORTED_ROWS_FIELD_NUMBER: builtins.int
+    TOTAL_UNITS_FIELD_NUMBER: builtins.int
+    TOTAL_PRICE_FIELD_NUMBER: builtins.int
+    ERRORS_FIELD_NUMBER: builtins.int
+    id: builtins.int
+    committed: builtins.bool
+    imported_rows: builtins.int
+    total_units: builtins.int
+    total_price: builtins.int
+    @property
+    def errors(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___ImportRowError]: ...
+    def __init__(
+        self,
+        *,
+        id: builtins.int = ...,
+        committed: builtins.bool = ...,
+        imported_rows: builtins.int = ...,
+        total_units: builtins.int = ...,
+        total_price: builtins.int = ...,
+        errors: collections.abc.Iterable[global___ImportRowError] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing_extensions.Literal["committed", b"committed", "errors", b"errors", "id", b"id", "imported_rows", b"imported_rows", "total_price", b"total_price", "total_units", b"total_units"]) -> None: ...
+
+global___ImportPurchaseRes = ImportPurchaseRes
+
 @typing_extensions.final
 class GetSaleOrdersReq(google.protobuf.message.Message):
     DESCRIPTOR: google.protobuf.descriptor.Descriptor
@@ -193,11 +562,17 @@ class GetSaleOrdersReq(google.protobuf.message.Message):
     LIMIT_FIELD_NUMBER: builtins.int
     OFFSET_FIELD_NUMBER: builtins.int
     STATUS_FIELD_NUMBER: builtins.int
+    FIELDS_FIELD_NUMBER: builtins.int
     @property
     def order_ids(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.int]: ...
     limit: builtins.int
     offset: builtins.int
     status: global___SaleOrderStatus.ValueType
+    @property
+    def fields(self) -> google.protobuf.field_mask_pb2.FieldMask:
+        """SaleOrderSummary fields to return, all of them when empty, the
+        totals are only computed when requested
+        """
     def __init__(
         self,
         *,
@@ -205,8 +580,10 @@ class GetSaleOrdersReq(google.protobuf.message.Message):
         limit: builtins.int = ...,
         offset: builtins.int = ...,
         status: global___SaleOrderStatus.ValueType = ...,
+        fields: google.protobuf.field_mask_pb2.FieldMask | None = ...,
     ) -> None: ...
-    def ClearField(self, field_name: typing_extensions.Literal["limit", b"limit", "offset", b"offset", "order_ids", b"order_ids", "status", b"status"]) -> None: ...
+    def HasField(self, field_name: typing_extensions.Literal["fields", b"fields"]) -> builtins.bool: ...
+    def ClearField(self, field_name: typing_extensions.Literal["fields", b"fields", "limit", b"limit", "offset", b"offset", "order_ids", b"order_ids", "status", b"status"]) -> None: ...
 
 global___GetSaleOrdersReq = GetSaleOrdersReq
 
@@ -19,11 +19,41 @@ class InventoryServiceStub(object):
                 request_serializer=inventory__pb2.GetQuantityReq.SerializeToString,
                 response_deserializer=inventory__pb2.GetQuantityRes.FromString,
                 )
+        self.WatchQuantity = channel.unary_stream(
+                '/inventory.InventoryService/WatchQuantity',
+                request_serializer=inventory__pb2.WatchQuantityReq.SerializeToString,
+                response_deserializer=inventory__pb2.WatchQuantityRes.FromString,
+                )
         self.CreateSaleOrder = channel.unary_unary(
                 '/inventory.InventoryService/CreateSaleOrder',
                 request_serializer=inventory__pb2.CreateSaleOrderReq.SerializeToString,
                 response_deserializer=inventory__pb2.SaleOrderRes.FromString,
                 )
+        self.CreateSaleOrders = channel.unary_unary(
+                '/inventory.InventoryService/CreateSaleOrders',
+                request_serializer=inventory__pb2.CreateSaleOrdersReq.SerializeToString,
+                response_deserializer=inventory__pb2.CreateSaleOrdersRes.FromString,
+                )
+        self.AutoFillSaleOrders = channel.unary_unary(
+                '/inventory.InventoryService/AutoFillSaleOrders',
+                request_serializer=inventory__pb2.AutoFillSaleOrdersReq.SerializeToString,
+                response_deserializer=inventory__pb2.AutoFillSaleOrdersRes.FromString,
+                )
+        self.AllocateIds = channel.unary_unary(
+                '/inventory.InventoryService/AllocateIds',
+                request_serializer=inventory__pb2.AllocateIdsReq.SerializeToString,
+                response_deserializer=inventory__pb2.AllocateIdsRes.FromString,
+                )
+        self.TransitionSaleOrders = channel.unary_unary(
+                '/inventory.InventoryService/TransitionSaleOrders',
+                request_serializer=inventory__pb2.TransitionSaleOrdersReq.SerializeToString,
+                response_deserializer=inventory__pb2.TransitionSaleOrdersRes.FromString,
+                )
+        self.ImportPurchase = channel.stream_unary(
+                '/inventory.InventoryService/ImportPurchase',
+                request_serializer=inventory__pb2.ImportPurchaseReq.SerializeToString,
+                response_deserializer=inventory__pb2.ImportPurchaseRes.FromString,
+                )
         self.GetSaleOrders = channel.unary_unary(
                 '/inventory.InventoryService/GetSaleOrders',
                 request_serializer=inventory__pb2.GetSaleOrdersReq.SerializeToString,
@@ -41,6 +71,13 @@ class InventoryServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def WatchQuantity(self, request, context):
+        """Current quantities of product IDs or SKUs, then their changes
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CreateSaleOrder(self, request, context):
         """Create a sale
         """
@@ -48,6 +85,41 @@ class InventoryServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CreateSaleOrders(self, request, context):
+        """Create a batch of sales in one transaction
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AutoFillSaleOrders(self, request, context):
+        """Confirm many draft sales, by ids or the oldest drafts up to limit
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AllocateIds(self, request, context):
+        """Reserve a block of sale order or purchase ids
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def TransitionSaleOrders(self, request, context):
+        """Ship, deliver or cancel many sales, cancelling releases their stock
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ImportPurchase(self, request_iterator, context):
+        """Stream a CSV or NDJSON purchase manifest into one purchase
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetSaleOrders(self, request, context):
         """Get sale orders
         """
@@ -63,11 +135,41 @@ def add_InventoryServiceServicer_to_server(servicer, server):
                     request_deserializer=inventory__pb2.GetQuantityReq.FromString,
                     response_serializer=inventory__pb2.GetQuantityRes.SerializeToString,
             ),
+            'WatchQuantity': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchQuantity,
+                    request_deserializer=inventory__pb2.WatchQuantityReq.FromString,
+                    response_serializer=inventory__pb2.WatchQuantityRes.SerializeToString,
+            ),
             'CreateSaleOrder': grpc.unary_unary_rpc_method_handler(
                     servicer.CreateSaleOrder,
                     request_deserializer=inventory__pb2.CreateSaleOrderReq.FromString,
                     response_serializer=inventory__pb2.SaleOrderRes.SerializeToString,
             ),
+            'CreateSaleOrders': grpc.unary_unary_rpc_method_handler(
+                    servicer.CreateSaleOrders,
+                    request_deserializer=inventory__pb2.CreateSaleOrdersReq.FromString,
+                    response_serializer=inventory__pb2.CreateSaleOrdersRes.SerializeToString,
+            ),
+            'AutoFillSaleOrders': grpc.unary_unary_rpc_method_handler(
+                    servicer.AutoFillSaleOrders,
+                    request_deserializer=inventory__pb2.AutoFillSaleOrdersReq.FromString,
+                    response_serializer=inventory__pb2.AutoFillSaleOrdersRes.SerializeToString,
+            ),
+            'AllocateIds': grpc.unary_unary_rpc_method_handler(
+                    servicer.AllocateIds,
+                    request_deserializer=inventory__pb2.AllocateIdsReq.FromString,
+                    response_serializer=inventory__pb2.AllocateIdsRes.SerializeToString,
+            ),
+            'TransitionSaleOrders': grpc.unary_unary_rpc_method_handler(
+                    servicer.TransitionSaleOrders,
+                    request_deserializer=inventory__pb2.TransitionSaleOrdersReq.FromString,
+                    response_serializer=inventory__pb2.TransitionSaleOrdersRes.SerializeToString,
+            ),
+            'ImportPurchase': grpc.stream_unary_rpc_method_handler(
+                    servicer.ImportPurchase,
+                    request_deserializer=inventory__pb2.ImportPurchaseReq.FromString,
+                    response_serializer=inventory__pb2.ImportPurchaseRes.SerializeToString,
+            ),
             'GetSaleOrders': grpc.unary_unary_rpc_method_handler(
                     servicer.GetSaleOrders,
                     request_deserializer=inventory__pb2.GetSaleOrdersReq.FromString,
@@ -100,6 +202,23 @@ class InventoryService(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def WatchQuantity(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/inventory.InventoryService/WatchQuantity',
+            inventory__pb2.WatchQuantityReq.SerializeToString,
+            inventory__pb2.WatchQuantityRes.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def CreateSaleOrder(request,
             target,
@@ -117,6 +236,91 @@ class InventoryService(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def CreateSaleOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/inventory.InventoryService/CreateSaleOrders',
+            inventory__pb2.CreateSaleOrdersReq.SerializeToString,
+            inventory__pb2.CreateSaleOrdersRes.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def AutoFillSaleOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/inventory.InventoryService/AutoFillSaleOrders',
+            inventory__pb2.AutoFillSaleOrdersReq.SerializeToString,
+            inventory__pb2.AutoFillSaleOrdersRes.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def AllocateIds(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/inventory.InventoryService/AllocateIds',
+            inventory__pb2.AllocateIdsReq.SerializeToString,
+            inventory__pb2.AllocateIdsRes.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def TransitionSaleOrders(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/inventory.InventoryService/TransitionSaleOrders',
+            inventory__pb2.TransitionSaleOrdersReq.SerializeToString,
+            inventory__pb2.TransitionSaleOrdersRes.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def ImportPurchase(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/inventory.InventoryService/ImportPurchase',
+            inventory__pb2.ImportPurchaseReq.SerializeToString,
+            inventory__pb2.ImportPurchaseRes.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def GetSaleOrders(request,
             target,
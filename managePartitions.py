@@ -0,0 +1,52 @@
+"""_summary_ command to manage the monthly partitions of inventory_transaction
+    create: create the partitions of the current and the next months
+    detach: detach (and drop) the months already compacted by compactLedger.py
+    check: EXPLAIN the hot service queries, exit 1 if a query is not pruned
+
+    every stock shard is managed in turn
+
+    python managePartitions.py create [--months-ahead 3]
+    python managePartitions.py detach [--drop]
+    python managePartitions.py check
+"""
+
+import argparse
+import sys
+
+import settings
+from services.partition import LedgerPartitionService
+from tortoise import Tortoise, run_async
+
+
+async def main(args: argparse.Namespace):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    pruned = True
+    for conn_name in settings.STOCK_SHARD_CONN_NAMES:
+        handler = LedgerPartitionService(
+            months_ahead=args.months_ahead, conn_name=conn_name
+        )
+        if args.command == "create":
+            print(conn_name, await handler.create_future_partitions())
+        elif args.command == "detach":
+            print(
+                conn_name, await handler.detach_old_partitions(drop=args.drop)
+            )
+        else:
+            results = await handler.check_pruning()
+            for res in results:
+                print(conn_name, res.model_dump_json())
+            pruned = pruned and all(res.pruned for res in results)
+    if not pruned:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["create", "detach", "check"])
+    parser.add_argument(
+        "--months-ahead",
+        type=int,
+        default=settings.LEDGER_PARTITION_MONTHS_AHEAD,
+    )
+    parser.add_argument("--drop", action="store_true")
+    run_async(main(parser.parse_args()))
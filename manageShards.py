@@ -0,0 +1,84 @@
+"""_summary_ command to manage the stock shards set by STOCK_SHARD_URIS
+    init: drop the foreign keys between the stock tables and the tables
+          left on the default database, run once after the migrations
+    resolve: finish the prepared transactions left by a crash, see
+             services/sharding.py
+
+    python manageShards.py init
+    python manageShards.py resolve
+    python manageShards.py resolve --grace-seconds 600
+"""
+
+import argparse
+
+import settings
+from services.sharding import is_sharded, resolve_prepared_transactions
+from tortoise import Tortoise, run_async
+
+STOCK_TABLES = [
+    "inventory_transaction",
+    "inventory_transaction_archive",
+    "inventory_checkpoint",
+    "purchase_item_entity",
+    "purchase_item_entity_archive",
+]
+
+
+async def drop_foreign_keys(conn_name: str, tables: list, stock: bool):
+    """
+    drop the foreign keys of tables that reference a stock table
+    (stock=True) or a table which is not one (stock=False)
+    """
+    conn = Tortoise.get_connection(conn_name)
+    _, list_values = await conn.execute_query(
+        """
+        SELECT con.conname, rel.relname
+        FROM pg_constraint con
+        INNER JOIN pg_class rel ON rel.oid = con.conrelid
+        INNER JOIN pg_class ref ON ref.oid = con.confrelid
+        WHERE con.contype = 'f' AND con.conparentid = 0
+            AND rel.relname = ANY($1::varchar[])
+            AND (ref.relname = ANY($2::varchar[])) = $3
+        """,
+        [tables, STOCK_TABLES, stock],
+    )
+    for ele in list_values:
+        await conn.execute_script(
+            f'ALTER TABLE "{ele["relname"]}" '
+            f'DROP CONSTRAINT "{ele["conname"]}"'
+        )
+        print(conn_name, ele["relname"], ele["conname"], "dropped")
+
+
+async def main(args: argparse.Namespace):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    if not is_sharded():
+        print("STOCK_SHARD_URIS is not set")
+        return
+
+    if args.command == "init":
+        for conn_name in settings.STOCK_SHARD_CONN_NAMES:
+            await drop_foreign_keys(conn_name, STOCK_TABLES, stock=False)
+        await drop_foreign_keys(
+            settings.TORTOISE_DEFAULT_CONN_NAME,
+            ["sale_order_item_entity", "sale_order_item_entity_archive"],
+            stock=True,
+        )
+    else:
+        resolved_by_shard = await resolve_prepared_transactions(
+            args.grace_seconds
+        )
+        for shard, resolved in resolved_by_shard.items():
+            print(shard, resolved)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["init", "resolve"])
+    parser.add_argument(
+        "--grace-seconds",
+        type=int,
+        default=settings.SHARD_RESOLVE_GRACE_SECONDS,
+        help="leave the younger prepared transactions alone",
+    )
+    run_async(main(parser.parse_args()))
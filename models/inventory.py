@@ -10,6 +10,7 @@ class TransactionType(str, Enum):
     SALE = "sale"
     RETURN = "return"
     ADJUSTMENT = "adjustment"
+    TRANSFER = "transfer"
 
 
 class EntityStockStatusType(str, Enum):
@@ -29,9 +30,10 @@ class SaleOrderStatusType(str, Enum):
 
 class PurchaseModel(DbModel):
     """Purchase Model
-    represents a purchase from a supplier"""
+    represents a purchase from a supplier received at a location"""
 
     id = fields.IntField(pk=True)
+    location = fields.CharField(max_length=20, default="default")
 
     class Meta:
         table = "purchase"
@@ -39,7 +41,9 @@ class PurchaseModel(DbModel):
 
 class PurchaseItemModel(DbModel):
     """PurchaseItem Model
-    represents a product (sku) in a purchase"""
+    represents a product (sku) in a purchase
+    xact_id, the id of the inserting transaction, is a database column
+    filled by its default, see services/export.py"""
 
     id = fields.UUIDField(pk=True, default=fields.UUIDField)
     purchase = fields.ForeignKeyField(
@@ -60,10 +64,12 @@ class PurchaseItemModel(DbModel):
 
 class PurchaseItemEntityModel(DbModel):
     """PurchaseItemEntity Model
-    represents a single entity of a product (sku) in the warehouse"""
+    represents a single entity of a product (sku) in a location
+    the table is list partitioned by status, primary key is (id, status)"""
 
     id = fields.UUIDField(pk=True, default=fields.UUIDField)
 
+    location = fields.CharField(max_length=20, default="default")
     product_id = fields.UUIDField()
     sku = fields.CharField(max_length=20)
     unique_identifier = fields.CharField(max_length=20, null=True)
@@ -83,24 +89,30 @@ class PurchaseItemEntityModel(DbModel):
 
     class Meta:
         table = "purchase_item_entity"
+        indexes = (("location", "product_id", "sku"),)
 
 
 class SaleOrderModel(DbModel):
     """SaleOrder Model
-    represents a sale to a customer"""
+    represents a sale to a customer, served from its location first"""
 
     id = fields.IntField(pk=True)
     status = fields.CharEnumField(
         SaleOrderStatusType, default=SaleOrderStatusType.DRAFT.value
     )
+    location = fields.CharField(max_length=20, default="default")
 
     class Meta:
         table = "sale_order"
+        # version marker of the sale order lists
+        indexes = (("modified",),)
 
 
 class SaleOrderItemModel(DbModel):
     """SaleOrderItem Model
-    represents a product (sku) in a sale"""
+    represents a product (sku) in a sale
+    xact_id, the id of the inserting transaction, is a database column
+    filled by its default, see services/export.py"""
 
     id = fields.UUIDField(pk=True, default=fields.UUIDField)
     sale_order = fields.ForeignKeyField(
@@ -121,13 +133,18 @@ class SaleOrderItemModel(DbModel):
 class SaleOrderItemEntityModel(DbModel):
     """SaleOrderItemEntity Model
     represents a single entity of a product (sku) in the warehouse that are sold to a customer
+    the table is hash partitioned by sale_order_id, primary key is (id, sale_order_id)
+    xact_id, the id of the inserting transaction, is a database column
+    filled by its default, see services/valuation.py
     """
 
     id = fields.UUIDField(pk=True, default=fields.UUIDField)
 
+    # no db constraint, purchase_item_entity is unique on (id, status) only
     purchase_item_entity = fields.ForeignKeyField(
         "inventory.PurchaseItemEntityModel",
         related_name="sale_order_item_entities",
+        db_constraint=False,
     )
     sale_order = fields.ForeignKeyField(
         "inventory.SaleOrderModel",
@@ -140,16 +157,22 @@ class SaleOrderItemEntityModel(DbModel):
 
     class Meta:
         table = "sale_order_item_entity"
+        indexes = (("purchase_item_entity_id",),)
 
 
 class InventoryTransactionModel(DbModel):
     """
     InventoryTransaction Model
-    represents a transaction of a product (sku) in the warehouse
+    represents a transaction of a product (sku) in a location
+    the table is range partitioned by month of created, rows of a month
+    without partition land in the default one, primary key is (id, created)
+    xact_id, the id of the inserting transaction, is a database column
+    filled by its default, see services/export.py
     """
 
     id = fields.UUIDField(pk=True, default=fields.UUIDField)
 
+    location = fields.CharField(max_length=20, default="default")
     product_id = fields.UUIDField()
     sku = fields.CharField(max_length=20)
     unique_identifier = fields.CharField(max_length=20, null=True)
@@ -173,3 +196,244 @@ class InventoryTransactionModel(DbModel):
 
     class Meta:
         table = "inventory_transaction"
+        indexes = (("location", "product_id", "sku", "created"),)
+
+
+class LedgerCompactionStatusType(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+
+class InventoryCheckpointModel(DbModel):
+    """
+    InventoryCheckpoint Model
+    represents the running quantity of a product (sku) in a location for
+    every transaction created before the watermark, those transactions are
+    moved to the archive
+    """
+
+    id = fields.UUIDField(pk=True, default=fields.UUIDField)
+
+    location = fields.CharField(max_length=20, default="default")
+    product_id = fields.UUIDField()
+    sku = fields.CharField(max_length=20)
+
+    watermark = fields.DatetimeField()
+    quantity = fields.IntField()
+
+    class Meta:
+        table = "inventory_checkpoint"
+        unique_together = (("location", "product_id", "sku", "watermark"),)
+
+
+class InventoryTransactionArchiveModel(DbModel):
+    """
+    InventoryTransactionArchive Model
+    represents a compacted transaction moved out of inventory_transaction,
+    with the xact_id it had there
+    """
+
+    id = fields.UUIDField(pk=True)
+
+    location = fields.CharField(max_length=20, default="default")
+    product_id = fields.UUIDField()
+    sku = fields.CharField(max_length=20)
+    unique_identifier = fields.CharField(max_length=20, null=True)
+
+    quantity = fields.IntField()
+
+    transaction_type = fields.CharEnumField(TransactionType)
+
+    # plain columns, archived rows must not cascade with their origin
+    purchase_id = fields.IntField(null=True)
+    sale_order_id = fields.IntField(null=True)
+
+    class Meta:
+        table = "inventory_transaction_archive"
+        indexes = (("location", "product_id", "sku", "created"),)
+
+
+class LedgerCompactionModel(DbModel):
+    """
+    LedgerCompaction Model
+    represents a compaction run, the cursor makes the run resumable
+    """
+
+    id = fields.IntField(pk=True)
+    watermark = fields.DatetimeField()
+    status = fields.CharEnumField(
+        LedgerCompactionStatusType,
+        default=LedgerCompactionStatusType.RUNNING.value,
+    )
+
+    last_product_id = fields.UUIDField(null=True)
+    last_sku = fields.CharField(max_length=20, null=True)
+    moved_rows = fields.IntField(default=0)
+
+    class Meta:
+        table = "ledger_compaction"
+
+
+class PurchaseItemEntityArchiveModel(DbModel):
+    """
+    PurchaseItemEntityArchive Model
+    represents a sold entity of a delivered sale order moved out of
+    purchase_item_entity
+    """
+
+    id = fields.UUIDField(pk=True)
+
+    location = fields.CharField(max_length=20, default="default")
+    product_id = fields.UUIDField()
+    sku = fields.CharField(max_length=20)
+    unique_identifier = fields.CharField(max_length=20, null=True)
+
+    status = fields.CharEnumField(EntityStockStatusType)
+
+    # plain columns, archived rows must not cascade with their origin
+    purchase_id = fields.IntField()
+    purchase_item_id = fields.UUIDField()
+
+    class Meta:
+        table = "purchase_item_entity_archive"
+
+
+class SaleOrderItemEntityArchiveModel(DbModel):
+    """
+    SaleOrderItemEntityArchive Model
+    represents the link of a delivered sale order to a sold entity moved
+    out of sale_order_item_entity, with the xact_id it had there
+    """
+
+    id = fields.UUIDField(pk=True)
+
+    purchase_item_entity_id = fields.UUIDField()
+    sale_order_id = fields.IntField()
+    sale_order_item_id = fields.UUIDField()
+
+    class Meta:
+        table = "sale_order_item_entity_archive"
+        indexes = (("sale_order_id",),)
+
+
+class EntityArchivalStatusType(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+
+class EntityArchivalModel(DbModel):
+    """
+    EntityArchival Model
+    represents an archival run of the orders delivered before the cutoff,
+    the cursor makes the run resumable
+    """
+
+    id = fields.IntField(pk=True)
+    cutoff = fields.DatetimeField()
+    status = fields.CharEnumField(
+        EntityArchivalStatusType,
+        default=EntityArchivalStatusType.RUNNING.value,
+    )
+
+    last_sale_order_id = fields.IntField(default=0)
+    moved_rows = fields.IntField(default=0)
+
+    class Meta:
+        table = "entity_archival"
+
+
+class StockLevelModel(DbModel):
+    """
+    StockLevel Model
+    represents the quantity of a product (sku) over every location, kept
+    with the ledger by every write publishing stock deltas, version counts
+    its updates, see services/stock_counter.py
+    """
+
+    id = fields.IntField(pk=True)
+
+    product_id = fields.UUIDField()
+    sku = fields.CharField(max_length=20)
+
+    quantity = fields.BigIntField(default=0)
+    version = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "stock_level"
+        unique_together = (("product_id", "sku"),)
+
+
+class ShardCommitModel(DbModel):
+    """
+    ShardCommit Model
+    represents the commit decision of a two-phase commit over the stock
+    shards, see services/sharding.py
+    """
+
+    gid = fields.CharField(pk=True, max_length=64)
+
+    class Meta:
+        table = "shard_commit"
+
+
+class ExportCursorModel(DbModel):
+    """
+    ExportCursor Model
+    represents the high-water mark of the Parquet export of a source read
+    from a connection, every row up to (last_xact_id, last_created,
+    last_id) is written
+    """
+
+    id = fields.IntField(pk=True)
+    source = fields.CharField(max_length=64)
+    conn_name = fields.CharField(max_length=64)
+
+    last_xact_id = fields.BigIntField(default=0)
+    last_created = fields.DatetimeField(null=True)
+    last_id = fields.UUIDField(null=True)
+    exported_rows = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "export_cursor"
+        unique_together = (("source", "conn_name"),)
+
+
+class SaleOrderItemCostModel(DbModel):
+    """
+    SaleOrderItemCost Model
+    represents the cost of the entities sold by a sale order item, the
+    price of the purchase item of each of them, see services/valuation.py
+    """
+
+    id = fields.IntField(pk=True)
+
+    # plain columns, the cost outlives the archival of the entity links
+    sale_order_id = fields.IntField(index=True)
+    sale_order_item_id = fields.UUIDField(unique=True)
+    product_id = fields.UUIDField()
+    sku = fields.CharField(max_length=20)
+
+    units = fields.IntField(default=0)
+    cost = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "sale_order_item_cost"
+
+
+class ValuationCursorModel(DbModel):
+    """
+    ValuationCursor Model
+    represents the last entity link costed, every link up to
+    (last_xact_id, last_created, last_id) is in sale_order_item_cost
+    """
+
+    id = fields.IntField(pk=True)
+    name = fields.CharField(max_length=64, unique=True)
+
+    last_xact_id = fields.BigIntField(default=0)
+    last_created = fields.DatetimeField(null=True)
+    last_id = fields.UUIDField(null=True)
+    processed_rows = fields.BigIntField(default=0)
+
+    class Meta:
+        table = "valuation_cursor"
@@ -0,0 +1,30 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "export_cursor" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "source" VARCHAR(64) NOT NULL,
+    "conn_name" VARCHAR(64) NOT NULL,
+    "last_created" TIMESTAMPTZ,
+    "last_id" UUID,
+    "exported_rows" BIGINT NOT NULL  DEFAULT 0,
+    CONSTRAINT "uid_export_curs_source_fc6970" UNIQUE ("source", "conn_name")
+);
+COMMENT ON TABLE "export_cursor" IS 'ExportCursor Model';
+CREATE INDEX "idx_inventory_t_created_9af669" ON "inventory_transaction" ("created", "id");
+CREATE INDEX "idx_inventory_t_created_d005d5" ON "inventory_transaction_archive" ("created", "id");
+CREATE INDEX "idx_purchase_it_created_d4e06f" ON "purchase_item" ("created", "id");
+CREATE INDEX "idx_sale_order__created_cb6102" ON "sale_order_item" ("created", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_sale_order__created_cb6102";
+DROP INDEX IF EXISTS "idx_purchase_it_created_d4e06f";
+DROP INDEX IF EXISTS "idx_inventory_t_created_d005d5";
+DROP INDEX IF EXISTS "idx_inventory_t_created_9af669";
+DROP TABLE IF EXISTS "export_cursor";"""
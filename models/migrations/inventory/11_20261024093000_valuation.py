@@ -0,0 +1,38 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "sale_order_item_cost" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "sale_order_id" INT NOT NULL,
+    "sale_order_item_id" UUID NOT NULL UNIQUE,
+    "product_id" UUID NOT NULL,
+    "sku" VARCHAR(20) NOT NULL,
+    "units" INT NOT NULL  DEFAULT 0,
+    "cost" BIGINT NOT NULL  DEFAULT 0
+);
+CREATE INDEX "idx_sale_order__sale_or_d54f0c" ON "sale_order_item_cost" ("sale_order_id");
+COMMENT ON TABLE "sale_order_item_cost" IS 'SaleOrderItemCost Model';
+CREATE TABLE IF NOT EXISTS "valuation_cursor" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(64) NOT NULL UNIQUE,
+    "last_created" TIMESTAMPTZ,
+    "last_id" UUID,
+    "processed_rows" BIGINT NOT NULL  DEFAULT 0
+);
+COMMENT ON TABLE "valuation_cursor" IS 'ValuationCursor Model';
+CREATE INDEX "idx_sale_order__created_416642" ON "sale_order_item_entity" ("created", "id");
+CREATE INDEX "idx_sale_order__created_384a28" ON "sale_order_item_entity_archive" ("created", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_sale_order__created_384a28";
+DROP INDEX IF EXISTS "idx_sale_order__created_416642";
+DROP TABLE IF EXISTS "valuation_cursor";
+DROP TABLE IF EXISTS "sale_order_item_cost";"""
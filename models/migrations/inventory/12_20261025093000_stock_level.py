@@ -0,0 +1,32 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "stock_level" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "product_id" UUID NOT NULL,
+    "sku" VARCHAR(20) NOT NULL,
+    "quantity" BIGINT NOT NULL  DEFAULT 0,
+    "version" BIGINT NOT NULL  DEFAULT 0,
+    CONSTRAINT "uid_stock_level_product_8fe8b7" UNIQUE ("product_id", "sku")
+);
+COMMENT ON TABLE "stock_level" IS 'StockLevel Model';
+INSERT INTO "stock_level" ("product_id", "sku", "quantity", "version")
+SELECT "product_id", "sku", SUM("quantity"), 1
+FROM (
+    SELECT "product_id", "sku", "quantity" FROM "inventory_transaction"
+    UNION ALL
+    (SELECT DISTINCT ON ("location", "product_id", "sku")
+        "product_id", "sku", "quantity"
+    FROM "inventory_checkpoint"
+    ORDER BY "location", "product_id", "sku", "watermark" DESC)
+) AS "ledger"
+GROUP BY "product_id", "sku";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "stock_level";"""
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "inventory_transaction_default" PARTITION OF "inventory_transaction" DEFAULT;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM "inventory_transaction_default") THEN
+        RAISE EXCEPTION 'inventory_transaction_default has rows, create their monthly partitions first';
+    END IF;
+END $$;
+DROP TABLE IF EXISTS "inventory_transaction_default";"""
@@ -0,0 +1,38 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "inventory_transaction" ADD COLUMN IF NOT EXISTS "xact_id" BIGINT NOT NULL  DEFAULT 0;
+ALTER TABLE "inventory_transaction" ALTER COLUMN "xact_id" SET DEFAULT pg_current_xact_id()::text::bigint;
+ALTER TABLE "inventory_transaction_archive" ADD COLUMN IF NOT EXISTS "xact_id" BIGINT NOT NULL  DEFAULT 0;
+ALTER TABLE "purchase_item" ADD COLUMN IF NOT EXISTS "xact_id" BIGINT NOT NULL  DEFAULT 0;
+ALTER TABLE "purchase_item" ALTER COLUMN "xact_id" SET DEFAULT pg_current_xact_id()::text::bigint;
+ALTER TABLE "sale_order_item" ADD COLUMN IF NOT EXISTS "xact_id" BIGINT NOT NULL  DEFAULT 0;
+ALTER TABLE "sale_order_item" ALTER COLUMN "xact_id" SET DEFAULT pg_current_xact_id()::text::bigint;
+ALTER TABLE "export_cursor" ADD COLUMN IF NOT EXISTS "last_xact_id" BIGINT NOT NULL  DEFAULT 0;
+DROP INDEX IF EXISTS "idx_inventory_t_created_9af669";
+DROP INDEX IF EXISTS "idx_inventory_t_created_d005d5";
+DROP INDEX IF EXISTS "idx_purchase_it_created_d4e06f";
+DROP INDEX IF EXISTS "idx_sale_order__created_cb6102";
+CREATE INDEX "idx_inventory_t_xact_id_10b9d7" ON "inventory_transaction" ("xact_id", "created", "id");
+CREATE INDEX "idx_inventory_t_xact_id_81c7bd" ON "inventory_transaction_archive" ("xact_id", "created", "id");
+CREATE INDEX "idx_purchase_it_xact_id_86e49d" ON "purchase_item" ("xact_id", "created", "id");
+CREATE INDEX "idx_sale_order__xact_id_d80fb8" ON "sale_order_item" ("xact_id", "created", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_sale_order__xact_id_d80fb8";
+DROP INDEX IF EXISTS "idx_purchase_it_xact_id_86e49d";
+DROP INDEX IF EXISTS "idx_inventory_t_xact_id_81c7bd";
+DROP INDEX IF EXISTS "idx_inventory_t_xact_id_10b9d7";
+CREATE INDEX "idx_inventory_t_created_9af669" ON "inventory_transaction" ("created", "id");
+CREATE INDEX "idx_inventory_t_created_d005d5" ON "inventory_transaction_archive" ("created", "id");
+CREATE INDEX "idx_purchase_it_created_d4e06f" ON "purchase_item" ("created", "id");
+CREATE INDEX "idx_sale_order__created_cb6102" ON "sale_order_item" ("created", "id");
+ALTER TABLE "export_cursor" DROP COLUMN IF EXISTS "last_xact_id";
+ALTER TABLE "sale_order_item" DROP COLUMN IF EXISTS "xact_id";
+ALTER TABLE "purchase_item" DROP COLUMN IF EXISTS "xact_id";
+ALTER TABLE "inventory_transaction_archive" DROP COLUMN IF EXISTS "xact_id";
+ALTER TABLE "inventory_transaction" DROP COLUMN IF EXISTS "xact_id";"""
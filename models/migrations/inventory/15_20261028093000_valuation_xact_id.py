@@ -0,0 +1,24 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "sale_order_item_entity" ADD COLUMN IF NOT EXISTS "xact_id" BIGINT NOT NULL  DEFAULT 0;
+ALTER TABLE "sale_order_item_entity" ALTER COLUMN "xact_id" SET DEFAULT pg_current_xact_id()::text::bigint;
+ALTER TABLE "sale_order_item_entity_archive" ADD COLUMN IF NOT EXISTS "xact_id" BIGINT NOT NULL  DEFAULT 0;
+ALTER TABLE "valuation_cursor" ADD COLUMN IF NOT EXISTS "last_xact_id" BIGINT NOT NULL  DEFAULT 0;
+DROP INDEX IF EXISTS "idx_sale_order__created_416642";
+DROP INDEX IF EXISTS "idx_sale_order__created_384a28";
+CREATE INDEX "idx_sale_order__xact_id_f09e0f" ON "sale_order_item_entity" ("xact_id", "created", "id");
+CREATE INDEX "idx_sale_order__xact_id_644fea" ON "sale_order_item_entity_archive" ("xact_id", "created", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_sale_order__xact_id_644fea";
+DROP INDEX IF EXISTS "idx_sale_order__xact_id_f09e0f";
+CREATE INDEX "idx_sale_order__created_416642" ON "sale_order_item_entity" ("created", "id");
+CREATE INDEX "idx_sale_order__created_384a28" ON "sale_order_item_entity_archive" ("created", "id");
+ALTER TABLE "valuation_cursor" DROP COLUMN IF EXISTS "last_xact_id";
+ALTER TABLE "sale_order_item_entity_archive" DROP COLUMN IF EXISTS "xact_id";
+ALTER TABLE "sale_order_item_entity" DROP COLUMN IF EXISTS "xact_id";"""
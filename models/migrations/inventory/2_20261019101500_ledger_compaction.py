@@ -0,0 +1,52 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "idx_inventory_t_product_fd92fe" ON "inventory_transaction" ("product_id", "sku", "created");
+CREATE TABLE IF NOT EXISTS "inventory_checkpoint" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "product_id" UUID NOT NULL,
+    "sku" VARCHAR(20) NOT NULL,
+    "watermark" TIMESTAMPTZ NOT NULL,
+    "quantity" INT NOT NULL,
+    CONSTRAINT "uid_inventory_c_product_3b83c0" UNIQUE ("product_id", "sku", "watermark")
+);
+COMMENT ON TABLE "inventory_checkpoint" IS 'InventoryCheckpoint Model';
+CREATE TABLE IF NOT EXISTS "inventory_transaction_archive" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "product_id" UUID NOT NULL,
+    "sku" VARCHAR(20) NOT NULL,
+    "unique_identifier" VARCHAR(20),
+    "quantity" INT NOT NULL,
+    "transaction_type" VARCHAR(10) NOT NULL,
+    "purchase_id" INT,
+    "sale_order_id" INT
+);
+CREATE INDEX IF NOT EXISTS "idx_inventory_t_product_0f08e1" ON "inventory_transaction_archive" ("product_id", "sku", "created");
+COMMENT ON COLUMN "inventory_transaction_archive"."transaction_type" IS 'PURCHASE: purchase\nSALE: sale\nRETURN: return\nADJUSTMENT: adjustment';
+COMMENT ON TABLE "inventory_transaction_archive" IS 'InventoryTransactionArchive Model';
+CREATE TABLE IF NOT EXISTS "ledger_compaction" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "watermark" TIMESTAMPTZ NOT NULL,
+    "status" VARCHAR(9) NOT NULL  DEFAULT 'running',
+    "last_product_id" UUID,
+    "last_sku" VARCHAR(20),
+    "moved_rows" INT NOT NULL  DEFAULT 0
+);
+COMMENT ON COLUMN "ledger_compaction"."status" IS 'RUNNING: running\nCOMPLETED: completed';
+COMMENT ON TABLE "ledger_compaction" IS 'LedgerCompaction Model';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_inventory_t_product_fd92fe";
+        DROP TABLE IF EXISTS "ledger_compaction";
+        DROP TABLE IF EXISTS "inventory_transaction_archive";
+        DROP TABLE IF EXISTS "inventory_checkpoint";"""
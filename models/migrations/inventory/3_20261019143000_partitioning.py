@@ -0,0 +1,124 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "sale_order_item_entity" RENAME TO "sale_order_item_entity_unpartitioned";
+ALTER INDEX "sale_order_item_entity_pkey" RENAME TO "sale_order_item_entity_unpartitioned_pkey";
+ALTER TABLE "purchase_item_entity" RENAME TO "purchase_item_entity_unpartitioned";
+ALTER INDEX "purchase_item_entity_pkey" RENAME TO "purchase_item_entity_unpartitioned_pkey";
+ALTER TABLE "inventory_transaction" RENAME TO "inventory_transaction_unpartitioned";
+ALTER INDEX "inventory_transaction_pkey" RENAME TO "inventory_transaction_unpartitioned_pkey";
+DROP INDEX IF EXISTS "idx_inventory_t_product_fd92fe";
+CREATE TABLE "inventory_transaction" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" UUID NOT NULL,
+    "product_id" UUID NOT NULL,
+    "sku" VARCHAR(20) NOT NULL,
+    "unique_identifier" VARCHAR(20),
+    "quantity" INT NOT NULL,
+    "transaction_type" VARCHAR(10) NOT NULL  DEFAULT 'purchase',
+    "purchase_id" INT REFERENCES "purchase" ("id") ON DELETE CASCADE,
+    "sale_order_id" INT REFERENCES "sale_order" ("id") ON DELETE CASCADE,
+    PRIMARY KEY ("id", "created")
+) PARTITION BY RANGE ("created");
+CREATE INDEX "idx_inventory_t_product_fd92fe" ON "inventory_transaction" ("product_id", "sku", "created");
+COMMENT ON COLUMN "inventory_transaction"."transaction_type" IS 'PURCHASE: purchase\nSALE: sale\nRETURN: return\nADJUSTMENT: adjustment';
+COMMENT ON TABLE "inventory_transaction" IS 'InventoryTransaction Model';
+CREATE TABLE "inventory_transaction_history" PARTITION OF "inventory_transaction"
+    FOR VALUES FROM (MINVALUE) TO (date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC');
+DO $$
+DECLARE
+    month_start TIMESTAMPTZ := date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+BEGIN
+    FOR i IN 0..3 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF "inventory_transaction" FOR VALUES FROM (%L) TO (%L)',
+            'inventory_transaction_p' || to_char(month_start AT TIME ZONE 'UTC', 'YYYYMM'),
+            month_start,
+            month_start + interval '1 month'
+        );
+        month_start := month_start + interval '1 month';
+    END LOOP;
+END $$;
+INSERT INTO "inventory_transaction" SELECT "created", "modified", "id", "product_id", "sku", "unique_identifier", "quantity", "transaction_type", "purchase_id", "sale_order_id" FROM "inventory_transaction_unpartitioned";
+CREATE TABLE "purchase_item_entity" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" UUID NOT NULL,
+    "product_id" UUID NOT NULL,
+    "sku" VARCHAR(20) NOT NULL,
+    "unique_identifier" VARCHAR(20),
+    "status" VARCHAR(9) NOT NULL  DEFAULT 'available',
+    "purchase_id" INT NOT NULL REFERENCES "purchase" ("id") ON DELETE CASCADE,
+    "purchase_item_id" UUID NOT NULL REFERENCES "purchase_item" ("id") ON DELETE CASCADE,
+    PRIMARY KEY ("id", "status")
+) PARTITION BY LIST ("status");
+CREATE INDEX "idx_purchase_it_product_180810" ON "purchase_item_entity" ("product_id", "sku");
+COMMENT ON COLUMN "purchase_item_entity"."status" IS 'AVAILABLE: available\nSOLD: sold\nRETURNED: returned\nADJUSTED: adjusted';
+COMMENT ON TABLE "purchase_item_entity" IS 'PurchaseItemEntity Model';
+CREATE TABLE "purchase_item_entity_available" PARTITION OF "purchase_item_entity" FOR VALUES IN ('available');
+CREATE TABLE "purchase_item_entity_sold" PARTITION OF "purchase_item_entity" FOR VALUES IN ('sold');
+CREATE TABLE "purchase_item_entity_other" PARTITION OF "purchase_item_entity" DEFAULT;
+INSERT INTO "purchase_item_entity" SELECT "created", "modified", "id", "product_id", "sku", "unique_identifier", "status", "purchase_id", "purchase_item_id" FROM "purchase_item_entity_unpartitioned";
+CREATE TABLE "sale_order_item_entity" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" UUID NOT NULL,
+    "purchase_item_entity_id" UUID NOT NULL,
+    "sale_order_id" INT NOT NULL REFERENCES "sale_order" ("id") ON DELETE CASCADE,
+    "sale_order_item_id" UUID NOT NULL REFERENCES "sale_order_item" ("id") ON DELETE CASCADE,
+    PRIMARY KEY ("id", "sale_order_id")
+) PARTITION BY HASH ("sale_order_id");
+CREATE INDEX "idx_sale_order__purchas_0e3407" ON "sale_order_item_entity" ("purchase_item_entity_id");
+COMMENT ON TABLE "sale_order_item_entity" IS 'SaleOrderItemEntity Model';
+DO $$
+BEGIN
+    FOR i IN 0..7 LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF "sale_order_item_entity" FOR VALUES WITH (MODULUS 8, REMAINDER %s)',
+            'sale_order_item_entity_h' || i,
+            i
+        );
+    END LOOP;
+END $$;
+INSERT INTO "sale_order_item_entity" SELECT "created", "modified", "id", "purchase_item_entity_id", "sale_order_id", "sale_order_item_id" FROM "sale_order_item_entity_unpartitioned";
+DROP TABLE "sale_order_item_entity_unpartitioned";
+DROP TABLE "purchase_item_entity_unpartitioned";
+DROP TABLE "inventory_transaction_unpartitioned";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "sale_order_item_entity" RENAME TO "sale_order_item_entity_partitioned";
+ALTER TABLE "purchase_item_entity" RENAME TO "purchase_item_entity_partitioned";
+ALTER TABLE "inventory_transaction" RENAME TO "inventory_transaction_partitioned";
+ALTER INDEX "idx_inventory_t_product_fd92fe" RENAME TO "idx_inventory_t_partitioned";
+ALTER INDEX "inventory_transaction_pkey" RENAME TO "inventory_transaction_partitioned_pkey";
+ALTER INDEX "purchase_item_entity_pkey" RENAME TO "purchase_item_entity_partitioned_pkey";
+ALTER INDEX "sale_order_item_entity_pkey" RENAME TO "sale_order_item_entity_partitioned_pkey";
+ALTER INDEX "idx_purchase_it_product_180810" RENAME TO "idx_purchase_it_partitioned";
+ALTER INDEX "idx_sale_order__purchas_0e3407" RENAME TO "idx_sale_order__partitioned";
+CREATE TABLE "inventory_transaction" (LIKE "inventory_transaction_partitioned" INCLUDING DEFAULTS INCLUDING COMMENTS);
+ALTER TABLE "inventory_transaction" ADD PRIMARY KEY ("id");
+ALTER TABLE "inventory_transaction" ADD FOREIGN KEY ("purchase_id") REFERENCES "purchase" ("id") ON DELETE CASCADE;
+ALTER TABLE "inventory_transaction" ADD FOREIGN KEY ("sale_order_id") REFERENCES "sale_order" ("id") ON DELETE CASCADE;
+CREATE INDEX "idx_inventory_t_product_fd92fe" ON "inventory_transaction" ("product_id", "sku", "created");
+INSERT INTO "inventory_transaction" SELECT * FROM "inventory_transaction_partitioned";
+CREATE TABLE "purchase_item_entity" (LIKE "purchase_item_entity_partitioned" INCLUDING DEFAULTS INCLUDING COMMENTS);
+ALTER TABLE "purchase_item_entity" ADD PRIMARY KEY ("id");
+ALTER TABLE "purchase_item_entity" ADD FOREIGN KEY ("purchase_id") REFERENCES "purchase" ("id") ON DELETE CASCADE;
+ALTER TABLE "purchase_item_entity" ADD FOREIGN KEY ("purchase_item_id") REFERENCES "purchase_item" ("id") ON DELETE CASCADE;
+CREATE INDEX "idx_purchase_it_product_180810" ON "purchase_item_entity" ("product_id", "sku");
+INSERT INTO "purchase_item_entity" SELECT * FROM "purchase_item_entity_partitioned";
+CREATE TABLE "sale_order_item_entity" (LIKE "sale_order_item_entity_partitioned" INCLUDING DEFAULTS INCLUDING COMMENTS);
+ALTER TABLE "sale_order_item_entity" ADD PRIMARY KEY ("id");
+ALTER TABLE "sale_order_item_entity" ADD FOREIGN KEY ("purchase_item_entity_id") REFERENCES "purchase_item_entity" ("id") ON DELETE CASCADE;
+ALTER TABLE "sale_order_item_entity" ADD FOREIGN KEY ("sale_order_id") REFERENCES "sale_order" ("id") ON DELETE CASCADE;
+ALTER TABLE "sale_order_item_entity" ADD FOREIGN KEY ("sale_order_item_id") REFERENCES "sale_order_item" ("id") ON DELETE CASCADE;
+CREATE INDEX "idx_sale_order__purchas_0e3407" ON "sale_order_item_entity" ("purchase_item_entity_id");
+INSERT INTO "sale_order_item_entity" SELECT * FROM "sale_order_item_entity_partitioned";
+DROP TABLE "sale_order_item_entity_partitioned";
+DROP TABLE "purchase_item_entity_partitioned";
+DROP TABLE "inventory_transaction_partitioned";"""
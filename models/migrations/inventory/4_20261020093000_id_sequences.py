@@ -0,0 +1,12 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        SELECT setval(pg_get_serial_sequence('purchase', 'id'), COALESCE((SELECT MAX("id") FROM "purchase"), 0) + 1, false);
+SELECT setval(pg_get_serial_sequence('sale_order', 'id'), COALESCE((SELECT MAX("id") FROM "sale_order"), 0) + 1, false);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        """
@@ -0,0 +1,46 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "purchase_item_entity_archive" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "product_id" UUID NOT NULL,
+    "sku" VARCHAR(20) NOT NULL,
+    "unique_identifier" VARCHAR(20),
+    "status" VARCHAR(9) NOT NULL,
+    "purchase_id" INT NOT NULL,
+    "purchase_item_id" UUID NOT NULL
+);
+COMMENT ON COLUMN "purchase_item_entity_archive"."status" IS 'AVAILABLE: available\nSOLD: sold\nRETURNED: returned\nADJUSTED: adjusted';
+COMMENT ON TABLE "purchase_item_entity_archive" IS 'PurchaseItemEntityArchive Model';
+CREATE TABLE IF NOT EXISTS "sale_order_item_entity_archive" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "purchase_item_entity_id" UUID NOT NULL,
+    "sale_order_id" INT NOT NULL,
+    "sale_order_item_id" UUID NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "idx_sale_order__sale_or_12ecbe" ON "sale_order_item_entity_archive" ("sale_order_id");
+COMMENT ON TABLE "sale_order_item_entity_archive" IS 'SaleOrderItemEntityArchive Model';
+CREATE TABLE IF NOT EXISTS "entity_archival" (
+    "created" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "modified" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "cutoff" TIMESTAMPTZ NOT NULL,
+    "status" VARCHAR(9) NOT NULL  DEFAULT 'running',
+    "last_sale_order_id" INT NOT NULL  DEFAULT 0,
+    "moved_rows" INT NOT NULL  DEFAULT 0
+);
+COMMENT ON COLUMN "entity_archival"."status" IS 'RUNNING: running\nCOMPLETED: completed';
+COMMENT ON TABLE "entity_archival" IS 'EntityArchival Model';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "entity_archival";
+        DROP TABLE IF EXISTS "sale_order_item_entity_archive";
+        DROP TABLE IF EXISTS "purchase_item_entity_archive";"""
@@ -0,0 +1,41 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "purchase" ADD "location" VARCHAR(20) NOT NULL  DEFAULT 'default';
+ALTER TABLE "sale_order" ADD "location" VARCHAR(20) NOT NULL  DEFAULT 'default';
+ALTER TABLE "purchase_item_entity" ADD "location" VARCHAR(20) NOT NULL  DEFAULT 'default';
+ALTER TABLE "purchase_item_entity_archive" ADD "location" VARCHAR(20) NOT NULL  DEFAULT 'default';
+ALTER TABLE "inventory_transaction" ADD "location" VARCHAR(20) NOT NULL  DEFAULT 'default';
+ALTER TABLE "inventory_transaction_archive" ADD "location" VARCHAR(20) NOT NULL  DEFAULT 'default';
+ALTER TABLE "inventory_checkpoint" ADD "location" VARCHAR(20) NOT NULL  DEFAULT 'default';
+DROP INDEX IF EXISTS "idx_purchase_it_product_180810";
+CREATE INDEX "idx_purchase_it_locatio_1380e8" ON "purchase_item_entity" ("location", "product_id", "sku");
+DROP INDEX IF EXISTS "idx_inventory_t_product_fd92fe";
+CREATE INDEX "idx_inventory_t_locatio_4314c7" ON "inventory_transaction" ("location", "product_id", "sku", "created");
+DROP INDEX IF EXISTS "idx_inventory_t_product_0f08e1";
+CREATE INDEX "idx_inventory_t_locatio_f07035" ON "inventory_transaction_archive" ("location", "product_id", "sku", "created");
+ALTER TABLE "inventory_checkpoint" DROP CONSTRAINT IF EXISTS "uid_inventory_c_product_3b83c0";
+ALTER TABLE "inventory_checkpoint" ADD CONSTRAINT "uid_inventory_c_locatio_41d2c2" UNIQUE ("location", "product_id", "sku", "watermark");
+COMMENT ON COLUMN "inventory_transaction"."transaction_type" IS 'PURCHASE: purchase\nSALE: sale\nRETURN: return\nADJUSTMENT: adjustment\nTRANSFER: transfer';
+COMMENT ON COLUMN "inventory_transaction_archive"."transaction_type" IS 'PURCHASE: purchase\nSALE: sale\nRETURN: return\nADJUSTMENT: adjustment\nTRANSFER: transfer';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "inventory_checkpoint" DROP CONSTRAINT IF EXISTS "uid_inventory_c_locatio_41d2c2";
+DROP INDEX IF EXISTS "idx_inventory_t_locatio_f07035";
+DROP INDEX IF EXISTS "idx_inventory_t_locatio_4314c7";
+DROP INDEX IF EXISTS "idx_purchase_it_locatio_1380e8";
+ALTER TABLE "inventory_checkpoint" DROP COLUMN "location";
+ALTER TABLE "inventory_transaction_archive" DROP COLUMN "location";
+ALTER TABLE "inventory_transaction" DROP COLUMN "location";
+ALTER TABLE "purchase_item_entity_archive" DROP COLUMN "location";
+ALTER TABLE "purchase_item_entity" DROP COLUMN "location";
+ALTER TABLE "sale_order" DROP COLUMN "location";
+ALTER TABLE "purchase" DROP COLUMN "location";
+CREATE INDEX "idx_purchase_it_product_180810" ON "purchase_item_entity" ("product_id", "sku");
+CREATE INDEX "idx_inventory_t_product_fd92fe" ON "inventory_transaction" ("product_id", "sku", "created");
+CREATE INDEX "idx_inventory_t_product_0f08e1" ON "inventory_transaction_archive" ("product_id", "sku", "created");
+ALTER TABLE "inventory_checkpoint" ADD CONSTRAINT "uid_inventory_c_product_3b83c0" UNIQUE ("product_id", "sku", "watermark");"""
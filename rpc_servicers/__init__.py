@@ -1,2 +1,4 @@
+from .compression import CompressionInterceptor  # noqa
+from .health import HealthServicer  # noqa
 from .hello import HelloServicer  # noqa
 from .inventory import InventoryRpcServicer  # noqa
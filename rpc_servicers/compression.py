@@ -0,0 +1,63 @@
+import grpc
+from settings import GRPC_COMPRESSION_MIN_SIZE
+
+
+class CompressionInterceptor(grpc.aio.ServerInterceptor):
+    """
+    send the responses smaller than min_size uncompressed, the server
+    compresses the others with the algorithm it is created with when the
+    client accepts it (grpc-accept-encoding)
+    """
+
+    def __init__(self, min_size: int = GRPC_COMPRESSION_MIN_SIZE):
+        self.min_size = min_size
+
+    def _check_size(self, response, context):
+        if response.ByteSize() < self.min_size:
+            context.disable_next_message_compression()
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return handler
+
+        if handler.unary_unary:
+            behavior, wrap = (
+                handler.unary_unary,
+                grpc.unary_unary_rpc_method_handler,
+            )
+        elif handler.stream_unary:
+            behavior, wrap = (
+                handler.stream_unary,
+                grpc.stream_unary_rpc_method_handler,
+            )
+        elif handler.unary_stream:
+            behavior, wrap = (
+                handler.unary_stream,
+                grpc.unary_stream_rpc_method_handler,
+            )
+        else:
+            behavior, wrap = (
+                handler.stream_stream,
+                grpc.stream_stream_rpc_method_handler,
+            )
+
+        if handler.response_streaming:
+
+            async def _behavior(request, context):
+                async for response in behavior(request, context):
+                    self._check_size(response, context)
+                    yield response
+
+        else:
+
+            async def _behavior(request, context):
+                response = await behavior(request, context)
+                self._check_size(response, context)
+                return response
+
+        return wrap(
+            _behavior,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
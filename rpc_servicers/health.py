@@ -0,0 +1,39 @@
+import asyncio
+
+import grpc
+from generated import health_pb2, health_pb2_grpc
+from services.startup import get_readiness
+
+_SERVICES = ("", "inventory.InventoryService", "hello.HelloService")
+
+
+def _status() -> int:
+    if get_readiness().ready:
+        return health_pb2.HealthCheckResponse.SERVING
+    return health_pb2.HealthCheckResponse.NOT_SERVING
+
+
+class HealthServicer(health_pb2_grpc.HealthServicer):
+    """
+    readiness of the process, the empty service name stands for the whole
+    server. an answer at all, even NOT_SERVING, is the liveness
+    """
+
+    async def Check(self, request: health_pb2.HealthCheckRequest, context):
+        if request.service not in _SERVICES:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Unknown service %s" % request.service)
+            return health_pb2.HealthCheckResponse()
+        return health_pb2.HealthCheckResponse(status=_status())
+
+    async def Watch(self, request: health_pb2.HealthCheckRequest, context):
+        if request.service not in _SERVICES:
+            yield health_pb2.HealthCheckResponse(
+                status=health_pb2.HealthCheckResponse.SERVICE_UNKNOWN
+            )
+            # the protocol keeps the call open until the client cancels it
+            await asyncio.Future()
+        while True:
+            changed = get_readiness().changed
+            yield health_pb2.HealthCheckResponse(status=_status())
+            await changed.wait()
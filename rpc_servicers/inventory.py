@@ -1,18 +1,91 @@
+import uuid
+from datetime import datetime, timezone
+from typing import List, Union
+
 import grpc
-import tortoise.transactions
+import settings
 from generated import inventory_pb2, inventory_pb2_grpc
 from google.protobuf.timestamp_pb2 import Timestamp
 from models import SaleOrderStatusType
+from pydantic import ValidationError
+from services.id_allocator import IdSequenceType, allocate_ids
 from services.logger import logger
-from services.quantity import get_quantity
+from services.purchase_import import ImportFormatType, PurchaseImportService
+from services.quantity import get_quantity, get_quantity_as_of
 from services.sale_order import (
+    AutoFillSaleOrdersReq,
+    BulkAutoFillSaleOrders,
+    BulkTransitionSaleOrders,
     CreateSaleOrderReq,
+    CreateSaleOrderRes,
+    CreateSaleOrderResult,
     CreateSaleOrderService,
+    CreateSaleOrdersReq,
+    CreateSaleOrdersService,
     GetListSaleOrderService,
     SaleItemReq,
+    TransitionSaleOrdersReq,
+)
+from services.sharding import sharded_atomic, sharded_transaction
+from services.stock_counter import (
+    OutOfStockError,
+    get_stock_counter,
+    stock_deltas,
 )
+from services.stock_watch import get_stock_watcher
+from services.utils import retry_moved_rows, select_fields
 from tortoise.exceptions import IntegrityError
 
+# in the order of the message, id first
+_SALE_ORDER_SUMMARY_FIELDS = [
+    ele.name for ele in inventory_pb2.SaleOrderSummary.DESCRIPTOR.fields
+]
+
+
+def _to_create_sale_order_req(
+    request: inventory_pb2.CreateSaleOrderReq,
+) -> CreateSaleOrderReq:
+    return CreateSaleOrderReq(
+        id=request.id or None,
+        location=request.location or None,
+        sale_items=[
+            SaleItemReq(
+                product_id=ele.product_id,
+                sku=ele.sku,
+                quantity=ele.quantity,
+                price=ele.price,
+                unique_identifier=ele.unique_identifier,
+            )
+            for ele in request.items
+        ],
+    )
+
+
+def _to_sale_order_res(res: CreateSaleOrderRes) -> inventory_pb2.SaleOrderRes:
+    gg_created, gg_modified = Timestamp(), Timestamp()
+    (
+        gg_created.FromDatetime(res.created),
+        gg_modified.FromDatetime(res.modified),
+    )
+    return inventory_pb2.SaleOrderRes(
+        created=gg_created,
+        modified=gg_modified,
+        total_price=res.total_price,
+        total_units=res.total_units,
+        items=[
+            inventory_pb2.SaleOrderItem(
+                product_id=str(ele.product_id),
+                sku=ele.sku,
+                quantity=ele.quantity,
+                price=ele.price,
+            )
+            for ele in res.sale_items
+        ],
+        id=res.id,
+        status=res.status.value,
+        location=res.location,
+    )
+
 
 class InventoryRpcServicer(inventory_pb2_grpc.InventoryServiceServicer):
     async def GetQuantity(self, request, context):
@@ -27,20 +100,90 @@ class InventoryRpcServicer(inventory_pb2_grpc.InventoryServiceServicer):
             )
             return inventory_pb2.GetQuantityRes()
 
-        res = await get_quantity(
-            product_id=request.product_id, skus=request.skus
-        )
+        try:
+            if request.HasField("as_of"):
+                res = await get_quantity_as_of(
+                    as_of=request.as_of.ToDatetime(tzinfo=timezone.utc),
+                    product_id=request.product_id,
+                    skus=request.skus,
+                    location=request.location or None,
+                )
+            else:
+                res = await get_quantity(
+                    product_id=request.product_id,
+                    skus=request.skus,
+                    location=request.location or None,
+                )
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return inventory_pb2.GetQuantityRes()
         results = [
             inventory_pb2.QuantityBySku(
                 product_id=str(ele.product_id),
                 sku=ele.sku,
                 quantity=ele.quantity,
+                location=ele.location or "",
             )
             for ele in res.results
         ]
         return inventory_pb2.GetQuantityRes(results=results)
 
-    @tortoise.transactions.atomic()
+    async def WatchQuantity(
+        self, request: inventory_pb2.WatchQuantityReq, context
+    ):
+        logger.info(
+            "[%s] WatchQuantity: %s product_ids, %s skus"
+            % (
+                self.__class__.__name__,
+                len(request.product_ids),
+                len(request.skus),
+            )
+        )
+
+        if not settings.STOCK_WATCH_ENABLED:
+            context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+            context.set_details("STOCK_WATCH_ENABLED is not set")
+            return
+        if not request.product_ids and not request.skus:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(
+                "request.product_ids and request.skus are empty"
+            )
+            return
+        if (
+            len(request.product_ids) + len(request.skus)
+            > settings.STOCK_WATCH_MAX_KEYS
+        ):
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(
+                "At most %s product_ids and skus"
+                % settings.STOCK_WATCH_MAX_KEYS
+            )
+            return
+        try:
+            product_ids = [str(uuid.UUID(ele)) for ele in request.product_ids]
+        except ValueError:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("request.product_ids must be UUIDs")
+            return
+
+        async for res in get_stock_watcher().watch(
+            product_ids, list(request.skus)
+        ):
+            yield inventory_pb2.WatchQuantityRes(
+                snapshot=res.snapshot,
+                changes=[
+                    inventory_pb2.QuantityChange(
+                        product_id=str(ele.product_id),
+                        sku=ele.sku,
+                        quantity=ele.quantity,
+                        delta=ele.delta,
+                    )
+                    for ele in res.changes
+                ],
+            )
+
     async def CreateSaleOrder(
         self, request: inventory_pb2.CreateSaleOrderReq, context
     ):
@@ -53,48 +196,204 @@ class InventoryRpcServicer(inventory_pb2_grpc.InventoryServiceServicer):
             context.set_details("request.items is empty")
             return inventory_pb2.SaleOrderRes()
 
-        data = CreateSaleOrderReq(
-            id=request.id,
-            sale_items=[
-                SaleItemReq(
-                    product_id=ele.product_id,
-                    sku=ele.sku,
-                    quantity=ele.quantity,
-                    price=ele.price,
-                    unique_identifier=ele.unique_identifier,
-                )
-                for ele in request.items
-            ],
-        )
-        handler = CreateSaleOrderService(data=data)
         try:
-            res = await handler.create()
+            handler = CreateSaleOrderService(
+                data=_to_create_sale_order_req(request)
+            )
+            deltas = stock_deltas(handler.sale_items, sign=-1)
+            async with get_stock_counter().reservation(deltas):
+                if settings.GROUP_COMMIT_ENABLED:
+                    res = await handler.create_group_commit()
+                else:
+                    async with sharded_transaction():
+                        res = await handler.create()
+        except OutOfStockError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(str(e))
+            return inventory_pb2.SaleOrderRes()
         except IntegrityError:
             context.set_code(grpc.StatusCode.ALREADY_EXISTS)
             context.set_details("Sale order id already exists")
             return inventory_pb2.SaleOrderRes()
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return inventory_pb2.SaleOrderRes()
+
+        return _to_sale_order_res(res)
 
-        gg_created, gg_modified = Timestamp(), Timestamp()
-        (
-            gg_created.FromDatetime(res.created),
-            gg_modified.FromDatetime(res.modified),
+    async def CreateSaleOrders(
+        self, request: inventory_pb2.CreateSaleOrdersReq, context
+    ):
+        logger.info(
+            "[%s] CreateSaleOrders: %s orders"
+            % (self.__class__.__name__, len(request.orders))
         )
-        return inventory_pb2.SaleOrderRes(
-            created=gg_created,
-            modified=gg_modified,
-            total_price=res.total_price,
-            total_units=res.total_units,
-            items=[
-                inventory_pb2.SaleOrderItem(
-                    product_id=str(ele.product_id),
-                    sku=ele.sku,
-                    quantity=ele.quantity,
-                    price=ele.price,
+
+        if not request.orders:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("request.orders is empty")
+            return inventory_pb2.CreateSaleOrdersRes()
+
+        # an order that doesn't convert (e.g. a malformed product_id) only
+        # fails its own result slot
+        results: List[Union[CreateSaleOrderResult, None]] = []
+        orders = []
+        for ele in request.orders:
+            try:
+                orders.append(_to_create_sale_order_req(ele))
+                results.append(None)
+            except ValidationError as e:
+                results.append(
+                    CreateSaleOrderResult(
+                        id=ele.id,
+                        error="; ".join(
+                            "%s: %s"
+                            % (".".join(map(str, err["loc"])), err["msg"])
+                            for err in e.errors()
+                        ),
+                    )
                 )
-                for ele in res.sale_items
+
+        if orders:
+            handler = CreateSaleOrdersService(
+                data=CreateSaleOrdersReq(orders=orders)
+            )
+            created = iter((await handler.create_reserved()).results)
+            results = [ele or next(created) for ele in results]
+        return inventory_pb2.CreateSaleOrdersRes(
+            results=[
+                inventory_pb2.CreateSaleOrderResult(
+                    id=ele.id,
+                    order=_to_sale_order_res(ele.order) if ele.order else None,
+                    error=ele.error or "",
+                )
+                for ele in results
+            ]
+        )
+
+    @retry_moved_rows()
+    @sharded_atomic()
+    async def AutoFillSaleOrders(
+        self, request: inventory_pb2.AutoFillSaleOrdersReq, context
+    ):
+        logger.info(
+            "[%s] AutoFillSaleOrders: %s" % (self.__class__.__name__, request)
+        )
+
+        handler = BulkAutoFillSaleOrders(
+            data=AutoFillSaleOrdersReq(
+                sale_ids=list(request.sale_ids), limit=request.limit or None
+            )
+        )
+        res = await handler.auto_fill()
+        return inventory_pb2.AutoFillSaleOrdersRes(
+            confirmed_ids=res.confirmed_ids, short_ids=res.short_ids
+        )
+
+    async def AllocateIds(
+        self, request: inventory_pb2.AllocateIdsReq, context
+    ):
+        logger.info(
+            "[%s] AllocateIds: %s" % (self.__class__.__name__, request)
+        )
+
+        sequence = (
+            IdSequenceType.PURCHASE
+            if request.sequence == inventory_pb2.PURCHASE_IDS
+            else IdSequenceType.SALE_ORDER
+        )
+        try:
+            ids = await allocate_ids(sequence, request.count or 1)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return inventory_pb2.AllocateIdsRes()
+        return inventory_pb2.AllocateIdsRes(ids=ids)
+
+    async def TransitionSaleOrders(
+        self, request: inventory_pb2.TransitionSaleOrdersReq, context
+    ):
+        logger.info(
+            "[%s] TransitionSaleOrders: %s orders to %s"
+            % (
+                self.__class__.__name__,
+                len(request.sale_ids),
+                inventory_pb2.SaleOrderStatus.Name(request.status),
+            )
+        )
+
+        try:
+            handler = BulkTransitionSaleOrders(
+                data=TransitionSaleOrdersReq(
+                    sale_ids=list(request.sale_ids),
+                    status=SaleOrderStatusType[
+                        inventory_pb2.SaleOrderStatus.Name(request.status)
+                    ],
+                )
+            )
+        except (KeyError, ValueError):
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(
+                "status must be SHIPPED, DELIVERED or CANCELLED"
+            )
+            return inventory_pb2.TransitionSaleOrdersRes()
+
+        res = await handler.transition()
+        return inventory_pb2.TransitionSaleOrdersRes(
+            transitioned_ids=res.transitioned_ids,
+            skipped_ids=res.skipped_ids,
+            released_entities=res.released_entities,
+        )
+
+    async def ImportPurchase(self, request_iterator, context):
+        try:
+            first = await request_iterator.__anext__()
+        except StopAsyncIteration:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("No import chunks received")
+            return inventory_pb2.ImportPurchaseRes()
+        logger.info(
+            "[%s] ImportPurchase: purchase_id=%s format=%s strict=%s"
+            % (
+                self.__class__.__name__,
+                first.purchase_id,
+                first.format,
+                first.strict,
+            )
+        )
+
+        async def _chunks():
+            yield first.data
+            async for ele in request_iterator:
+                yield ele.data
+
+        try:
+            handler = PurchaseImportService(
+                purchase_id=first.purchase_id or None,
+                import_format=(
+                    ImportFormatType.NDJSON
+                    if first.format == inventory_pb2.NDJSON
+                    else ImportFormatType.CSV
+                ),
+                strict=first.strict,
+                location=first.location or None,
+            )
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return inventory_pb2.ImportPurchaseRes()
+        res = await handler.run(_chunks())
+        return inventory_pb2.ImportPurchaseRes(
+            id=res.id or 0,
+            committed=res.committed,
+            imported_rows=res.imported_rows,
+            total_units=res.total_units,
+            total_price=res.total_price,
+            errors=[
+                inventory_pb2.ImportRowError(line=ele.line, error=ele.error)
+                for ele in res.errors
             ],
-            id=res.id,
-            status=res.status.value,
         )
 
     async def GetSaleOrders(
@@ -117,25 +416,31 @@ class InventoryRpcServicer(inventory_pb2_grpc.InventoryServiceServicer):
             )  # noqa
             _status_filter = SaleOrderStatusType[_status_filter.name]
 
-        handler = GetListSaleOrderService()
+        try:
+            handler = GetListSaleOrderService(
+                fields=select_fields(
+                    request.fields.paths, _SALE_ORDER_SUMMARY_FIELDS
+                )
+            )
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return inventory_pb2.GetSaleOrdersRes()
         res = await handler.get_list_sale_orders(
             limit=_limit, offset=_offset, status_filter=_status_filter
         )
         results = []
         for sale_order in res.results:
-            gg_created, gg_modified = Timestamp(), Timestamp()
-            (
-                gg_created.FromDatetime(sale_order.created),
-                gg_modified.FromDatetime(sale_order.modified),
-            )
-            sale_order_res = inventory_pb2.SaleOrderSummary(
-                id=sale_order.id,
-                status=sale_order.status.value,
-                total_price=sale_order.total_price,
-                total_units=sale_order.total_units,
-                created=gg_created,
-                modified=gg_modified,
-            )
-            results.append(sale_order_res)
+            values = {}
+            for name in handler.fields:
+                value = getattr(sale_order, name)
+                if isinstance(value, datetime):
+                    gg_value = Timestamp()
+                    gg_value.FromDatetime(value)
+                    value = gg_value
+                elif isinstance(value, SaleOrderStatusType):
+                    value = value.value
+                values[name] = value
+            results.append(inventory_pb2.SaleOrderSummary(**values))
 
         return inventory_pb2.GetSaleOrdersRes(results=results, total=res.total)
@@ -0,0 +1,52 @@
+"""_summary_ command to print a sales and stock report as CSV
+    - units-sold: units sold per SKU and day or week, with their trailing
+      mean over --rolling periods
+    - velocity: units sold, revenue, on hand, days of cover and
+      sell-through per SKU
+    over the days [--start, --end) in UTC, the last REPORT_DEFAULT_DAYS
+    by default
+
+    python salesReport.py units-sold|velocity [--start 2026-10-01]
+                          [--end 2026-11-01] [--period day|week]
+                          [--rolling 7] [--location default]
+                          [--output report.csv]
+"""
+
+import argparse
+import sys
+from datetime import date
+
+import settings
+from services.report import ReportPeriodType, SalesReportService
+from tortoise import Tortoise, run_async
+
+
+async def main(args):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    handler = SalesReportService(
+        start=args.start, end=args.end, location=args.location
+    )
+    if args.report == "units-sold":
+        frame = await handler.units_sold(args.period, args.rolling)
+    else:
+        frame = await handler.velocity()
+    frame.to_csv(args.output or sys.stdout, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("report", choices=["units-sold", "velocity"])
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    parser.add_argument(
+        "--period",
+        type=ReportPeriodType,
+        choices=list(ReportPeriodType),
+        default=ReportPeriodType.DAY,
+    )
+    parser.add_argument(
+        "--rolling", type=int, help="periods of the trailing mean"
+    )
+    parser.add_argument("--location")
+    parser.add_argument("--output", help="file to write, stdout when unset")
+    run_async(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+# before the other imports, the startup time includes them
+import boot  # isort: skip
+import asyncio
+
+import settings
+import uvicorn
+from services.logger import logger
+from services.startup import get_readiness
+
+from server_fastapi import app, shutdown
+from server_grpc import connect_db, start_server
+
+
+class _HttpServer(uvicorn.Server):
+    def handle_exit(self, sig, frame):
+        # SIGTERM/SIGINT of the process, both servers drain from here
+        get_readiness().set_ready(False)
+        super().handle_exit(sig, frame)
+
+
+async def serve():
+    """
+    the gRPC server and the FastAPI app on one event loop, sharing the
+    Tortoise pools, the stock counter and every other in-process cache
+    """
+    grpc_server = await start_server()
+    http_server = _HttpServer(
+        uvicorn.Config(
+            app,
+            host=settings.LISTEN_ADDRESS,
+            port=int(settings.HTTP_PORT),
+            # the startup below replaces the app's own
+            lifespan="off",
+        )
+    )
+    http_task = asyncio.create_task(http_server.serve())
+    try:
+        await connect_db()
+    except BaseException:
+        http_server.should_exit = True
+        await grpc_server.stop(None)
+        raise
+    get_readiness().mark_started(boot.STARTED)
+
+    # until SIGTERM/SIGINT, then the in-flight HTTP requests are finished
+    await http_task
+    await grpc_server.stop(settings.GRPC_SHUTDOWN_GRACE)
+    await shutdown()
+
+
+def main():
+    loop_factory = None
+    if settings.UVLOOP_ENABLED:
+        try:
+            import uvloop
+
+            loop_factory = uvloop.new_event_loop
+        except ImportError:
+            logger.warning("uvloop is not installed, using asyncio's loop")
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(serve())
+
+
+if __name__ == "__main__":
+    main()
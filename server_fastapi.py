@@ -1,18 +1,37 @@
+# before the other imports, the startup time includes them
+import boot  # isort: skip
 import asyncio
+from typing import List
 
 import settings
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
+from services.startup import get_readiness, init_db
+from services.stock_counter import get_stock_counter
+from services.utils import BatcherStats, get_batcher_stats
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from tortoise import Tortoise
 
 from fast_routers import PurchaseRouter
+from fast_routers.report import ReportRouter
 from fast_routers.sale_order import SaleOrderRouter
+from fast_routers.stock import StockRouter
+from fast_routers.valuation import ValuationRouter
 
 middleware = [
     # TODO: change to specific origins
     Middleware(CORSMiddleware, allow_origins=["*"]),
 ]
+if settings.HTTP_GZIP_ENABLED:
+    # only for clients sending Accept-Encoding: gzip
+    middleware.append(
+        Middleware(
+            GZipMiddleware,
+            minimum_size=settings.HTTP_GZIP_MIN_SIZE,
+            compresslevel=settings.HTTP_GZIP_LEVEL,
+        )
+    )
 app = FastAPI(
     middleware=middleware, version=settings.VERSION, title="Pet Store"
 )
@@ -20,24 +39,51 @@ app = FastAPI(
 
 @app.get("/health")
 async def root():
+    """
+    liveness, answers as soon as the process serves requests
+    """
     return {"message": "Hello World"}
 
 
+@app.get("/ready")
+async def ready(response: Response):
+    """
+    readiness, 503 until the pools are warm and from the shutdown on
+    """
+    readiness = get_readiness()
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "ready": readiness.ready,
+        "startup_seconds": readiness.startup_seconds,
+    }
+
+
+@app.get("/stats/bulk-insert")
+async def bulk_insert_stats() -> List[BatcherStats]:
+    return get_batcher_stats()
+
+
 app.include_router(PurchaseRouter(), prefix="/purchases", tags=["purchases"])
 app.include_router(
     SaleOrderRouter(), prefix="/sale-orders", tags=["sale-orders"]
 )
+app.include_router(StockRouter(), prefix="/stock", tags=["stock"])
+app.include_router(ReportRouter(), prefix="/reports", tags=["reports"])
+app.include_router(ValuationRouter(), prefix="/valuation", tags=["valuation"])
 
 
 @app.on_event("startup")
 async def startup():
-    if not await settings.check_db_connection(uri=settings.DATABASE_URI):
-        raise Exception("Can not connect to the database")
-    await Tortoise.init(config=settings.TORTOISE_ORM)
+    await init_db()
+    await get_stock_counter().start()
+    get_readiness().mark_started(boot.STARTED)
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    get_readiness().set_ready(False)
+    await get_stock_counter().stop()
     await Tortoise.close_connections()
 
 
@@ -1,30 +1,53 @@
+# before the other imports, the startup time includes them
+import boot  # isort: skip
 import asyncio
+import signal
 
 import grpc
 import settings
-from generated import hello_pb2_grpc, inventory_pb2_grpc
-from rpc_servicers import HelloServicer, InventoryRpcServicer
+from generated import health_pb2_grpc, hello_pb2_grpc, inventory_pb2_grpc
+from rpc_servicers import (
+    CompressionInterceptor,
+    HealthServicer,
+    HelloServicer,
+    InventoryRpcServicer,
+)
 from services.logger import logger
-from tortoise import Tortoise
+from services.startup import get_readiness, init_db
+from services.stock_counter import get_stock_counter
 
 _LISTEN_ADDRESS_TEMPLATE = f"{settings.LISTEN_ADDRESS}:%s"
+_COMPRESSIONS = {
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
 
 
 async def connect_db():
-    if not await settings.check_db_connection(uri=settings.DATABASE_URI):
-        raise Exception("Can not connect to the database")
-
     logger.info("Connecting database ...")
-    await Tortoise.init(config=settings.TORTOISE_ORM)
-    Tortoise.get_connection("default")
+    await init_db()
     logger.info("Connected database")
+    await get_stock_counter().start()
 
 
-async def serve():
-    await connect_db()
-    #
+async def shutdown(server: grpc.aio.Server):
+    # reported NOT_SERVING while the in-flight calls finish
+    get_readiness().set_ready(False)
+    await server.stop(settings.GRPC_SHUTDOWN_GRACE)
+
+
+async def start_server() -> grpc.aio.Server:
+    """
+    started before the database, the health service answers NOT_SERVING
+    until the pools are warm
+    """
     logger.info("Starting asyncio server ...")
-    server = grpc.aio.server()
+    compression = _COMPRESSIONS.get(settings.GRPC_COMPRESSION)
+    server = grpc.aio.server(
+        compression=compression,
+        interceptors=[CompressionInterceptor()] if compression else None,
+    )
+    health_pb2_grpc.add_HealthServicer_to_server(HealthServicer(), server)
     hello_pb2_grpc.add_HelloServiceServicer_to_server(HelloServicer(), server)
     inventory_pb2_grpc.add_InventoryServiceServicer_to_server(
         InventoryRpcServicer(), server
@@ -53,6 +76,16 @@ async def serve():
         settings.GRPC_PORT,
         settings.ENABLED_TLS,
     )
+    return server
+
+
+async def serve():
+    server = await start_server()
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, lambda: asyncio.create_task(shutdown(server))
+    )
+    await connect_db()
+    get_readiness().mark_started(boot.STARTED)
     await server.wait_for_termination()
 
 
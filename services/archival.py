@@ -0,0 +1,331 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Union
+
+from models import (
+    EntityArchivalModel,
+    EntityArchivalStatusType,
+    EntityStockStatusType,
+    SaleOrderStatusType,
+)
+from pydantic import BaseModel
+from services.logger import logger
+from services.sharding import (
+    fan_out,
+    group_by_shard,
+    is_sharded,
+    shard_connection,
+    sharded_transaction,
+)
+from settings import (
+    ARCHIVE_BATCH_SIZE,
+    ARCHIVE_RETENTION_DAYS,
+    ARCHIVE_THROTTLE_MS,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
+from tortoise import Tortoise
+
+
+class EntityArchivalRes(BaseModel):
+    id: int
+    cutoff: datetime
+    status: EntityArchivalStatusType
+    moved_rows: int
+    rows_per_second: float
+
+
+class SaleOrderEntityRes(BaseModel):
+    id: uuid.UUID
+    sale_order_item_id: uuid.UUID
+    location: str
+    product_id: uuid.UUID
+    sku: str
+    unique_identifier: Union[str, None]
+    status: EntityStockStatusType
+    purchase_id: int
+    archived: bool
+
+
+class EntityArchivalService:
+    """
+    move the entity links of sale orders delivered before the cutoff and
+    their sold entities to the archive tables, one batch of orders per
+    database transaction, throttle_ms between batches. the links are
+    archived on the default connection and the entities on their shard
+    """
+
+    def __init__(
+        self,
+        retention_days: int = ARCHIVE_RETENTION_DAYS,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        throttle_ms: int = ARCHIVE_THROTTLE_MS,
+    ):
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.throttle = throttle_ms / 1000
+
+    async def run(self) -> Union[EntityArchivalRes, None]:
+        archival = await self.get_or_create_archival()
+        if not archival:
+            logger.info("[%s] nothing to archive" % self.__class__.__name__)
+            return None
+
+        started = time.perf_counter()
+        moved_rows = 0
+        while True:
+            batch_rows = await self.archive_batch(archival)
+            if batch_rows is None:
+                break
+            moved_rows += batch_rows
+            logger.info(
+                "[%s] archival %s moved %s rows, cursor %s, %.0f rows/s"
+                % (
+                    self.__class__.__name__,
+                    archival.id,
+                    archival.moved_rows,
+                    archival.last_sale_order_id,
+                    moved_rows / (time.perf_counter() - started),
+                )
+            )
+            await asyncio.sleep(self.throttle)
+
+        archival.status = EntityArchivalStatusType.COMPLETED.value
+        await archival.save(update_fields=["status", "modified"])
+        elapsed = time.perf_counter() - started
+        return EntityArchivalRes(
+            id=archival.id,
+            cutoff=archival.cutoff,
+            status=archival.status,
+            moved_rows=archival.moved_rows,
+            rows_per_second=moved_rows / elapsed if elapsed else 0,
+        )
+
+    async def get_or_create_archival(
+        self,
+    ) -> Union[EntityArchivalModel, None]:
+        """
+        resume the unfinished archival if any,
+        otherwise start a new one when the cutoff moved forward
+        """
+        running = (
+            await EntityArchivalModel.filter(
+                status=EntityArchivalStatusType.RUNNING.value
+            )
+            .order_by("-id")
+            .first()
+        )
+        if running:
+            logger.info(
+                "[%s] resume archival %s"
+                % (self.__class__.__name__, running.id)
+            )
+            return running
+
+        cutoff = datetime.now(timezone.utc) - timedelta(
+            days=self.retention_days
+        )
+        last_completed = (
+            await EntityArchivalModel.filter(
+                status=EntityArchivalStatusType.COMPLETED.value
+            )
+            .order_by("-cutoff")
+            .first()
+        )
+        if last_completed and last_completed.cutoff >= cutoff:
+            return None
+
+        return await EntityArchivalModel.create(cutoff=cutoff)
+
+    async def archive_batch(
+        self, archival: EntityArchivalModel
+    ) -> Union[int, None]:
+        """
+        archive the next batch of delivered orders after the cursor,
+        return the rows moved or None when no order is left
+        """
+        links_sql = """
+            WITH moved_links AS (
+                DELETE FROM sale_order_item_entity
+                WHERE sale_order_id = ANY($1::int[])
+                RETURNING *
+            ), archived_links AS (
+                INSERT INTO sale_order_item_entity_archive (
+                    id, created, modified, purchase_item_entity_id,
+                    sale_order_id, sale_order_item_id, xact_id
+                )
+                SELECT id, created, modified, purchase_item_entity_id,
+                    sale_order_id, sale_order_item_id, xact_id
+                FROM moved_links
+            )
+            SELECT moved_links.purchase_item_entity_id, item.product_id
+            FROM moved_links
+            INNER JOIN sale_order_item item
+                ON item.id = moved_links.sale_order_item_id
+            """
+        entities_sql = """
+            WITH moved_entities AS (
+                DELETE FROM purchase_item_entity
+                WHERE status = $2 AND id = ANY($1::uuid[])
+                RETURNING *
+            ), archived_entities AS (
+                INSERT INTO purchase_item_entity_archive (
+                    id, created, modified, location, product_id, sku,
+                    unique_identifier, status, purchase_id, purchase_item_id
+                )
+                SELECT id, created, modified, location, product_id, sku,
+                    unique_identifier, status, purchase_id, purchase_item_id
+                FROM moved_entities
+            )
+            SELECT COUNT(*) AS entities FROM moved_entities
+            """
+
+        async with sharded_transaction() as conn:
+            _, list_values = await conn.execute_query(
+                """
+                SELECT id FROM sale_order
+                WHERE status = $1 AND modified < $2 AND id > $3
+                ORDER BY id
+                LIMIT $4
+                """,
+                [
+                    SaleOrderStatusType.DELIVERED.value,
+                    archival.cutoff,
+                    archival.last_sale_order_id,
+                    self.batch_size,
+                ],
+            )
+            if not list_values:
+                return None
+
+            sale_ids = [ele["id"] for ele in list_values]
+            _, links = await conn.execute_query(links_sql, [sale_ids])
+            moved_rows = len(links)
+            for shard, shard_links in group_by_shard(
+                links, lambda ele: ele["product_id"]
+            ).items():
+                shard_conn = await shard_connection(shard)
+                _, list_values = await shard_conn.execute_query(
+                    entities_sql,
+                    [
+                        [
+                            ele["purchase_item_entity_id"]
+                            for ele in shard_links
+                        ],
+                        EntityStockStatusType.SOLD.value,
+                    ],
+                )
+                moved_rows += list_values[0]["entities"]
+            archival.last_sale_order_id = sale_ids[-1]
+            archival.moved_rows += moved_rows
+            await archival.save(
+                using_db=conn,
+                update_fields=["last_sale_order_id", "moved_rows", "modified"],
+            )
+        return moved_rows
+
+
+async def get_sale_order_entities(sale_id: int) -> List[SaleOrderEntityRes]:
+    """
+    entities allocated to a sale order, read from the archive when the
+    order is no longer in the hot tables, an order is archived at once
+    """
+    if is_sharded():
+        return await _get_sharded_sale_order_entities(sale_id)
+
+    raw_sql = """
+        SELECT entity.id, link.sale_order_item_id, entity.location,
+            entity.product_id, entity.sku, entity.unique_identifier,
+            entity.status, entity.purchase_id, %s as archived
+        FROM %s link
+        INNER JOIN %s entity ON entity.id = link.purchase_item_entity_id
+        WHERE link.sale_order_id = $1
+        ORDER BY link.sale_order_item_id, entity.id
+        """
+    conn = Tortoise.get_connection(TORTOISE_DEFAULT_CONN_NAME)
+    _, list_values = await conn.execute_query(
+        raw_sql % ("false", "sale_order_item_entity", "purchase_item_entity"),
+        [sale_id],
+    )
+    if not list_values:
+        _, list_values = await conn.execute_query(
+            raw_sql
+            % (
+                "true",
+                "sale_order_item_entity_archive",
+                "purchase_item_entity_archive",
+            ),
+            [sale_id],
+        )
+    return [SaleOrderEntityRes(**ele) for ele in list_values]
+
+
+async def _get_sharded_sale_order_entities(
+    sale_id: int,
+) -> List[SaleOrderEntityRes]:
+    """
+    the links are on the default connection and the entities on the
+    shards, both are archived together
+    """
+    entities = await _get_sharded_entities(
+        sale_id, "sale_order_item_entity", "purchase_item_entity", False
+    )
+    if not entities:
+        entities = await _get_sharded_entities(
+            sale_id,
+            "sale_order_item_entity_archive",
+            "purchase_item_entity_archive",
+            True,
+        )
+    return entities
+
+
+async def _get_sharded_entities(
+    sale_id: int, links_table: str, entities_table: str, archived: bool
+) -> List[SaleOrderEntityRes]:
+    _, links = await Tortoise.get_connection(
+        TORTOISE_DEFAULT_CONN_NAME
+    ).execute_query(
+        f"""
+        SELECT link.sale_order_item_id, link.purchase_item_entity_id,
+            item.product_id
+        FROM {links_table} link
+        INNER JOIN sale_order_item item ON item.id = link.sale_order_item_id
+        WHERE link.sale_order_id = $1
+        """,
+        [sale_id],
+    )
+    links_by_shard = group_by_shard(links, lambda ele: ele["product_id"])
+
+    async def _get_entities(shard: str) -> List[dict]:
+        _, list_values = await Tortoise.get_connection(shard).execute_query(
+            f"""
+            SELECT link.sale_order_item_id, entity.id, entity.location,
+                entity.product_id, entity.sku, entity.unique_identifier,
+                entity.status, entity.purchase_id, $3::bool as archived
+            FROM unnest($1::uuid[], $2::uuid[])
+                AS link(sale_order_item_id, purchase_item_entity_id)
+            INNER JOIN {entities_table} entity
+                ON entity.id = link.purchase_item_entity_id
+            """,
+            [
+                [ele["sale_order_item_id"] for ele in links_by_shard[shard]],
+                [
+                    ele["purchase_item_entity_id"]
+                    for ele in links_by_shard[shard]
+                ],
+                archived,
+            ],
+        )
+        return list_values
+
+    results = await fan_out(_get_entities, links_by_shard)
+    return sorted(
+        (
+            SaleOrderEntityRes(**ele)
+            for list_values in results.values()
+            for ele in list_values
+        ),
+        key=lambda ele: (str(ele.sale_order_item_id), str(ele.id)),
+    )
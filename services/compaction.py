@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+from typing import Union
+
+from models import LedgerCompactionModel, LedgerCompactionStatusType
+from pydantic import BaseModel
+from services.logger import logger
+from settings import (
+    LEDGER_COMPACTION_BATCH_SIZE,
+    LEDGER_RETENTION_DAYS,
+    STOCK_LOCATIONS,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+
+class LedgerCompactionRes(BaseModel):
+    id: int
+    watermark: datetime
+    status: LedgerCompactionStatusType
+    moved_rows: int
+
+
+class LedgerCompactionService:
+    """
+    roll inventory_transaction rows older than the watermark into
+    inventory_checkpoint and move them to inventory_transaction_archive,
+    one batch of (product_id, sku) per database transaction. when sharded
+    each shard is compacted on its own and keeps its compaction state
+    """
+
+    def __init__(
+        self,
+        retention_days: int = LEDGER_RETENTION_DAYS,
+        batch_size: int = LEDGER_COMPACTION_BATCH_SIZE,
+        conn_name: str = TORTOISE_DEFAULT_CONN_NAME,
+    ):
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.conn_name = conn_name
+
+    async def run(self) -> Union[LedgerCompactionRes, None]:
+        compaction = await self.get_or_create_compaction()
+        if not compaction:
+            logger.info("[%s] nothing to compact" % self.__class__.__name__)
+            return None
+
+        while await self.compact_batch(compaction):
+            logger.info(
+                "[%s] compaction %s moved %s rows, cursor (%s, %s)"
+                % (
+                    self.__class__.__name__,
+                    compaction.id,
+                    compaction.moved_rows,
+                    compaction.last_product_id,
+                    compaction.last_sku,
+                )
+            )
+
+        compaction.status = LedgerCompactionStatusType.COMPLETED.value
+        await compaction.save(
+            using_db=Tortoise.get_connection(self.conn_name),
+            update_fields=["status", "modified"],
+        )
+        return LedgerCompactionRes(**compaction.__dict__)
+
+    async def get_or_create_compaction(
+        self,
+    ) -> Union[LedgerCompactionModel, None]:
+        """
+        resume the unfinished compaction if any,
+        otherwise start a new one when the watermark moved forward
+        """
+        conn = Tortoise.get_connection(self.conn_name)
+        running = (
+            await LedgerCompactionModel.filter(
+                status=LedgerCompactionStatusType.RUNNING.value
+            )
+            .using_db(conn)
+            .order_by("-id")
+            .first()
+        )
+        if running:
+            logger.info(
+                "[%s] resume compaction %s"
+                % (self.__class__.__name__, running.id)
+            )
+            return running
+
+        watermark = datetime.now(timezone.utc) - timedelta(
+            days=self.retention_days
+        )
+        last_completed = (
+            await LedgerCompactionModel.filter(
+                status=LedgerCompactionStatusType.COMPLETED.value
+            )
+            .using_db(conn)
+            .order_by("-watermark")
+            .first()
+        )
+        if last_completed and last_completed.watermark >= watermark:
+            return None
+
+        return await LedgerCompactionModel.create(
+            watermark=watermark, using_db=conn
+        )
+
+    async def compact_batch(self, compaction: LedgerCompactionModel) -> bool:
+        """
+        compact the next batch of (product_id, sku) after the cursor,
+        return False when there is nothing left below the watermark
+        """
+        select_keys_sql = """
+            SELECT DISTINCT product_id, sku
+            FROM inventory_transaction
+            WHERE created < $1
+                AND ($2::uuid IS NULL OR (product_id, sku) > ($2, $3::varchar))
+            ORDER BY product_id, sku
+            LIMIT $4
+            """
+        compact_sql = """
+            WITH batch_keys AS (
+                SELECT * FROM unnest($2::uuid[], $3::varchar[])
+                    AS k(product_id, sku)
+            ), moved AS (
+                DELETE FROM inventory_transaction it
+                USING batch_keys
+                WHERE it.location = ANY($4::varchar[])
+                    AND it.product_id = batch_keys.product_id
+                    AND it.sku = batch_keys.sku
+                    AND it.created < $1
+                RETURNING it.*
+            ), archived AS (
+                INSERT INTO inventory_transaction_archive (
+                    id, created, modified, location, product_id, sku,
+                    unique_identifier, quantity, transaction_type,
+                    purchase_id, sale_order_id, xact_id
+                )
+                SELECT id, created, modified, location, product_id, sku,
+                    unique_identifier, quantity, transaction_type,
+                    purchase_id, sale_order_id, xact_id
+                FROM moved
+            ), checkpoints AS (
+                INSERT INTO inventory_checkpoint (
+                    id, created, modified, location, product_id, sku,
+                    watermark, quantity
+                )
+                SELECT gen_random_uuid(), now(), now(), moved.location,
+                    moved.product_id, moved.sku, $1,
+                    COALESCE(prev.quantity, 0) + SUM(moved.quantity)
+                FROM moved
+                LEFT JOIN LATERAL (
+                    SELECT quantity
+                    FROM inventory_checkpoint ic
+                    WHERE ic.location = moved.location
+                        AND ic.product_id = moved.product_id
+                        AND ic.sku = moved.sku
+                    ORDER BY ic.watermark DESC
+                    LIMIT 1
+                ) prev ON true
+                GROUP BY moved.location, moved.product_id, moved.sku,
+                    prev.quantity
+                RETURNING id
+            )
+            SELECT (SELECT COUNT(*) FROM moved) AS moved_rows,
+                (SELECT COUNT(*) FROM checkpoints) AS checkpoints
+            """
+
+        async with in_transaction(self.conn_name) as conn:
+            _, keys = await conn.execute_query(
+                select_keys_sql,
+                [
+                    compaction.watermark,
+                    compaction.last_product_id,
+                    compaction.last_sku,
+                    self.batch_size,
+                ],
+            )
+            if not keys:
+                return False
+
+            _, list_values = await conn.execute_query(
+                compact_sql,
+                [
+                    compaction.watermark,
+                    [ele["product_id"] for ele in keys],
+                    [ele["sku"] for ele in keys],
+                    # matches the location-leading ledger index
+                    STOCK_LOCATIONS,
+                ],
+            )
+            compaction.last_product_id = keys[-1]["product_id"]
+            compaction.last_sku = keys[-1]["sku"]
+            compaction.moved_rows += list_values[0]["moved_rows"]
+            await compaction.save(
+                using_db=conn,
+                update_fields=[
+                    "last_product_id",
+                    "last_sku",
+                    "moved_rows",
+                    "modified",
+                ],
+            )
+        return True
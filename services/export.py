@@ -0,0 +1,280 @@
+"""
+incremental export to Parquet
+
+the ledger (inventory_transaction and its archive, so a compaction can't
+hide rows from a late export) and the purchase and sale order items are
+appended to Parquet files partitioned by day, for analysis off the
+database:
+
+    EXPORT_DIR/<source>/day=YYYY-MM-DD/<conn>-<created>-<id>.parquet
+
+every source and connection has a high-water mark (xact_id, created, id)
+in export_cursor, the rows after it are read in batches of batch_size in
+that order. xact_id is the id of the transaction that inserted the row,
+only the rows of transactions older than the xmin of the current snapshot
+are read: those transactions are over, so a transaction committing late,
+or a prepared shard transaction resolved later, can't land below the
+mark. a transaction left open holds the export back until it ends. the
+rows from before the column have xact_id 0 and keep their (created, id)
+order. a file is named after its first row and written atomically before
+the mark moves, so a batch interrupted by a crash is written again to the
+same files on the next run. rows are exported once, when created, later
+updates of an item are not exported again
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from models import ExportCursorModel
+from pydantic import BaseModel
+from services.logger import logger
+from settings import (
+    EXPORT_BATCH_SIZE,
+    EXPORT_DIR,
+    STOCK_SHARD_CONN_NAMES,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
+from tortoise import Tortoise
+
+_TIMESTAMP = pa.timestamp("us", tz="UTC")
+_START_CREATED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_START_ID = uuid.UUID(int=0)
+
+_LEDGER_COLUMNS = [
+    ("id", pa.string()),
+    ("created", _TIMESTAMP),
+    ("modified", _TIMESTAMP),
+    ("location", pa.string()),
+    ("product_id", pa.string()),
+    ("sku", pa.string()),
+    ("unique_identifier", pa.string()),
+    ("quantity", pa.int32()),
+    ("transaction_type", pa.string()),
+    ("purchase_id", pa.int32()),
+    ("sale_order_id", pa.int32()),
+]
+_SALE_ORDER_ITEM_COLUMNS = [
+    ("id", pa.string()),
+    ("created", _TIMESTAMP),
+    ("modified", _TIMESTAMP),
+    ("sale_order_id", pa.int32()),
+    ("product_id", pa.string()),
+    ("sku", pa.string()),
+    ("price", pa.int32()),
+    ("quantity", pa.int32()),
+]
+_PURCHASE_ITEM_COLUMNS = [
+    ("id", pa.string()),
+    ("created", _TIMESTAMP),
+    ("modified", _TIMESTAMP),
+    ("purchase_id", pa.int32()),
+    ("product_id", pa.string()),
+    ("sku", pa.string()),
+    ("unique_identifier", pa.string()),
+    ("price", pa.int32()),
+    ("quantity", pa.int32()),
+]
+
+# $1, $2, $3 the high-water mark, $4 the batch size
+_BATCH_SQL = """
+    SELECT xact_id, %(columns)s FROM %(table)s
+    WHERE xact_id >= $1 AND (xact_id, created, id) > ($1, $2, $3)
+        AND xact_id < (
+            SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+        )
+    ORDER BY xact_id, created, id
+    LIMIT $4
+    """
+_LEDGER_BATCH_SQL = """
+    (%s) UNION ALL (%s)
+    ORDER BY xact_id, created, id
+    LIMIT $4
+    """
+
+
+def _batch_sql(table: str, columns: list) -> str:
+    return _BATCH_SQL % {
+        "columns": ", ".join(name for name, _ in columns),
+        "table": table,
+    }
+
+
+class ExportSource(BaseModel):
+    name: str
+    conn_names: List[str]
+    raw_sql: str
+    columns: list
+
+
+EXPORT_SOURCES: Dict[str, ExportSource] = {
+    source.name: source
+    for source in [
+        ExportSource(
+            name="inventory_transaction",
+            conn_names=STOCK_SHARD_CONN_NAMES,
+            raw_sql=_LEDGER_BATCH_SQL
+            % (
+                _batch_sql("inventory_transaction", _LEDGER_COLUMNS),
+                _batch_sql("inventory_transaction_archive", _LEDGER_COLUMNS),
+            ),
+            columns=_LEDGER_COLUMNS,
+        ),
+        ExportSource(
+            name="sale_order_item",
+            conn_names=[TORTOISE_DEFAULT_CONN_NAME],
+            raw_sql=_batch_sql("sale_order_item", _SALE_ORDER_ITEM_COLUMNS),
+            columns=_SALE_ORDER_ITEM_COLUMNS,
+        ),
+        ExportSource(
+            name="purchase_item",
+            conn_names=[TORTOISE_DEFAULT_CONN_NAME],
+            raw_sql=_batch_sql("purchase_item", _PURCHASE_ITEM_COLUMNS),
+            columns=_PURCHASE_ITEM_COLUMNS,
+        ),
+    ]
+}
+
+
+class ExportRes(BaseModel):
+    source: str
+    conn_name: str
+    last_created: Union[datetime, None]
+    exported_rows: int
+    files: int
+    rows_per_second: float
+
+
+class ParquetExportService:
+    """
+    export the rows created since the last run, the memory is bounded by
+    one batch whatever the backlog
+    """
+
+    def __init__(
+        self,
+        export_dir: str = EXPORT_DIR,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ):
+        self.export_dir = export_dir
+        self.batch_size = batch_size
+
+    async def run(
+        self, sources: Union[List[str], None] = None
+    ) -> List[ExportRes]:
+        results = []
+        for name in sources or list(EXPORT_SOURCES):
+            source = EXPORT_SOURCES[name]
+            for conn_name in source.conn_names:
+                results.append(await self.export(source, conn_name))
+        return results
+
+    async def export(self, source: ExportSource, conn_name: str) -> ExportRes:
+        cursor, _ = await ExportCursorModel.get_or_create(
+            source=source.name, conn_name=conn_name
+        )
+        schema = pa.schema(source.columns)
+        started = time.perf_counter()
+        exported_rows = 0
+        files = 0
+        while True:
+            _, list_values = await Tortoise.get_connection(
+                conn_name
+            ).execute_query(
+                source.raw_sql,
+                [
+                    cursor.last_xact_id,
+                    cursor.last_created or _START_CREATED,
+                    cursor.last_id or _START_ID,
+                    self.batch_size,
+                ],
+            )
+            if not list_values:
+                break
+
+            files += self.write_batch(
+                source.name, conn_name, schema, list_values
+            )
+            exported_rows += len(list_values)
+            # moved only once the files are in place
+            cursor.last_xact_id = list_values[-1]["xact_id"]
+            cursor.last_created = list_values[-1]["created"]
+            cursor.last_id = list_values[-1]["id"]
+            cursor.exported_rows += len(list_values)
+            await cursor.save(
+                update_fields=[
+                    "last_xact_id",
+                    "last_created",
+                    "last_id",
+                    "exported_rows",
+                    "modified",
+                ]
+            )
+            logger.info(
+                "[%s] %s from %s: %s rows, cursor %s"
+                % (
+                    self.__class__.__name__,
+                    source.name,
+                    conn_name,
+                    cursor.exported_rows,
+                    cursor.last_created,
+                )
+            )
+            if len(list_values) < self.batch_size:
+                break
+
+        elapsed = time.perf_counter() - started
+        return ExportRes(
+            source=source.name,
+            conn_name=conn_name,
+            last_created=cursor.last_created,
+            exported_rows=exported_rows,
+            files=files,
+            rows_per_second=exported_rows / elapsed if elapsed else 0,
+        )
+
+    def write_batch(
+        self, source: str, conn_name: str, schema: pa.Schema, rows: list
+    ) -> int:
+        """
+        one file per day of the batch, return the number of files
+        """
+        rows_by_day: Dict[str, list] = {}
+        for row in rows:
+            day = row["created"].astimezone(timezone.utc).date().isoformat()
+            rows_by_day.setdefault(day, []).append(row)
+
+        for day, day_rows in rows_by_day.items():
+            table = pa.Table.from_pydict(
+                {
+                    name: [
+                        str(row[name])
+                        if isinstance(row[name], uuid.UUID)
+                        else row[name]
+                        for row in day_rows
+                    ]
+                    for name in schema.names
+                },
+                schema=schema,
+            )
+            directory = os.path.join(self.export_dir, source, f"day={day}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(
+                directory,
+                "%s-%s-%s.parquet"
+                % (
+                    conn_name,
+                    day_rows[0]["created"]
+                    .astimezone(timezone.utc)
+                    .strftime("%H%M%S%f"),
+                    day_rows[0]["id"],
+                ),
+            )
+            # readers never see a partial file
+            pq.write_table(table, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return len(rows_by_day)
@@ -0,0 +1,34 @@
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel
+from settings import ID_BLOCK_MAX_SIZE, TORTOISE_DEFAULT_CONN_NAME
+from tortoise import Tortoise
+
+
+class IdSequenceType(str, Enum):
+    PURCHASE = "purchase"
+    SALE_ORDER = "sale_order"
+
+
+class AllocateIdsRes(BaseModel):
+    ids: List[int]
+
+
+async def allocate_ids(sequence: IdSequenceType, count: int = 1) -> List[int]:
+    """
+    take count ids from the serial sequence of the table,
+    nextval is never rolled back so concurrent callers never collide,
+    ids of one block are ascending but not always contiguous
+    """
+    if count < 1 or count > ID_BLOCK_MAX_SIZE:
+        raise ValueError(f"count must be between 1 and {ID_BLOCK_MAX_SIZE}")
+
+    raw_sql = """
+        SELECT nextval(pg_get_serial_sequence($1, 'id')) as id
+        FROM generate_series(1, $2)
+        """
+    _, list_values = await Tortoise.get_connection(
+        TORTOISE_DEFAULT_CONN_NAME
+    ).execute_query(raw_sql, [sequence.value, count])
+    return sorted(ele["id"] for ele in list_values)
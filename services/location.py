@@ -0,0 +1,23 @@
+from typing import List, Union
+
+from settings import DEFAULT_LOCATION, STOCK_LOCATIONS
+
+
+def resolve_location(location: Union[str, None]) -> str:
+    """
+    the given location or the default one, unknown locations are rejected
+    since the aggregate quantity only reads STOCK_LOCATIONS
+    """
+    if not location:
+        return DEFAULT_LOCATION
+    if location not in STOCK_LOCATIONS:
+        raise ValueError(f"Unknown location {location}")
+    return location
+
+
+def query_locations(location: Union[str, None]) -> List[str]:
+    """
+    the locations a quantity query reads, all of them when not given,
+    the location-leading indexes are scanned once per location
+    """
+    return [resolve_location(location)] if location else STOCK_LOCATIONS
@@ -0,0 +1,307 @@
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+from models import LedgerCompactionModel, LedgerCompactionStatusType
+from pydantic import BaseModel
+from services import quantity, sale_order
+from services.logger import logger
+from settings import LEDGER_PARTITION_MONTHS_AHEAD, TORTOISE_DEFAULT_CONN_NAME
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+LEDGER_TABLE = "inventory_transaction"
+LEDGER_PARTITION_PREFIX = f"{LEDGER_TABLE}_p"
+# rows of a month without partition, see
+# models/migrations/inventory/13_20261026093000_ledger_default_partition.py
+LEDGER_DEFAULT_PARTITION = f"{LEDGER_TABLE}_default"
+ENTITY_TABLE = "purchase_item_entity"
+_DETACH_LOCK_TIMEOUT = "5s"
+
+
+class PartitionPruningRes(BaseModel):
+    name: str
+    expected: List[str]
+    scanned: List[str]
+    pruned: bool
+
+
+def _month_start(value: datetime, months: int = 0) -> datetime:
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(
+        month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc
+    )
+
+
+def _partition_name(month_start: datetime) -> str:
+    return f"{LEDGER_PARTITION_PREFIX}{month_start.strftime('%Y%m')}"
+
+
+def _partition_month(name: str) -> datetime:
+    return datetime.strptime(
+        name[len(LEDGER_PARTITION_PREFIX) :], "%Y%m"
+    ).replace(tzinfo=timezone.utc)
+
+
+def _ledger_partitions_before(
+    partitions: List[str], created_before: Union[datetime, None]
+) -> List[str]:
+    """
+    the ledger partitions that may hold rows created before created_before,
+    all of them when None. the months before the partitioning are in the
+    history partition, the default one only holds months without partition
+    """
+    if created_before is None:
+        return sorted(partitions)
+    return sorted(
+        name
+        for name in partitions
+        if name != LEDGER_DEFAULT_PARTITION
+        and (
+            not name.startswith(LEDGER_PARTITION_PREFIX)
+            or _partition_month(name) < created_before
+        )
+    )
+
+
+def _scanned_relations(plan: dict) -> List[str]:
+    relations = []
+    if "Relation Name" in plan:
+        relations.append(plan["Relation Name"])
+    for sub_plan in plan.get("Plans", []):
+        relations.extend(_scanned_relations(sub_plan))
+    return relations
+
+
+class LedgerPartitionService:
+    """
+    manage the monthly partitions of inventory_transaction,
+    see models/migrations/inventory/3_20261019143000_partitioning.py
+    """
+
+    def __init__(
+        self,
+        months_ahead: int = LEDGER_PARTITION_MONTHS_AHEAD,
+        conn_name: str = TORTOISE_DEFAULT_CONN_NAME,
+    ):
+        self.months_ahead = months_ahead
+        self.conn_name = conn_name
+        self.conn = Tortoise.get_connection(conn_name)
+
+    async def list_partitions(self) -> List[str]:
+        raw_sql = """
+            SELECT child.relname as name
+            FROM pg_inherits
+            INNER JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+            INNER JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+            WHERE parent.relname = $1 AND child.relname LIKE $2
+            ORDER BY child.relname
+            """
+        _, list_values = await self.conn.execute_query(
+            raw_sql, [LEDGER_TABLE, f"{LEDGER_PARTITION_PREFIX}%"]
+        )
+        return [ele["name"] for ele in list_values]
+
+    async def list_all_partitions(self) -> Dict[str, List[str]]:
+        """
+        the partitions of every partitioned table by table name
+        """
+        raw_sql = """
+            SELECT parent.relname as parent, child.relname as name
+            FROM pg_inherits
+            INNER JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+            INNER JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+            WHERE parent.relkind = 'p'
+            ORDER BY child.relname
+            """
+        _, list_values = await self.conn.execute_query(raw_sql)
+        partitions: Dict[str, List[str]] = {}
+        for ele in list_values:
+            partitions.setdefault(ele["parent"], []).append(ele["name"])
+        return partitions
+
+    async def create_future_partitions(self) -> List[str]:
+        """
+        make sure the current month and the next months_ahead months exist
+        """
+        existing = set(await self.list_partitions())
+        now = datetime.now(timezone.utc)
+        created = []
+        for months in range(self.months_ahead + 1):
+            month_start = _month_start(now, months)
+            name = _partition_name(month_start)
+            if name in existing:
+                continue
+            await self.create_partition(name, month_start)
+            created.append(name)
+            logger.info(
+                "[%s] created partition %s" % (self.__class__.__name__, name)
+            )
+        return created
+
+    async def create_partition(self, name: str, month_start: datetime):
+        """
+        the rows of the month already in the default partition, written
+        while the month had no partition, are moved to the new one
+        """
+        month_end = _month_start(month_start, 1)
+        create_sql = f"""
+            CREATE TABLE IF NOT EXISTS "{name}"
+            PARTITION OF "{LEDGER_TABLE}"
+            FOR VALUES FROM ('{month_start.isoformat()}')
+            TO ('{month_end.isoformat()}')
+            """
+        _, list_values = await self.conn.execute_query(
+            f"""
+            SELECT EXISTS (
+                SELECT 1 FROM "{LEDGER_DEFAULT_PARTITION}"
+                WHERE created >= $1 AND created < $2
+            ) as not_empty
+            """,
+            [month_start, month_end],
+        )
+        if not list_values[0]["not_empty"]:
+            await self.conn.execute_script(create_sql)
+            return
+
+        logger.warning(
+            "[%s] moving the rows of %s out of %s"
+            % (self.__class__.__name__, name, LEDGER_DEFAULT_PARTITION)
+        )
+        # the new partition can't be attached while the default one holds
+        # rows of its range, the ledger is locked until the commit
+        async with in_transaction(self.conn_name) as conn:
+            await conn.execute_script(
+                f'ALTER TABLE "{LEDGER_TABLE}" '
+                f'DETACH PARTITION "{LEDGER_DEFAULT_PARTITION}"'
+            )
+            await conn.execute_script(create_sql)
+            await conn.execute_query(
+                f"""
+                WITH moved AS (
+                    DELETE FROM "{LEDGER_DEFAULT_PARTITION}"
+                    WHERE created >= $1 AND created < $2
+                    RETURNING *
+                )
+                INSERT INTO "{LEDGER_TABLE}" SELECT * FROM moved
+                """,
+                [month_start, month_end],
+            )
+            await conn.execute_script(
+                f'ALTER TABLE "{LEDGER_TABLE}" '
+                f'ATTACH PARTITION "{LEDGER_DEFAULT_PARTITION}" DEFAULT'
+            )
+
+    async def detach_old_partitions(self, drop: bool = False) -> List[str]:
+        """
+        detach the months fully covered by the last completed compaction,
+        their rows already live in inventory_checkpoint and the archive
+        """
+        last_completed = (
+            await LedgerCompactionModel.filter(
+                status=LedgerCompactionStatusType.COMPLETED.value
+            )
+            .using_db(self.conn)
+            .order_by("-watermark")
+            .first()
+        )
+        if not last_completed:
+            return []
+
+        detached = []
+        for name in await self.list_partitions():
+            month_start = _partition_month(name)
+            if _month_start(month_start, 1) > last_completed.watermark:
+                continue
+
+            _, list_values = await self.conn.execute_query(
+                f'SELECT EXISTS (SELECT 1 FROM "{name}") as not_empty'
+            )
+            if list_values[0]["not_empty"]:
+                logger.warning(
+                    "[%s] partition %s still has rows, skip"
+                    % (self.__class__.__name__, name)
+                )
+                continue
+
+            # CONCURRENTLY is refused next to a default partition, the
+            # partition is empty so the lock is short, give up rather than
+            # queue the ledger writes behind a long query
+            async with in_transaction(self.conn_name) as conn:
+                await conn.execute_script(
+                    f"SET LOCAL lock_timeout = '{_DETACH_LOCK_TIMEOUT}'"
+                )
+                await conn.execute_script(
+                    f'ALTER TABLE "{LEDGER_TABLE}" DETACH PARTITION "{name}"'
+                )
+            if drop:
+                await self.conn.execute_script(f'DROP TABLE "{name}"')
+            detached.append(name)
+            logger.info(
+                "[%s] detached partition %s, dropped=%s"
+                % (self.__class__.__name__, name, drop)
+            )
+        return detached
+
+    async def check_pruning(self) -> List[PartitionPruningRes]:
+        """
+        EXPLAIN the service statements on the partitioned tables and report
+        the partitions they scan, the ledger totals read every partition
+        on purpose, compaction keeps them small
+        """
+        partitions = await self.list_all_partitions()
+        all_partitions = {
+            name
+            for table_partitions in partitions.values()
+            for name in table_partitions
+        }
+        checks: Dict[str, tuple] = {}
+        for name, (
+            raw_sql,
+            params,
+            created_before,
+        ) in quantity.pruning_statements(datetime.now(timezone.utc)).items():
+            checks[name] = (
+                raw_sql,
+                params,
+                _ledger_partitions_before(
+                    partitions.get(LEDGER_TABLE, []), created_before
+                ),
+            )
+        for name, (
+            raw_sql,
+            params,
+            status,
+        ) in sale_order.pruning_statements().items():
+            checks[name] = (raw_sql, params, [f"{ENTITY_TABLE}_{status}"])
+        checks["sale_order_entities"] = (
+            """
+            SELECT id FROM sale_order_item_entity
+            WHERE sale_order_id = ANY($1::int[])
+            """,
+            [[0]],
+            None,
+        )
+
+        results = []
+        for name, (raw_sql, params, expected) in checks.items():
+            _, list_values = await self.conn.execute_query(
+                f"EXPLAIN (FORMAT JSON) {raw_sql}", params
+            )
+            plan = list_values[0]["QUERY PLAN"]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scanned = sorted(
+                set(_scanned_relations(plan[0]["Plan"])) & all_partitions
+            )
+            # a hash partition is picked by the planner, one is enough
+            pruned = scanned == expected if expected else len(scanned) == 1
+            results.append(
+                PartitionPruningRes(
+                    name=name,
+                    expected=expected or ["1 hash partition"],
+                    scanned=scanned,
+                    pruned=pruned,
+                )
+            )
+        return results
@@ -1,7 +1,7 @@
 import asyncio
 import uuid
 from datetime import datetime
-from typing import List, Union
+from typing import AsyncIterator, Iterable, List, Union
 
 from models import (
     EntityStockStatusType,
@@ -12,8 +12,21 @@ from models import (
     TransactionType,
 )
 from pydantic import BaseModel
-from services.utils import bulk_create_model, chunk_size_splitter
-from settings import CHUNK_SIZE, TORTOISE_DEFAULT_CONN_NAME
+from services.id_allocator import IdSequenceType, allocate_ids
+from services.location import resolve_location
+from services.sharding import group_by_shard, shard_connection
+from services.stock_counter import get_stock_counter, stock_deltas
+from services.utils import (
+    ListVersion,
+    bulk_create_model,
+    created_between,
+    get_batcher,
+    get_list_version,
+    select_fields,
+    stream_query,
+    uuid7_batch,
+)
+from settings import EXPORT_STREAM_BATCH_SIZE, TORTOISE_DEFAULT_CONN_NAME
 from tortoise import Tortoise
 
 
@@ -26,7 +39,10 @@ class CreatePurchaseItemReq(BaseModel):
 
 
 class CreatePurchaseReq(BaseModel):
-    id: int
+    # allocated from the purchase id sequence when missing
+    id: Union[int, None] = None
+    # receiving location, DEFAULT_LOCATION when missing
+    location: Union[str, None] = None
     purchase_items: List[CreatePurchaseItemReq]
 
 
@@ -37,6 +53,8 @@ class CreatePurchaseItemRes(CreatePurchaseItemReq):
 
 
 class CreatePurchaseRes(CreatePurchaseReq):
+    id: int
+    location: str
     created: datetime
     modified: datetime
     total_price: int
@@ -45,11 +63,17 @@ class CreatePurchaseRes(CreatePurchaseReq):
 
 
 class PurchaseRes(BaseModel):
+    """
+    a purchase of the list, the fields left out of a sparse fieldset are
+    unset and not serialized
+    """
+
     id: int
-    created: datetime
-    modified: datetime
-    total_price: int
-    total_units: int
+    location: Union[str, None] = None
+    created: Union[datetime, None] = None
+    modified: Union[datetime, None] = None
+    total_price: Union[int, None] = None
+    total_units: Union[int, None] = None
 
 
 class GetListPurchaseRes(BaseModel):
@@ -63,18 +87,26 @@ class GetLatestPurchaseIdRes(BaseModel):
 
 class CreatePurchaseService:
     def __init__(
-        self, purchase_id: int, purchase_items: List[CreatePurchaseItemReq]
+        self,
+        purchase_id: Union[int, None],
+        purchase_items: List[CreatePurchaseItemReq],
+        location: Union[str, None] = None,
     ):
         self.purchase_id = purchase_id
         self.purchase_items = purchase_items
+        self.location = resolve_location(location)
 
     async def create_purchase(self) -> PurchaseModel:
-        return await PurchaseModel.create(id=self.purchase_id)
+        if self.purchase_id is None:
+            (self.purchase_id,) = await allocate_ids(IdSequenceType.PURCHASE)
+        return await PurchaseModel.create(
+            id=self.purchase_id, location=self.location
+        )
 
     async def create_purchase_items(self, purchase: PurchaseModel):
         items = [
             PurchaseItemModel(
-                id=uuid.uuid4(),
+                id=item_id,
                 product_id=ele.product_id,
                 purchase=purchase,
                 sku=ele.sku,
@@ -82,7 +114,9 @@ class CreatePurchaseService:
                 unique_identifier=ele.unique_identifier,
                 price=ele.price,
             )
-            for ele in self.purchase_items
+            for item_id, ele in zip(
+                uuid7_batch(len(self.purchase_items)), self.purchase_items
+            )
         ]
         return await PurchaseItemModel.bulk_create(items)
 
@@ -92,7 +126,8 @@ class CreatePurchaseService:
     ):
         stocks = [
             InventoryTransactionModel(
-                id=uuid.uuid4(),
+                id=transaction_id,
+                location=purchase.location,
                 sku=ele.sku,
                 product_id=ele.product_id,
                 unique_identifier=ele.unique_identifier,
@@ -100,43 +135,56 @@ class CreatePurchaseService:
                 transaction_type=TransactionType.PURCHASE.value,
                 purchase=purchase,
             )
-            for ele in purchase_items
+            for transaction_id, ele in zip(
+                uuid7_batch(len(purchase_items)), purchase_items
+            )
         ]
-        return await InventoryTransactionModel.bulk_create(stocks)
+        for shard, shard_stocks in group_by_shard(
+            stocks, lambda ele: ele.product_id
+        ).items():
+            await InventoryTransactionModel.bulk_create(
+                shard_stocks, using_db=await shard_connection(shard)
+            )
+        await get_stock_counter().publish(stock_deltas(purchase_items))
+        return stocks
 
     @classmethod
     async def create_purchase_item_entities(
         cls, purchase: PurchaseModel, purchase_items: List[PurchaseItemModel]
     ):
-        purchase_item_entities = []
-        for purchase_item in purchase_items:
-            chunks = chunk_size_splitter(CHUNK_SIZE, purchase_item.quantity)
-            for chunk in chunks:
+        batcher = get_batcher(PurchaseItemEntityModel)
+        for shard, shard_items in group_by_shard(
+            purchase_items, lambda ele: ele.product_id
+        ).items():
+            conn = await shard_connection(shard)
+            purchase_item_entities = []
+            for purchase_item in shard_items:
                 purchase_item_entities.extend(
-                    [
-                        PurchaseItemEntityModel(
-                            id=uuid.uuid4(),
-                            #
-                            product_id=purchase_item.product_id,
-                            sku=purchase_item.sku,
-                            e_identifier=purchase_item.unique_identifier,
-                            status=EntityStockStatusType.AVAILABLE.value,
-                            #
-                            purchase_id=purchase.id,
-                            purchase_item_id=purchase_item.id,
-                        )
-                        for _ in range(chunk)
-                    ]
+                    PurchaseItemEntityModel(
+                        id=entity_id,
+                        #
+                        location=purchase.location,
+                        product_id=purchase_item.product_id,
+                        sku=purchase_item.sku,
+                        e_identifier=purchase_item.unique_identifier,
+                        status=EntityStockStatusType.AVAILABLE.value,
+                        #
+                        purchase_id=purchase.id,
+                        purchase_item_id=purchase_item.id,
+                    )
+                    for entity_id in uuid7_batch(purchase_item.quantity)
                 )
-                if len(purchase_item_entities) >= CHUNK_SIZE:
+                # the batcher splits the list by its own batch size
+                if len(purchase_item_entities) >= batcher.batch_size:
                     await bulk_create_model(
                         PurchaseItemEntityModel,
                         purchase_item_entities,
+                        using_db=conn,
                     )
 
-        await bulk_create_model(
-            PurchaseItemEntityModel, purchase_item_entities
-        )
+            await bulk_create_model(
+                PurchaseItemEntityModel, purchase_item_entities, using_db=conn
+            )
 
     @classmethod
     async def run_aggregation(
@@ -166,6 +214,7 @@ class CreatePurchaseService:
             created=purchase.created,
             modified=purchase.modified,
             id=purchase.id,
+            location=purchase.location,
             total_price=total_price,
             total_units=total_units,
             purchase_items=[
@@ -184,60 +233,97 @@ class CreatePurchaseService:
         )
 
 
+PURCHASE_LIST_FIELDS = [
+    "id",
+    "location",
+    "created",
+    "modified",
+    "total_price",
+    "total_units",
+]
+_PURCHASE_LIST_COLUMNS = {
+    "id": "purchase.id",
+    "location": "purchase.location",
+    "created": "purchase.created",
+    "modified": "purchase.modified",
+    "total_price": "COALESCE(sub_query.total_price, 0) as total_price",
+    "total_units": "COALESCE(sub_query.total_units, 0) as total_units",
+}
+
+
 class GetListPurchaseService:
-    def __init__(self, purchase_ids: Union[List[int], None] = None):
+    def __init__(
+        self,
+        purchase_ids: Union[List[int], None] = None,
+        fields: Union[Iterable[str], None] = None,
+    ):
         self.purchase_ids = purchase_ids
+        self.fields = select_fields(fields, PURCHASE_LIST_FIELDS)
+
+    async def get_version(self) -> ListVersion:
+        """
+        changes whenever a purchase of the list is created, its items never
+        change after that
+        """
+        queryset = PurchaseModel.all()
+        if self.purchase_ids:
+            queryset = queryset.filter(id__in=self.purchase_ids)
+        return await get_list_version(queryset)
 
     async def get_list_purchases(
         self, limit: int, offset: int
     ) -> GetListPurchaseRes:
-        _selected_fields = f"""
-            sub_query.purchase_id,
-            sub_query.total_price,
-            sub_query.total_units,
-            purchase.created,
-            purchase.modified
         """
+        the purchases are paged by their primary key, their items are only
+        aggregated when a total is in the fields, a purchase without items
+        totals 0
+        """
+        _selected_fields = ", ".join(
+            _PURCHASE_LIST_COLUMNS[ele] for ele in self.fields
+        )
+        with_totals = "total_price" in self.fields or (
+            "total_units" in self.fields
+        )
 
         if not self.purchase_ids:
             queryset = PurchaseModel.all()
-            raw_sql = f"""
-            SELECT %s
-            FROM (
-                SELECT purchase_id, SUM(price * quantity) as total_price, SUM(quantity) as total_units
-                FROM purchase_item
-                GROUP BY purchase_id
-                ORDER BY purchase_id DESC
-                LIMIT $1
-                OFFSET $2) as sub_query
-            INNER JOIN purchase ON sub_query.purchase_id = purchase.id
-            ORDER BY sub_query.purchase_id DESC
-            """
+            where_clause = ""
             params = [limit, offset]
         else:
             queryset = PurchaseModel.filter(id__in=self.purchase_ids)
             len_purchase_ids = len(self.purchase_ids)
-
-            where_clause = ", ".join(
+            where_clause = "WHERE {column} IN (%s)" % ", ".join(
                 [f"${i + 1}" for i in range(len_purchase_ids)]
             )
+            params = [str(ele) for ele in self.purchase_ids] + [
+                limit,
+                offset,
+            ]
+
+        if with_totals:
             raw_sql = f"""
                 SELECT %s
                 FROM (
-                    SELECT purchase_id, SUM(price * quantity) as total_price, SUM(quantity) as total_units
+                    SELECT * FROM purchase
+                    {where_clause.format(column="purchase.id")}
+                    ORDER BY purchase.id DESC
+                    LIMIT ${len(params) - 1}
+                    OFFSET ${len(params)}) as purchase
+                LEFT JOIN LATERAL (
+                    SELECT SUM(price * quantity) as total_price, SUM(quantity) as total_units
                     FROM purchase_item
-                    WHERE purchase_id IN ({where_clause})
-                    GROUP BY purchase_id
-                    ORDER BY purchase_id DESC
-                    LIMIT ${len_purchase_ids + 1}
-                    OFFSET ${len_purchase_ids + 2}) as sub_query
-                INNER JOIN purchase ON sub_query.purchase_id = purchase.id
-                ORDER BY sub_query.purchase_id DESC
+                    WHERE purchase_item.purchase_id = purchase.id) as sub_query ON TRUE
+                ORDER BY purchase.id DESC
+                """
+        else:
+            raw_sql = f"""
+                SELECT %s
+                FROM purchase
+                {where_clause.format(column="purchase.id")}
+                ORDER BY purchase.id DESC
+                LIMIT ${len(params) - 1}
+                OFFSET ${len(params)}
                 """
-            params = [str(ele) for ele in self.purchase_ids] + [
-                limit,
-                offset,
-            ]
 
         total_promise = queryset.count()
         sql_promise = Tortoise.get_connection(
@@ -246,20 +332,59 @@ class GetListPurchaseService:
         total, (res_len, list_values) = await asyncio.gather(
             total_promise, sql_promise
         )
-        results: List[PurchaseRes] = []
-        for purchase in list_values:
-            results.append(
-                PurchaseRes(
-                    created=purchase["created"],
-                    modified=purchase["modified"],
-                    id=purchase["purchase_id"],
-                    total_price=purchase["total_price"],
-                    total_units=purchase["total_units"],
-                )
-            )
+        results = [
+            PurchaseRes(**{name: purchase[name] for name in self.fields})
+            for purchase in list_values
+        ]
         return GetListPurchaseRes(results=results, total=total)
 
 
+class ExportPurchaseService:
+    """
+    the purchases created in [created_from, created_to) with their totals,
+    in id order, aggregated in one pass instead of a GROUP BY per page
+    """
+
+    columns = [
+        "id",
+        "location",
+        "created",
+        "modified",
+        "total_price",
+        "total_units",
+    ]
+
+    def __init__(
+        self,
+        created_from: Union[datetime, None] = None,
+        created_to: Union[datetime, None] = None,
+    ):
+        self.created_from = created_from
+        self.created_to = created_to
+
+    def batches(
+        self, batch_size: int = EXPORT_STREAM_BATCH_SIZE
+    ) -> AsyncIterator[List[dict]]:
+        params: list = []
+        conditions = created_between(
+            "purchase.created", self.created_from, self.created_to, params
+        )
+        where_clause = (
+            "WHERE " + " AND ".join(conditions) if conditions else ""
+        )
+        raw_sql = f"""
+            SELECT purchase.id, purchase.location, purchase.created, purchase.modified,
+                COALESCE(SUM(item.price * item.quantity), 0) as total_price,
+                COALESCE(SUM(item.quantity), 0) as total_units
+            FROM purchase
+            LEFT JOIN purchase_item item ON item.purchase_id = purchase.id
+            {where_clause}
+            GROUP BY purchase.id
+            ORDER BY purchase.id
+            """
+        return stream_query(raw_sql, params, batch_size)
+
+
 async def get_latest_purchase_id() -> GetLatestPurchaseIdRes:
     last_purchase = await PurchaseModel.all().order_by("-id").first()
     if not last_purchase:
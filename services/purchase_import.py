@@ -0,0 +1,238 @@
+import csv
+import json
+from enum import Enum
+from typing import AsyncIterator, List, Tuple, Union
+
+from models import PurchaseModel
+from pydantic import BaseModel, ValidationError
+from services.id_allocator import IdSequenceType, allocate_ids
+from services.location import resolve_location
+from services.logger import logger
+from services.purchase import CreatePurchaseItemReq, CreatePurchaseService
+from services.sharding import sharded_transaction
+from settings import (
+    IMPORT_CHUNK_SIZE,
+    IMPORT_MAX_ERRORS,
+    IMPORT_MAX_LINE_LENGTH,
+)
+from tortoise.exceptions import IntegrityError
+
+# varchar(20) of sku and unique_identifier, int4 of quantity and price
+_MAX_CODE_LENGTH = 20
+_INT4_RANGE = range(-(2**31), 2**31)
+
+
+class ImportFormatType(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class PurchaseImportRes(BaseModel):
+    id: Union[int, None]
+    committed: bool
+    imported_rows: int
+    total_units: int
+    total_price: int
+    errors: List[ImportRowError]
+
+
+class _RollbackImport(Exception):
+    pass
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[Tuple[int, Union[bytes, None]]]:
+    """
+    split a byte stream into numbered lines without holding more than one
+    line, a line longer than IMPORT_MAX_LINE_LENGTH is yielded as None
+    """
+    buffer = b""
+    line_no = 0
+    too_long = False
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_no += 1
+            too_long = too_long or len(line) > IMPORT_MAX_LINE_LENGTH
+            yield line_no, None if too_long else line
+            too_long = False
+        if len(buffer) > IMPORT_MAX_LINE_LENGTH:
+            buffer, too_long = b"", True
+    if buffer or too_long:
+        too_long = too_long or len(buffer) > IMPORT_MAX_LINE_LENGTH
+        yield line_no + 1, None if too_long else buffer
+
+
+class PurchaseImportService:
+    """
+    stream a CSV (with header) or NDJSON purchase manifest into the
+    purchase, item, ledger and entity tables, IMPORT_CHUNK_SIZE rows at a
+    time in one transaction. in strict mode any invalid row rolls the
+    whole purchase back, otherwise invalid rows are skipped
+    """
+
+    def __init__(
+        self,
+        purchase_id: Union[int, None] = None,
+        import_format: ImportFormatType = ImportFormatType.CSV,
+        strict: bool = True,
+        location: Union[str, None] = None,
+    ):
+        self.purchase_id = purchase_id
+        self.location = resolve_location(location)
+        self.import_format = import_format
+        self.strict = strict
+        self.header: Union[List[str], None] = None
+        self.errors: List[ImportRowError] = []
+        self.error_count = 0
+        self.imported_rows = 0
+        self.total_units = 0
+        self.total_price = 0
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> PurchaseImportRes:
+        committed = False
+        try:
+            async with sharded_transaction():
+                if self.purchase_id is None:
+                    (self.purchase_id,) = await allocate_ids(
+                        IdSequenceType.PURCHASE
+                    )
+                purchase = await PurchaseModel.create(
+                    id=self.purchase_id, location=self.location
+                )
+                await self.import_rows(purchase, chunks)
+                if not self.imported_rows and not self.error_count:
+                    self.add_error(0, "No rows to import")
+                if not self.imported_rows or (
+                    self.strict and self.error_count
+                ):
+                    raise _RollbackImport()
+            committed = True
+        except _RollbackImport:
+            logger.info(
+                "[%s] purchase %s rolled back, %s rows with errors"
+                % (self.__class__.__name__, self.purchase_id, self.error_count)
+            )
+        except IntegrityError:
+            self.add_error(0, "Purchase id already exists")
+
+        return PurchaseImportRes(
+            id=self.purchase_id if committed else None,
+            committed=committed,
+            imported_rows=self.imported_rows if committed else 0,
+            total_units=self.total_units,
+            total_price=self.total_price,
+            errors=self.errors,
+        )
+
+    async def import_rows(
+        self, purchase: PurchaseModel, chunks: AsyncIterator[bytes]
+    ):
+        rows: List[CreatePurchaseItemReq] = []
+        async for line_no, line in iter_lines(chunks):
+            row = self.parse_line(line_no, line)
+            if row is None:
+                continue
+            rows.append(row)
+            if len(rows) >= IMPORT_CHUNK_SIZE:
+                await self.write_rows(purchase, rows)
+        await self.write_rows(purchase, rows)
+
+    def parse_line(
+        self, line_no: int, raw_line: Union[bytes, None]
+    ) -> Union[CreatePurchaseItemReq, None]:
+        if raw_line is None:
+            self.add_error(line_no, "Line is too long")
+            return None
+        if not raw_line.strip():
+            return None
+
+        try:
+            line = raw_line.decode().rstrip("\r")
+            if self.import_format == ImportFormatType.NDJSON:
+                data = json.loads(line)
+            else:
+                values = next(csv.reader([line]))
+                if self.header is None:
+                    self.header = [ele.strip() for ele in values]
+                    return None
+                data = {
+                    key: value or None
+                    for key, value in zip(self.header, values)
+                }
+            row = CreatePurchaseItemReq.model_validate(data)
+        except ValidationError as e:
+            self.add_error(
+                line_no,
+                "; ".join(
+                    "%s: %s" % (".".join(map(str, err["loc"])), err["msg"])
+                    for err in e.errors()
+                ),
+            )
+            return None
+        except ValueError as e:
+            self.add_error(line_no, str(e))
+            return None
+
+        error = self.check_row(row)
+        if error is not None:
+            self.add_error(line_no, error)
+            return None
+        return row
+
+    @staticmethod
+    def check_row(row: CreatePurchaseItemReq) -> Union[str, None]:
+        """
+        the limits of the columns, a row past them would fail the insert of
+        the whole chunk without its line number
+        """
+        for name in ("sku", "unique_identifier"):
+            value = getattr(row, name)
+            if value is not None and len(value) > _MAX_CODE_LENGTH:
+                return "%s is longer than %s characters" % (
+                    name,
+                    _MAX_CODE_LENGTH,
+                )
+        if row.quantity <= 0:
+            return "quantity must be positive"
+        for name in ("quantity", "price"):
+            if getattr(row, name) not in _INT4_RANGE:
+                return "%s is out of range" % name
+        return None
+
+    def add_error(self, line_no: int, error: str):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(ImportRowError(line=line_no, error=error))
+
+    async def write_rows(
+        self, purchase: PurchaseModel, rows: List[CreatePurchaseItemReq]
+    ):
+        """
+        write and clear rows, skipped once a strict import has errors
+        """
+        if rows and not (self.strict and self.error_count):
+            handler = CreatePurchaseService(
+                purchase_id=purchase.id,
+                purchase_items=rows,
+                location=purchase.location,
+            )
+            purchase_items = await handler.create_purchase_items(purchase)
+            await handler.create_stock_transaction(purchase, purchase_items)
+            await handler.create_purchase_item_entities(
+                purchase, purchase_items
+            )
+
+            self.imported_rows += len(rows)
+            for ele in rows:
+                self.total_units += ele.quantity
+                self.total_price += ele.price * ele.quantity
+        rows.clear()
@@ -1,47 +1,296 @@
 import uuid
-from typing import List, Union
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
 
-from models import InventoryTransactionModel
 from pydantic import BaseModel
-from tortoise.functions import Sum
+from services.location import query_locations
+from services.sharding import fan_out, group_by_shard, shard_of
+from settings import STOCK_LOCATIONS
+from tortoise import Tortoise
 
 
 class SkuQuantity(BaseModel):
     product_id: uuid.UUID
     sku: str
     quantity: int
+    # set when the quantity is of one location
+    location: Union[str, None] = None
 
 
 class GetQuantityRes(BaseModel):
     results: List[SkuQuantity]
 
 
-async def get_quantity(
-    product_id: Union[uuid.UUID, None] = None,
-    skus: Union[List[str], None] = None,
-) -> GetQuantityRes:
-    assert product_id or skus, "product_id or skus must be provided"
-
+def _ledger_filter(
+    product_id: Union[uuid.UUID, None],
+    skus: Union[List[str], None],
+    location: Union[str, None],
+    first_param: int = 1,
+) -> Tuple[str, list]:
+    """
+    build the where clause shared by the ledger, archive and checkpoint tables
+    """
+    where_clause = f"location = ANY(${first_param}::varchar[]) AND "
+    params = [query_locations(location)]
     if skus:
-        queryset = InventoryTransactionModel.filter(sku__in=skus)
-    else:
-        queryset = InventoryTransactionModel.filter(product_id=product_id)
-
-    # run aggregate query
-    agg = (
-        await queryset.annotate(total_quantity=Sum("quantity"))
-        .group_by("product_id", "sku")
-        .values("product_id", "sku", "total_quantity")
-    )
-    if not agg:
-        results = []
-    else:
-        results = [
+        return (
+            where_clause + f"sku = ANY(${first_param + 1}::varchar[])",
+            params + [list(skus)],
+        )
+    return (
+        where_clause + f"product_id = ${first_param + 1}::uuid",
+        params + [str(product_id)],
+    )
+
+
+async def _query_ledger(
+    raw_sql: str,
+    params: list,
+    product_id: Union[uuid.UUID, None],
+    skus: Union[List[str], None],
+) -> List[dict]:
+    """
+    run on the shard of product_id, on every shard when filtered by skus
+    """
+    shards = None if skus else [shard_of(product_id)]
+    results = await fan_out(
+        lambda shard: Tortoise.get_connection(shard).execute_query(
+            raw_sql, params
+        ),
+        shards,
+    )
+    return [ele for _, list_values in results.values() for ele in list_values]
+
+
+def _to_response(
+    list_values: List[dict], location: Union[str, None]
+) -> GetQuantityRes:
+    return GetQuantityRes(
+        results=[
             SkuQuantity(
                 product_id=ele.get("product_id"),
                 sku=ele.get("sku"),
                 quantity=ele.get("total_quantity"),
+                location=location,
             )
-            for ele in agg
+            for ele in list_values
         ]
-    return GetQuantityRes(results=results)
+    )
+
+
+async def get_quantity(
+    product_id: Union[uuid.UUID, None] = None,
+    skus: Union[List[str], None] = None,
+    location: Union[str, None] = None,
+) -> GetQuantityRes:
+    """
+    quantity = latest checkpoint + transactions not compacted yet,
+    of one location or summed over all of them
+    """
+    assert product_id or skus, "product_id or skus must be provided"
+
+    where_clause, params = _ledger_filter(product_id, skus, location)
+    return _to_response(
+        await _query_ledger(
+            _quantity_sql(where_clause), params, product_id, skus
+        ),
+        location,
+    )
+
+
+def _quantity_sql(where_clause: str) -> str:
+    return f"""
+        SELECT product_id, sku, SUM(quantity) as total_quantity
+        FROM (
+            SELECT product_id, sku, quantity
+            FROM inventory_transaction
+            WHERE {where_clause}
+            UNION ALL
+            (SELECT DISTINCT ON (location, product_id, sku)
+                product_id, sku, quantity
+            FROM inventory_checkpoint
+            WHERE {where_clause}
+            ORDER BY location, product_id, sku, watermark DESC)
+        ) as ledger
+        GROUP BY product_id, sku
+        """
+
+
+def ledger_totals_sql(keys_relation: str, locations_param: str) -> str:
+    """
+    quantity of every (product_id, sku) of keys_relation present in the
+    ledger of the locations, keys_relation is a table or CTE name with
+    those two columns and locations_param the varchar[] parameter
+    """
+    return f"""
+        SELECT product_id, sku, SUM(quantity) as total_quantity
+        FROM (
+            SELECT it.product_id, it.sku, it.quantity
+            FROM inventory_transaction it
+            INNER JOIN {keys_relation} USING (product_id, sku)
+            WHERE it.location = ANY({locations_param}::varchar[])
+            UNION ALL
+            (SELECT DISTINCT ON (ic.location, ic.product_id, ic.sku)
+                ic.product_id, ic.sku, ic.quantity
+            FROM inventory_checkpoint ic
+            INNER JOIN {keys_relation} USING (product_id, sku)
+            WHERE ic.location = ANY({locations_param}::varchar[])
+            ORDER BY ic.location, ic.product_id, ic.sku, ic.watermark DESC)
+        ) as ledger
+        GROUP BY product_id, sku
+        """
+
+
+async def get_quantity_by_keys(
+    keys: List[Tuple[str, str]]
+) -> Dict[Tuple[str, str], int]:
+    """
+    quantity of exact (product_id, sku) pairs over all locations,
+    missing pairs are 0
+    """
+    if not keys:
+        return {}
+
+    keys_by_shard = group_by_shard(keys, lambda key: key[0])
+    results = await fan_out(
+        lambda shard: Tortoise.get_connection(shard).execute_query(
+            _QUANTITY_BY_KEYS_SQL,
+            [
+                [key[0] for key in keys_by_shard[shard]],
+                [key[1] for key in keys_by_shard[shard]],
+                STOCK_LOCATIONS,
+            ],
+        ),
+        keys_by_shard,
+    )
+    list_values = [
+        ele for _, shard_values in results.values() for ele in shard_values
+    ]
+    quantities = {key: 0 for key in keys}
+    for ele in list_values:
+        quantities[(str(ele["product_id"]), ele["sku"])] = ele[
+            "total_quantity"
+        ]
+    return quantities
+
+
+_QUANTITY_BY_KEYS_SQL = f"""
+    WITH keys AS (
+        SELECT * FROM unnest($1::uuid[], $2::varchar[]) AS k(product_id, sku)
+    )
+    {ledger_totals_sql("keys", "$3")}
+    """
+
+
+def warm_up_statements() -> List[Tuple[str, list]]:
+    """
+    the hot statements run on the stock connections, with params matching
+    no row, see services/startup.py
+    """
+    no_product_id = uuid.UUID(int=0)
+    return [
+        (_quantity_sql(where_clause), params)
+        for where_clause, params in (
+            _ledger_filter(no_product_id, None, None),
+            _ledger_filter(None, [""], None),
+        )
+    ] + [(_QUANTITY_BY_KEYS_SQL, [[], [], STOCK_LOCATIONS])]
+
+
+def pruning_statements(
+    as_of: datetime,
+) -> Dict[str, Tuple[str, list, Union[datetime, None]]]:
+    """
+    the ledger statements checked by managePartitions.py check, with params
+    matching no row and the end of the created range they read from
+    inventory_transaction, None when they read all of it
+    """
+    no_product_id = uuid.UUID(int=0)
+    by_product = _ledger_filter(no_product_id, None, None)
+    by_skus = _ledger_filter(None, [""], None)
+    as_of_where_clause, as_of_params = _ledger_filter(
+        no_product_id, None, None, first_param=2
+    )
+    return {
+        "quantity_by_product": (
+            _quantity_sql(by_product[0]),
+            by_product[1],
+            None,
+        ),
+        "quantity_by_skus": (_quantity_sql(by_skus[0]), by_skus[1], None),
+        "quantity_by_keys": (
+            _QUANTITY_BY_KEYS_SQL,
+            [[no_product_id], [""], STOCK_LOCATIONS],
+            None,
+        ),
+        "quantity_as_of": (
+            quantity_as_of_sql(as_of_where_clause),
+            [as_of] + as_of_params,
+            as_of,
+        ),
+    }
+
+
+async def get_quantity_as_of(
+    as_of: datetime,
+    product_id: Union[uuid.UUID, None] = None,
+    skus: Union[List[str], None] = None,
+    location: Union[str, None] = None,
+) -> GetQuantityRes:
+    """
+    quantity at a point in time = nearest checkpoint before as_of
+    + archived and live transactions between the checkpoint and as_of,
+    of one location or summed over all of them
+    """
+    assert product_id or skus, "product_id or skus must be provided"
+
+    where_clause, params = _ledger_filter(
+        product_id, skus, location, first_param=2
+    )
+    return _to_response(
+        await _query_ledger(
+            quantity_as_of_sql(where_clause),
+            [as_of] + params,
+            product_id,
+            skus,
+        ),
+        location,
+    )
+
+
+def quantity_as_of_sql(where_clause: str) -> str:
+    """
+    quantity of every (product_id, sku) matching where_clause at the time
+    $1, where_clause applies to the ledger, archive and checkpoint tables
+    and its parameters start at $2
+    """
+    return f"""
+        WITH snapshot AS (
+            SELECT DISTINCT ON (location, product_id, sku)
+                location, product_id, sku, quantity, watermark
+            FROM inventory_checkpoint
+            WHERE {where_clause} AND watermark <= $1
+            ORDER BY location, product_id, sku, watermark DESC
+        ), tail AS (
+            SELECT location, product_id, sku, quantity, created
+            FROM inventory_transaction_archive
+            WHERE {where_clause} AND created < $1
+            UNION ALL
+            SELECT location, product_id, sku, quantity, created
+            FROM inventory_transaction
+            WHERE {where_clause} AND created < $1
+        )
+        SELECT product_id, sku, SUM(quantity) as total_quantity
+        FROM (
+            SELECT product_id, sku, quantity FROM snapshot
+            UNION ALL
+            SELECT tail.product_id, tail.sku, tail.quantity
+            FROM tail
+            LEFT JOIN snapshot ON snapshot.location = tail.location
+                AND snapshot.product_id = tail.product_id
+                AND snapshot.sku = tail.sku
+            WHERE snapshot.watermark IS NULL
+                OR tail.created >= snapshot.watermark
+        ) as ledger
+        GROUP BY product_id, sku
+        """
@@ -0,0 +1,508 @@
+"""
+sales and stock reports
+
+the rows of the window are pulled in bulk with COPY, one column per
+field, and the metrics are computed with vectorized group-bys on them:
+
+- units sold: sale transactions net of their returns, per (product_id,
+  sku) and day or week, with the trailing mean over `rolling` periods
+- velocity: units sold and revenue over the window, average daily units,
+  on hand at the end, days of cover (on hand / average daily units) and
+  sell-through (units sold / (units sold + on hand))
+
+ledger rows are created at now(), so the report of a window ending before
+today never changes, see ReportCache. revenue is dated the same way: a
+cancelled order's RETURN rows are dated at the cancellation, so an order
+cancelled after the window still counts in it, cancelled is a final
+status and the cancellation sets modified
+"""
+
+import asyncio
+import io
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+from typing import Awaitable, Callable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from models import SaleOrderStatusType, TransactionType
+from pydantic import BaseModel
+from services.location import query_locations
+from services.quantity import quantity_as_of_sql
+from services.sharding import fan_out
+from settings import (
+    REPORT_CACHE_MAX_ENTRIES,
+    REPORT_CACHE_SECONDS,
+    REPORT_DEFAULT_DAYS,
+    REPORT_MAX_DAYS,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
+from tortoise import Tortoise
+
+_KEY_TYPE = pa.dictionary(pa.int32(), pa.string())
+_COPY_PIECE_BYTES = 64 * 2**20
+
+# $1, $2 the window, $3 the locations, $4 the transaction types, day is
+# the number of days since $5 the first day of the window
+_SALES_SQL = """
+    SELECT product_id, sku,
+        (created AT TIME ZONE 'UTC')::date - $5::date AS day,
+        -quantity AS units
+    FROM %s
+    WHERE created >= $1 AND created < $2
+        AND location = ANY($3::varchar[])
+        AND transaction_type = ANY($4::varchar[])
+    """
+_SALES_TYPES = {
+    "product_id": _KEY_TYPE,
+    "sku": _KEY_TYPE,
+    "day": pa.int32(),
+    "units": pa.int64(),
+}
+# $1, $2 the window, $3 the locations, $4 the cancelled status, the
+# orders cancelled after the window count in it like their SALE rows
+_REVENUE_SQL = """
+    SELECT soi.product_id, soi.sku,
+        soi.price::bigint * soi.quantity AS revenue
+    FROM sale_order_item soi
+    INNER JOIN sale_order so ON so.id = soi.sale_order_id
+    WHERE soi.created >= $1 AND soi.created < $2
+        AND so.location = ANY($3::varchar[])
+        AND (so.status <> $4 OR so.modified >= $2)
+    """
+_REVENUE_TYPES = {
+    "product_id": _KEY_TYPE,
+    "sku": _KEY_TYPE,
+    "revenue": pa.int64(),
+}
+_ON_HAND_SQL = quantity_as_of_sql("location = ANY($2::varchar[])")
+
+
+class ReportPeriodType(str, Enum):
+    DAY = "day"
+    # 7 days from the start of the window
+    WEEK = "week"
+
+
+_PERIOD_DAYS = {ReportPeriodType.DAY: 1, ReportPeriodType.WEEK: 7}
+_DEFAULT_ROLLING = {ReportPeriodType.DAY: 7, ReportPeriodType.WEEK: 4}
+
+
+class UnitsSoldRow(BaseModel):
+    product_id: uuid.UUID
+    sku: str
+    period_start: date
+    units_sold: int
+    # mean of the units sold over the `rolling` periods ending with this one
+    rolling_units: float
+
+
+class UnitsSoldRes(BaseModel):
+    start: date
+    end: date
+    period: ReportPeriodType
+    rolling: int
+    results: List[UnitsSoldRow]
+
+
+class VelocityRow(BaseModel):
+    product_id: uuid.UUID
+    sku: str
+    units_sold: int
+    revenue: int
+    avg_daily_units: float
+    on_hand: int
+    # None when nothing was sold
+    days_of_cover: Union[float, None]
+    sell_through: Union[float, None]
+
+
+class VelocityRes(BaseModel):
+    start: date
+    end: date
+    results: List[VelocityRow]
+
+
+async def copy_frame(
+    conn_name: str, raw_sql: str, params: list, column_types: dict
+) -> pa.Table:
+    """
+    the rows of raw_sql as an Arrow table, COPY sends them as CSV parsed
+    column by column instead of building a record per row. the stream is
+    parsed every _COPY_PIECE_BYTES in a thread, only one piece of text is
+    held at a time and the event loop keeps serving
+    """
+    read_options = pa_csv.ReadOptions(column_names=list(column_types))
+    convert_options = pa_csv.ConvertOptions(column_types=column_types)
+    tables = [
+        pa.table(
+            {
+                name: pa.array([], type=column_type)
+                for name, column_type in column_types.items()
+            }
+        )
+    ]
+    pending: List[bytes] = []
+    pending_bytes = 0
+
+    def _parse(data: bytes):
+        table = pa_csv.read_csv(
+            io.BytesIO(data),
+            read_options=read_options,
+            convert_options=convert_options,
+        )
+        # every block of the parser has its own copy of the dictionaries,
+        # one piece keeps a single one
+        tables.append(table.unify_dictionaries().combine_chunks())
+
+    async def _output(chunk: bytes):
+        nonlocal pending_bytes
+        pending.append(chunk)
+        pending_bytes += len(chunk)
+        if pending_bytes < _COPY_PIECE_BYTES:
+            return
+        data = b"".join(pending)
+        # the keys never contain a line break
+        cut = data.rindex(b"\n") + 1
+        pending[:] = [data[cut:]]
+        pending_bytes = len(pending[0])
+        await asyncio.to_thread(_parse, data[:cut])
+
+    client = Tortoise.get_connection(conn_name)
+    async with client.acquire_connection() as connection:
+        await connection.copy_from_query(
+            raw_sql, *params, output=_output, format="csv"
+        )
+    if pending_bytes:
+        await asyncio.to_thread(_parse, b"".join(pending))
+    return pa.concat_tables(tables)
+
+
+def to_frame(tables: List[pa.Table]) -> pd.DataFrame:
+    # the dictionaries of the shards are merged, keys become categoricals
+    table = pa.concat_tables(tables).unify_dictionaries()
+    tables.clear()
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """
+    trailing mean over window columns of every row, the first columns
+    average the periods available
+    """
+    sums = np.cumsum(matrix, axis=1, dtype=np.float64)
+    sums[:, window:] -= sums[:, :-window].copy()
+    counts = np.minimum(np.arange(1, matrix.shape[1] + 1), window)
+    return sums / counts
+
+
+def sales_matrix(
+    sales: pd.DataFrame, periods: int, period_days: int
+) -> pd.DataFrame:
+    """
+    units sold per (product_id, sku) row and period column, 0 for the
+    periods without sale
+    """
+    grouped = (
+        sales.assign(period=sales["day"] // period_days)
+        .groupby(["product_id", "sku", "period"], observed=True)["units"]
+        .sum()
+    )
+    return grouped.unstack("period", fill_value=0).reindex(
+        columns=range(periods), fill_value=0
+    )
+
+
+def _keys_frame(series: pd.Series, name: str) -> pd.DataFrame:
+    frame = series.rename(name).reset_index()
+    frame["product_id"] = frame["product_id"].astype(str)
+    frame["sku"] = frame["sku"].astype(str)
+    return frame
+
+
+def units_sold_frame(
+    sales: pd.DataFrame,
+    start: date,
+    days: int,
+    period: ReportPeriodType,
+    rolling: int,
+) -> pd.DataFrame:
+    period_days = _PERIOD_DAYS[period]
+    periods = -(-days // period_days)
+    matrix = sales_matrix(sales, periods, period_days)
+    values = matrix.to_numpy()
+    return pd.DataFrame(
+        {
+            "product_id": np.repeat(
+                matrix.index.get_level_values("product_id").astype(str),
+                periods,
+            ),
+            "sku": np.repeat(
+                matrix.index.get_level_values("sku").astype(str), periods
+            ),
+            "period_start": np.tile(
+                np.datetime64(start, "D") + np.arange(periods) * period_days,
+                len(matrix),
+            ).astype(object),
+            "units_sold": values.ravel(),
+            "rolling_units": rolling_mean(values, rolling).ravel(),
+        }
+    )
+
+
+def velocity_frame(
+    sales: pd.DataFrame,
+    revenue: pd.DataFrame,
+    on_hand: pd.DataFrame,
+    days: int,
+) -> pd.DataFrame:
+    """
+    one row per (product_id, sku) sold in the window or in stock at its end
+    """
+    frame = (
+        _keys_frame(
+            sales.groupby(["product_id", "sku"], observed=True)["units"].sum(),
+            "units_sold",
+        )
+        .merge(
+            _keys_frame(
+                revenue.groupby(["product_id", "sku"], observed=True)[
+                    "revenue"
+                ].sum(),
+                "revenue",
+            ),
+            on=["product_id", "sku"],
+            how="outer",
+        )
+        .merge(on_hand, on=["product_id", "sku"], how="outer")
+    )
+    for column in ("units_sold", "revenue", "on_hand"):
+        frame[column] = frame[column].fillna(0).astype(np.int64)
+    frame = frame[(frame["units_sold"] != 0) | (frame["on_hand"] != 0)]
+
+    units = frame["units_sold"].to_numpy(dtype=np.float64)
+    # an oversold SKU has nothing left to cover or sell through
+    stock = np.maximum(frame["on_hand"].to_numpy(dtype=np.float64), 0)
+    avg_daily_units = units / days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(
+            avg_daily_units > 0, stock / avg_daily_units, np.nan
+        )
+        sell_through = np.where(
+            units + stock > 0, units / (units + stock), np.nan
+        )
+    return frame.assign(
+        avg_daily_units=avg_daily_units,
+        days_of_cover=days_of_cover,
+        sell_through=sell_through,
+    ).sort_values(["product_id", "sku"], ignore_index=True)
+
+
+def to_records(frame: pd.DataFrame) -> List[dict]:
+    # NaN is None in the responses
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+class ReportCache:
+    """
+    the reports by window and parameters, a window ending before today is
+    final and kept until evicted, the others for ttl_seconds. concurrent
+    requests of one report share its computation
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = REPORT_CACHE_SECONDS,
+        max_entries: int = REPORT_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key: (expiry or None when final, computation)
+        self.entries: OrderedDict = OrderedDict()
+
+    async def get(
+        self,
+        key: tuple,
+        final: bool,
+        compute: Callable[[], Awaitable[pd.DataFrame]],
+    ) -> pd.DataFrame:
+        entry = self.entries.get(key)
+        if entry and (entry[0] is None or entry[0] > time.monotonic()):
+            self.entries.move_to_end(key)
+            future = entry[1]
+        else:
+            future = asyncio.ensure_future(compute())
+            expires = None if final else time.monotonic() + self.ttl_seconds
+            self.entries[key] = (expires, future)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        try:
+            # a cancelled request doesn't cancel the others waiting
+            return await asyncio.shield(future)
+        except Exception:
+            if self.entries.get(key, (None, None))[1] is future:
+                del self.entries[key]
+            raise
+
+
+_report_cache: Union[ReportCache, None] = None
+
+
+def get_report_cache() -> ReportCache:
+    global _report_cache
+    if _report_cache is None:
+        _report_cache = ReportCache()
+    return _report_cache
+
+
+class SalesReportService:
+    """
+    reports of the days [start, end) in UTC, the REPORT_DEFAULT_DAYS up to
+    today by default, of one location or all of them
+    """
+
+    def __init__(
+        self,
+        start: Union[date, None] = None,
+        end: Union[date, None] = None,
+        location: Union[str, None] = None,
+    ):
+        self.end = end or datetime.now(timezone.utc).date() + timedelta(1)
+        self.start = start or self.end - timedelta(REPORT_DEFAULT_DAYS)
+        self.days = (self.end - self.start).days
+        if self.days <= 0:
+            raise ValueError("start must be before end")
+        if self.days > REPORT_MAX_DAYS:
+            raise ValueError(f"window longer than {REPORT_MAX_DAYS} days")
+        self.location = location
+        self.locations = query_locations(location)
+
+    @property
+    def _window(self) -> Tuple[datetime, datetime]:
+        return (
+            datetime.combine(self.start, datetime.min.time(), timezone.utc),
+            datetime.combine(self.end, datetime.min.time(), timezone.utc),
+        )
+
+    @property
+    def _final(self) -> bool:
+        return self.end <= datetime.now(timezone.utc).date()
+
+    async def load_sales(self) -> pd.DataFrame:
+        """
+        product_id, sku, day since start and units sold of every sale and
+        return transaction of the window, live and archived
+        """
+        raw_sql = "%s UNION ALL %s" % (
+            _SALES_SQL % "inventory_transaction",
+            _SALES_SQL % "inventory_transaction_archive",
+        )
+        params = [
+            *self._window,
+            self.locations,
+            [TransactionType.SALE.value, TransactionType.RETURN.value],
+            self.start,
+        ]
+        tables = await fan_out(
+            lambda shard: copy_frame(shard, raw_sql, params, _SALES_TYPES)
+        )
+        return to_frame(list(tables.values()))
+
+    async def load_revenue(self) -> pd.DataFrame:
+        return to_frame(
+            [
+                await copy_frame(
+                    TORTOISE_DEFAULT_CONN_NAME,
+                    _REVENUE_SQL,
+                    [
+                        *self._window,
+                        self.locations,
+                        SaleOrderStatusType.CANCELLED.value,
+                    ],
+                    _REVENUE_TYPES,
+                )
+            ]
+        )
+
+    async def load_on_hand(self) -> pd.DataFrame:
+        results = await fan_out(
+            lambda shard: Tortoise.get_connection(shard).execute_query(
+                _ON_HAND_SQL, [self._window[1], self.locations]
+            )
+        )
+        list_values = [
+            ele for _, shard_values in results.values() for ele in shard_values
+        ]
+        # typed, an empty frame must still merge on the keys
+        return pd.DataFrame(
+            {
+                "product_id": pd.Series(
+                    [str(ele["product_id"]) for ele in list_values],
+                    dtype=object,
+                ),
+                "sku": pd.Series(
+                    [ele["sku"] for ele in list_values], dtype=object
+                ),
+                "on_hand": pd.Series(
+                    [ele["total_quantity"] for ele in list_values],
+                    dtype=np.int64,
+                ),
+            }
+        )
+
+    @classmethod
+    def default_rolling(cls, period: ReportPeriodType) -> int:
+        return _DEFAULT_ROLLING[period]
+
+    async def units_sold(
+        self,
+        period: ReportPeriodType = ReportPeriodType.DAY,
+        rolling: Union[int, None] = None,
+    ) -> pd.DataFrame:
+        if rolling is None:
+            rolling = self.default_rolling(period)
+        if rolling < 1:
+            raise ValueError("rolling must be at least 1")
+
+        async def _compute() -> pd.DataFrame:
+            return await asyncio.to_thread(
+                units_sold_frame,
+                await self.load_sales(),
+                self.start,
+                self.days,
+                period,
+                rolling,
+            )
+
+        return await get_report_cache().get(
+            (
+                "units_sold",
+                self.start,
+                self.end,
+                self.location,
+                period,
+                rolling,
+            ),
+            self._final,
+            _compute,
+        )
+
+    async def velocity(self) -> pd.DataFrame:
+        async def _compute() -> pd.DataFrame:
+            sales, revenue, on_hand = await asyncio.gather(
+                self.load_sales(), self.load_revenue(), self.load_on_hand()
+            )
+            return await asyncio.to_thread(
+                velocity_frame, sales, revenue, on_hand, self.days
+            )
+
+        return await get_report_cache().get(
+            ("velocity", self.start, self.end, self.location),
+            self._final,
+            _compute,
+        )
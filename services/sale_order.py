@@ -1,7 +1,8 @@
 import asyncio
 import uuid
+from collections import deque
 from datetime import datetime
-from typing import List, Union
+from typing import AsyncIterator, Dict, Iterable, List, Tuple, Union
 
 from models import (
     EntityStockStatusType,
@@ -14,9 +15,48 @@ from models import (
     TransactionType,
 )
 from pydantic import BaseModel
-from services.utils import bulk_create_model
-from settings import CHUNK_SIZE, TORTOISE_DEFAULT_CONN_NAME
+from services.id_allocator import IdSequenceType, allocate_ids
+from services.location import resolve_location
+from services.logger import logger
+from services.sharding import (
+    group_by_shard,
+    shard_connection,
+    shard_of,
+    sharded_transaction,
+)
+from services.stock_counter import (
+    OutOfStockError,
+    collect_published,
+    get_stock_counter,
+    published_versions,
+    stock_deltas,
+)
+from services.utils import (
+    ListVersion,
+    bulk_create_model,
+    created_between,
+    get_batcher,
+    get_list_version,
+    select_fields,
+    stream_query,
+    uuid7_batch,
+)
+from settings import (
+    AUTO_FILL_BATCH_LIMIT,
+    EXPORT_STREAM_BATCH_SIZE,
+    GROUP_COMMIT_MAX_BATCH_SIZE,
+    GROUP_COMMIT_MAX_DELAY_MS,
+    SALE_ORDER_TRANSITION_BATCH_SIZE,
+    STOCK_LOCATIONS,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
 from tortoise import Tortoise
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+# varchar(20) of sku and unique_identifier
+_MAX_CODE_LENGTH = 20
 
 
 class SaleItemReq(BaseModel):
@@ -28,7 +68,10 @@ class SaleItemReq(BaseModel):
 
 
 class CreateSaleOrderReq(BaseModel):
-    id: int
+    # allocated from the sale order id sequence when missing
+    id: Union[int, None] = None
+    # served from this location first, DEFAULT_LOCATION when missing
+    location: Union[str, None] = None
     sale_items: List[SaleItemReq]
 
 
@@ -39,6 +82,8 @@ class SaleItemRes(SaleItemReq):
 
 
 class CreateSaleOrderRes(CreateSaleOrderReq):
+    id: int
+    location: str
     created: datetime
     modified: datetime
     total_price: int
@@ -47,16 +92,64 @@ class CreateSaleOrderRes(CreateSaleOrderReq):
     status: SaleOrderStatusType
 
 
+class CreateSaleOrdersReq(BaseModel):
+    orders: List[CreateSaleOrderReq]
+
+
+class CreateSaleOrderResult(BaseModel):
+    id: int
+    order: Union[CreateSaleOrderRes, None] = None
+    error: Union[str, None] = None
+
+
+class CreateSaleOrdersRes(BaseModel):
+    results: List[CreateSaleOrderResult]
+
+
 class SaleOrderRes(BaseModel):
     id: int
     created: datetime
     modified: datetime
     status: SaleOrderStatusType
+    location: str
 
 
-class SaleOrderResV2(SaleOrderRes):
-    total_price: int
-    total_units: int
+class SaleOrderResV2(BaseModel):
+    """
+    a sale order of the list, the fields left out of a sparse fieldset are
+    unset and not serialized
+    """
+
+    id: int
+    created: Union[datetime, None] = None
+    modified: Union[datetime, None] = None
+    status: Union[SaleOrderStatusType, None] = None
+    location: Union[str, None] = None
+    total_price: Union[int, None] = None
+    total_units: Union[int, None] = None
+
+
+class AutoFillSaleOrdersReq(BaseModel):
+    sale_ids: Union[List[int], None] = None
+    limit: Union[int, None] = None
+
+
+class AutoFillSaleOrdersRes(BaseModel):
+    confirmed_ids: List[int]
+    short_ids: List[int]
+
+
+class TransitionSaleOrdersReq(BaseModel):
+    sale_ids: List[int]
+    status: SaleOrderStatusType
+
+
+class TransitionSaleOrdersRes(BaseModel):
+    status: SaleOrderStatusType
+    transitioned_ids: List[int]
+    # not found or not in a status the target can be reached from
+    skipped_ids: List[int]
+    released_entities: int
 
 
 class GetListSaleOrderRes(BaseModel):
@@ -64,9 +157,63 @@ class GetListSaleOrderRes(BaseModel):
     total: int
 
 
+_SALE_ORDER_TOTALS_SQL = """
+    SELECT sale_order_id, SUM(price * quantity) as total_price, SUM(quantity) as total_units
+    FROM sale_order_item
+    WHERE sale_order_id = $1
+    GROUP BY sale_order_id
+    """
+
+# entities BulkAutoFillSaleOrders locks, oldest purchase first
+_AVAILABLE_ENTITIES_SQL = """
+    SELECT id, location FROM purchase_item_entity
+    WHERE location = ANY($1::varchar[])
+        AND product_id = $2 AND sku = $3 AND status = $4
+        AND id <> ALL($5::uuid[])
+    ORDER BY purchase_id, created
+    LIMIT $6
+    FOR UPDATE SKIP LOCKED
+    """
+
+
+def warm_up_statements() -> List[Tuple[str, list]]:
+    """
+    the hot statements run on the default connection, with params matching
+    no row, see services/startup.py
+    """
+    return [(_SALE_ORDER_TOTALS_SQL, [0])]
+
+
+def pruning_statements() -> Dict[str, Tuple[str, list, str]]:
+    """
+    the auto-fill selects checked by managePartitions.py check, with params
+    matching no row and the status of the purchase_item_entity partition
+    they read
+    """
+    no_product_id = uuid.UUID(int=0)
+    available = EntityStockStatusType.AVAILABLE.value
+    return {
+        "auto_fill_available_entities": (
+            AutoFillSaleOrder.available_entities(no_product_id, "")
+            .filter(location=STOCK_LOCATIONS[0])
+            .limit(1)
+            .values_list("id", "location")
+            .sql(),
+            [],
+            available,
+        ),
+        "bulk_auto_fill_available_entities": (
+            _AVAILABLE_ENTITIES_SQL,
+            [STOCK_LOCATIONS, no_product_id, "", available, [], 1],
+            available,
+        ),
+    }
+
+
 class CreateSaleOrderService:
     def __init__(self, data: CreateSaleOrderReq):
         self.sale_id = data.id
+        self.location = resolve_location(data.location)
         self.sale_items = data.sale_items
 
     async def create(self) -> CreateSaleOrderRes:
@@ -76,9 +223,26 @@ class CreateSaleOrderService:
         agg_res = await self.run_aggregation(sale_order, sale_order_items)
         return agg_res
 
+    async def create_group_commit(self) -> CreateSaleOrderRes:
+        """
+        create the sale order in a transaction shared with the concurrent
+        requests of the same few milliseconds, see SaleOrderGroupCommitter
+        """
+        return await get_group_committer().submit(
+            CreateSaleOrderReq(
+                id=self.sale_id,
+                location=self.location,
+                sale_items=self.sale_items,
+            )
+        )
+
     async def create_sale_order(self) -> SaleOrderModel:
+        if self.sale_id is None:
+            (self.sale_id,) = await allocate_ids(IdSequenceType.SALE_ORDER)
         return await SaleOrderModel.create(
-            id=self.sale_id, status=SaleOrderStatusType.DRAFT.value
+            id=self.sale_id,
+            status=SaleOrderStatusType.DRAFT.value,
+            location=self.location,
         )
 
     async def create_sale_items(
@@ -86,7 +250,7 @@ class CreateSaleOrderService:
     ) -> List[SaleOrderItemModel]:
         items = [
             SaleOrderItemModel(
-                id=uuid.uuid4(),
+                id=item_id,
                 sale_order=sale_order,
                 #
                 product_id=ele.product_id,
@@ -96,7 +260,9 @@ class CreateSaleOrderService:
                 quantity=ele.quantity,
                 price=ele.price,
             )
-            for ele in self.sale_items
+            for item_id, ele in zip(
+                uuid7_batch(len(self.sale_items)), self.sale_items
+            )
         ]
         sale_order_items = await SaleOrderItemModel.bulk_create(items)
         return sale_order_items
@@ -109,8 +275,9 @@ class CreateSaleOrderService:
     ):
         stocks = [
             InventoryTransactionModel(
-                id=uuid.uuid4(),
+                id=transaction_id,
                 #
+                location=sale_order.location,
                 sku=ele.sku,
                 product_id=ele.product_id,
                 #
@@ -120,23 +287,27 @@ class CreateSaleOrderService:
                 #
                 sale_order=sale_order,
             )
-            for ele in sale_order_items
+            for transaction_id, ele in zip(
+                uuid7_batch(len(sale_order_items)), sale_order_items
+            )
         ]
-        await InventoryTransactionModel.bulk_create(stocks)
+        for shard, shard_stocks in group_by_shard(
+            stocks, lambda ele: ele.product_id
+        ).items():
+            await InventoryTransactionModel.bulk_create(
+                shard_stocks, using_db=await shard_connection(shard)
+            )
+        await get_stock_counter().publish(
+            stock_deltas(sale_order_items, sign=-1), guard=True
+        )
 
     @classmethod
     async def run_aggregation(
         cls, sale_order: SaleOrderModel, sale_items: List[SaleOrderItemModel]
     ):
-        raw_sql = f"""
-            SELECT sale_order_id, SUM(price * quantity) as total_price, SUM(quantity) as total_units
-            FROM sale_order_item
-            WHERE sale_order_id = $1
-            GROUP BY sale_order_id
-            """
         res_len, list_values = await Tortoise.get_connection(
             TORTOISE_DEFAULT_CONN_NAME
-        ).execute_query(raw_sql, [sale_order.id])
+        ).execute_query(_SALE_ORDER_TOTALS_SQL, [sale_order.id])
 
         if res_len != 1:
             # filter by purchase id must return only one row for list_values
@@ -150,6 +321,7 @@ class CreateSaleOrderService:
 
         return CreateSaleOrderRes(
             id=sale_order.id,
+            location=sale_order.location,
             created=sale_order.created,
             modified=sale_order.modified,
             total_price=total_price,
@@ -159,6 +331,457 @@ class CreateSaleOrderService:
         )
 
 
+class CreateSaleOrdersService:
+    """
+    create a batch of sale orders in the caller's transaction,
+    one multi-row statement per table instead of 4 round trips per order
+    """
+
+    def __init__(self, data: CreateSaleOrdersReq):
+        self.orders = data.orders
+
+    async def create(self) -> CreateSaleOrdersRes:
+        await self.assign_missing_ids()
+        errors = self.validate()
+        valid_orders = [
+            ele for ele in self.unique_orders() if ele.id not in errors
+        ]
+        created_orders = await self.create_sale_orders(valid_orders)
+        for ele in valid_orders:
+            if ele.id not in created_orders:
+                errors[ele.id] = "Sale order id already exists"
+
+        valid_orders = [
+            ele for ele in valid_orders if ele.id in created_orders
+        ]
+        sale_items = await self.create_sale_items(valid_orders)
+        await self.add_transactions(
+            sale_items,
+            {
+                sale_id: ele["location"]
+                for sale_id, ele in created_orders.items()
+            },
+        )
+
+        results = []
+        seen_ids = set()
+        for ele in self.orders:
+            if ele.id in seen_ids:
+                error = "Sale order id is duplicated in the batch"
+            else:
+                error = errors.get(ele.id)
+            seen_ids.add(ele.id)
+
+            if error:
+                results.append(CreateSaleOrderResult(id=ele.id, error=error))
+                continue
+            results.append(
+                CreateSaleOrderResult(
+                    id=ele.id,
+                    order=self.to_response(
+                        created_orders[ele.id], sale_items[ele.id]
+                    ),
+                )
+            )
+        return CreateSaleOrdersRes(results=results)
+
+    async def create_reserved(self) -> CreateSaleOrdersRes:
+        """
+        create() in a sharded transaction of its own, each order reserved
+        through the stock counter first. an order short in the counter, or
+        in stock_level when another process took the stock first, fails
+        alone with the shortage as its error
+        """
+        await self.assign_missing_ids()
+        short_errors: Dict[int, str] = {}
+        while True:
+            handler = CreateSaleOrdersService(
+                data=CreateSaleOrdersReq(
+                    orders=[
+                        ele
+                        for ele in self.orders
+                        if ele.id not in short_errors
+                    ]
+                )
+            )
+            deltas = {
+                ele.id: stock_deltas(ele.sale_items, sign=-1)
+                for ele in handler.unique_orders()
+            }
+            try:
+                async with get_stock_counter().reservations(deltas) as short:
+                    for sale_id, keys in short.items():
+                        short_errors[sale_id] = str(OutOfStockError(keys))
+                    handler.orders = [
+                        ele for ele in handler.orders if ele.id not in short
+                    ]
+                    async with sharded_transaction():
+                        res = await handler.create()
+                break
+            except OutOfStockError as e:
+                short_ids = [
+                    sale_id
+                    for sale_id, order_deltas in deltas.items()
+                    if any(key in order_deltas for key in e.keys)
+                ]
+                if not short_ids:
+                    raise
+                for sale_id in short_ids:
+                    short_errors[sale_id] = str(e)
+
+        results = []
+        created = iter(res.results)
+        seen_ids = set()
+        for ele in self.orders:
+            if ele.id in short_errors:
+                results.append(
+                    CreateSaleOrderResult(
+                        id=ele.id,
+                        error=(
+                            "Sale order id is duplicated in the batch"
+                            if ele.id in seen_ids
+                            else short_errors[ele.id]
+                        ),
+                    )
+                )
+            else:
+                results.append(next(created))
+            seen_ids.add(ele.id)
+        return CreateSaleOrdersRes(results=results)
+
+    async def assign_missing_ids(self):
+        missing = [ele for ele in self.orders if ele.id is None]
+        if not missing:
+            return
+        ids = await allocate_ids(IdSequenceType.SALE_ORDER, len(missing))
+        for ele, sale_id in zip(missing, ids):
+            ele.id = sale_id
+
+    def unique_orders(self) -> List[CreateSaleOrderReq]:
+        """
+        the first occurrence of a duplicated id wins
+        """
+        return list({ele.id: ele for ele in reversed(self.orders)}.values())
+
+    def validate(self) -> Dict[int, str]:
+        errors = {}
+        for ele in self.unique_orders():
+            if not ele.sale_items:
+                errors[ele.id] = "Sale order items are empty"
+            elif any(item.quantity <= 0 for item in ele.sale_items):
+                errors[ele.id] = "Sale item quantity must be positive"
+            elif any(
+                len(item.sku) > _MAX_CODE_LENGTH
+                or len(item.unique_identifier or "") > _MAX_CODE_LENGTH
+                for item in ele.sale_items
+            ):
+                errors[ele.id] = (
+                    "Sale item sku and unique_identifier are limited to %s"
+                    " characters" % _MAX_CODE_LENGTH
+                )
+            else:
+                try:
+                    ele.location = resolve_location(ele.location)
+                except ValueError as e:
+                    errors[ele.id] = str(e)
+        return errors
+
+    @classmethod
+    async def create_sale_orders(
+        cls, orders: List[CreateSaleOrderReq]
+    ) -> Dict[int, dict]:
+        """
+        ids already taken are skipped by ON CONFLICT and missing in the result
+        """
+        if not orders:
+            return {}
+
+        raw_sql = """
+            INSERT INTO sale_order (id, location, status)
+            SELECT id, location, $3
+            FROM unnest($1::int[], $2::varchar[]) AS t(id, location)
+            ON CONFLICT (id) DO NOTHING
+            RETURNING id, location, status, created, modified
+            """
+        _, list_values = await Tortoise.get_connection(
+            TORTOISE_DEFAULT_CONN_NAME
+        ).execute_query(
+            raw_sql,
+            [
+                [ele.id for ele in orders],
+                [ele.location for ele in orders],
+                SaleOrderStatusType.DRAFT.value,
+            ],
+        )
+        return {ele["id"]: dict(ele) for ele in list_values}
+
+    @classmethod
+    async def create_sale_items(
+        cls, orders: List[CreateSaleOrderReq]
+    ) -> Dict[int, List[SaleItemRes]]:
+        sale_items: Dict[int, List[SaleItemRes]] = {}
+        rows = []
+        for order in orders:
+            sale_items[order.id] = []
+            for ele in order.sale_items:
+                rows.append((order.id, ele))
+        rows = [
+            (item_id, sale_id, ele)
+            for item_id, (sale_id, ele) in zip(uuid7_batch(len(rows)), rows)
+        ]
+
+        if not rows:
+            return sale_items
+
+        raw_sql = """
+            INSERT INTO sale_order_item (
+                id, sale_order_id, product_id, sku, quantity, price
+            )
+            SELECT * FROM unnest(
+                $1::uuid[], $2::int[], $3::uuid[], $4::varchar[],
+                $5::int[], $6::int[]
+            )
+            RETURNING id, created, modified
+            """
+        _, list_values = await Tortoise.get_connection(
+            TORTOISE_DEFAULT_CONN_NAME
+        ).execute_query(
+            raw_sql,
+            [
+                [item_id for item_id, _, _ in rows],
+                [sale_id for _, sale_id, _ in rows],
+                [ele.product_id for _, _, ele in rows],
+                [ele.sku for _, _, ele in rows],
+                [ele.quantity for _, _, ele in rows],
+                [ele.price for _, _, ele in rows],
+            ],
+        )
+        timestamps = {ele["id"]: ele for ele in list_values}
+        for item_id, sale_id, ele in rows:
+            sale_items[sale_id].append(
+                SaleItemRes(
+                    id=item_id,
+                    created=timestamps[item_id]["created"],
+                    modified=timestamps[item_id]["modified"],
+                    **ele.model_dump(),
+                )
+            )
+        return sale_items
+
+    @classmethod
+    async def add_transactions(
+        cls,
+        sale_items: Dict[int, List[SaleItemRes]],
+        locations: Dict[int, str],
+    ):
+        rows = [
+            (sale_id, ele)
+            for sale_id, items in sale_items.items()
+            for ele in items
+        ]
+        if not rows:
+            return
+
+        raw_sql = """
+            INSERT INTO inventory_transaction (
+                id, sale_order_id, location, product_id, sku, quantity,
+                transaction_type
+            )
+            SELECT id, sale_order_id, location, product_id, sku, -quantity, $7
+            FROM unnest(
+                $1::uuid[], $2::int[], $3::varchar[], $4::uuid[],
+                $5::varchar[], $6::int[]
+            ) AS t(id, sale_order_id, location, product_id, sku, quantity)
+            """
+        for shard, shard_rows in group_by_shard(
+            rows, lambda ele: ele[1].product_id
+        ).items():
+            conn = await shard_connection(shard)
+            await conn.execute_query(
+                raw_sql,
+                [
+                    uuid7_batch(len(shard_rows)),
+                    [sale_id for sale_id, _ in shard_rows],
+                    [locations[sale_id] for sale_id, _ in shard_rows],
+                    [ele.product_id for _, ele in shard_rows],
+                    [ele.sku for _, ele in shard_rows],
+                    [ele.quantity for _, ele in shard_rows],
+                    TransactionType.SALE.value,
+                ],
+            )
+        await get_stock_counter().publish(
+            stock_deltas([ele for _, ele in rows], sign=-1), guard=True
+        )
+
+    @classmethod
+    def to_response(
+        cls, sale_order: dict, sale_items: List[SaleItemRes]
+    ) -> CreateSaleOrderRes:
+        return CreateSaleOrderRes(
+            id=sale_order["id"],
+            location=sale_order["location"],
+            created=sale_order["created"],
+            modified=sale_order["modified"],
+            status=sale_order["status"],
+            total_price=sum(ele.price * ele.quantity for ele in sale_items),
+            total_units=sum(ele.quantity for ele in sale_items),
+            sale_items=sale_items,
+        )
+
+
+class SaleOrderGroupCommitter:
+    """
+    merge the sale orders submitted within max_delay_ms into one
+    CreateSaleOrdersService transaction, every caller gets its response
+    after the shared commit. when the shared transaction fails each order
+    of the batch is committed on its own
+    """
+
+    def __init__(
+        self,
+        max_delay_ms: int = GROUP_COMMIT_MAX_DELAY_MS,
+        max_batch_size: int = GROUP_COMMIT_MAX_BATCH_SIZE,
+    ):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.worker: Union[asyncio.Task, None] = None
+
+    async def submit(self, data: CreateSaleOrderReq) -> CreateSaleOrderRes:
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self.run())
+
+        future = asyncio.get_running_loop().create_future()
+        # the worker hands the versions published over to the reservation
+        await self.queue.put((data, future, published_versions()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self.queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            await self.commit(batch)
+
+    async def commit(self, batch: List[tuple]):
+        try:
+            with collect_published({}) as published:
+                async with sharded_transaction():
+                    res = await CreateSaleOrdersService(
+                        data=CreateSaleOrdersReq(
+                            orders=[data for data, _, _ in batch]
+                        )
+                    ).create()
+        except Exception as e:
+            logger.warning(
+                "[%s] group commit of %s orders failed, commit one by one, "
+                "error: %s" % (self.__class__.__name__, len(batch), e)
+            )
+            await asyncio.gather(
+                *[
+                    self.commit_one(data, future, versions)
+                    for data, future, versions in batch
+                ]
+            )
+            return
+
+        for _, _, versions in batch:
+            if versions is not None:
+                versions.update(published)
+        for (_, future, _), result in zip(batch, res.results):
+            if future.done():
+                # the caller went away
+                continue
+            if result.order:
+                future.set_result(result.order)
+            elif result.error in _DUPLICATED_ID_ERRORS:
+                future.set_exception(IntegrityError(result.error))
+            else:
+                future.set_exception(ValueError(result.error))
+
+    @classmethod
+    async def commit_one(
+        cls,
+        data: CreateSaleOrderReq,
+        future: asyncio.Future,
+        versions: Union[dict, None],
+    ):
+        try:
+            with collect_published(versions):
+                async with sharded_transaction():
+                    res = await CreateSaleOrderService(data=data).create()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(res)
+
+
+_DUPLICATED_ID_ERRORS = (
+    "Sale order id already exists",
+    "Sale order id is duplicated in the batch",
+)
+_group_committer: Union[SaleOrderGroupCommitter, None] = None
+
+
+def get_group_committer() -> SaleOrderGroupCommitter:
+    global _group_committer
+    if _group_committer is None:
+        _group_committer = SaleOrderGroupCommitter()
+    return _group_committer
+
+
+async def add_transfers(transfers: Dict[tuple, int]):
+    """
+    write the TRANSFER ledger rows of the entities allocated to a sale
+    order from another location, transfers maps (sale_id, from_location,
+    to_location, product_id, sku) to a quantity. the SALE row was written
+    at the sale order location, the quantity moves there
+    """
+    rows = []
+    for key, quantity in transfers.items():
+        sale_id, from_location, to_location, product_id, sku = key
+        rows.append((sale_id, from_location, product_id, sku, -quantity))
+        rows.append((sale_id, to_location, product_id, sku, quantity))
+
+    raw_sql = """
+        INSERT INTO inventory_transaction (
+            id, sale_order_id, location, product_id, sku, quantity,
+            transaction_type
+        )
+        SELECT id, sale_order_id, location, product_id, sku, quantity, $7
+        FROM unnest(
+            $1::uuid[], $2::int[], $3::varchar[], $4::uuid[],
+            $5::varchar[], $6::int[]
+        ) AS t(id, sale_order_id, location, product_id, sku, quantity)
+        """
+    for shard, shard_rows in group_by_shard(rows, lambda ele: ele[2]).items():
+        conn = await shard_connection(shard)
+        await conn.execute_query(
+            raw_sql,
+            [
+                uuid7_batch(len(shard_rows)),
+                [ele[0] for ele in shard_rows],
+                [ele[1] for ele in shard_rows],
+                [ele[2] for ele in shard_rows],
+                [ele[3] for ele in shard_rows],
+                [ele[4] for ele in shard_rows],
+                TransactionType.TRANSFER.value,
+            ],
+        )
+
+
 class AutoFillSaleOrder:
     def __init__(self, sale_id: int):
         self.sale_id = sale_id
@@ -175,31 +798,72 @@ class AutoFillSaleOrder:
             sale_order_id=self.sale_id
         )
         purchase_item_entity_selection = (
-            await self.update_status_purchase_entities(sale_order_items)
+            await self.update_status_purchase_entities(
+                sale_order, sale_order_items
+            )
         )
         await self.add_sale_order_entities(
             sale_order, purchase_item_entity_selection
         )
         sale_order.status = SaleOrderStatusType.CONFIRMED.value
-        await sale_order.save(update_fields=["status"])
+        await sale_order.save(update_fields=["status", "modified"])
         return SaleOrderRes(**sale_order.__dict__)
 
+    @classmethod
+    def available_entities(
+        cls, product_id: uuid.UUID, sku: str
+    ) -> QuerySet[PurchaseItemEntityModel]:
+        # oldest purchase first, the FIFO cost of services/valuation.py
+        return PurchaseItemEntityModel.filter(
+            product_id=product_id,
+            sku=sku,
+            status=EntityStockStatusType.AVAILABLE.value,
+        ).order_by("purchase_id", "created")
+
     @classmethod
     async def update_status_purchase_entities(
-        cls, sale_order_items: List[SaleOrderItemModel]
+        cls,
+        sale_order: SaleOrderModel,
+        sale_order_items: List[SaleOrderItemModel],
     ):
         future_tasks = []
         purchase_item_entity_selection = []
+        transfers: Dict[tuple, int] = {}
+        other_locations = [
+            ele for ele in STOCK_LOCATIONS if ele != sale_order.location
+        ]
         for item in sale_order_items:
-            queryset = PurchaseItemEntityModel.filter(
-                product_id=item.product_id,
-                sku=item.sku,
-                status=EntityStockStatusType.AVAILABLE.value,
-            ).limit(item.quantity)
-            list_ids = await queryset.values_list("id", flat=True)
-            if not list_ids:
+            conn = await shard_connection(shard_of(item.product_id))
+            queryset = cls.available_entities(
+                item.product_id, item.sku
+            ).using_db(conn)
+            # the sale order location first, then the other ones
+            entities = list(
+                await queryset.filter(location=sale_order.location)
+                .limit(item.quantity)
+                .values_list("id", "location")
+            )
+            if len(entities) < item.quantity and other_locations:
+                entities += (
+                    await queryset.filter(location__in=other_locations)
+                    .limit(item.quantity - len(entities))
+                    .values_list("id", "location")
+                )
+            if not entities:
                 raise Exception("Not enough stock")
 
+            list_ids = [entity_id for entity_id, _ in entities]
+            for _, location in entities:
+                if location != sale_order.location:
+                    key = (
+                        sale_order.id,
+                        location,
+                        sale_order.location,
+                        item.product_id,
+                        item.sku,
+                    )
+                    transfers[key] = transfers.get(key, 0) + 1
+
             purchase_item_entity_selection.append(
                 {
                     "sale_order_item_id": item.id,
@@ -211,13 +875,18 @@ class AutoFillSaleOrder:
             # if item.unique_identifier:
             #     queryset = queryset.filter(unique_identifier=item.unique_identifier)
 
+            # status filter keeps the update on the available partition
             future_tasks.append(
-                PurchaseItemEntityModel.filter(id__in=list_ids).update(
-                    status=EntityStockStatusType.SOLD.value
+                PurchaseItemEntityModel.filter(
+                    id__in=list_ids,
+                    status=EntityStockStatusType.AVAILABLE.value,
                 )
+                .using_db(conn)
+                .update(status=EntityStockStatusType.SOLD.value)
             )
 
         await asyncio.gather(*future_tasks)
+        await add_transfers(transfers)
         return purchase_item_entity_selection
 
     @classmethod
@@ -227,6 +896,7 @@ class AutoFillSaleOrder:
         purchase_item_entity_selection: List[dict],
     ):
         # add SaleOrderItemEntityModel
+        batcher = get_batcher(SaleOrderItemEntityModel)
         list_sale_order_item_entities = []
         for sale_order_item in purchase_item_entity_selection:
             sale_order_item_id = sale_order_item["sale_order_item_id"]
@@ -235,17 +905,20 @@ class AutoFillSaleOrder:
             ]
             list_being_created = [
                 SaleOrderItemEntityModel(
-                    id=uuid.uuid4(),
+                    id=link_id,
                     #
                     sale_order_id=new_sale_order.id,
                     sale_order_item_id=sale_order_item_id,
                     #
                     purchase_item_entity_id=purchase_item_entity_id,
                 )
-                for purchase_item_entity_id in list_purchase_item_entity_ids
+                for link_id, purchase_item_entity_id in zip(
+                    uuid7_batch(len(list_purchase_item_entity_ids)),
+                    list_purchase_item_entity_ids,
+                )
             ]
             list_sale_order_item_entities.extend(list_being_created)
-            if len(list_sale_order_item_entities) >= CHUNK_SIZE:
+            if len(list_sale_order_item_entities) >= batcher.batch_size:
                 await bulk_create_model(
                     SaleOrderItemEntityModel, list_sale_order_item_entities
                 )
@@ -255,9 +928,290 @@ class AutoFillSaleOrder:
         )
 
 
+class BulkAutoFillSaleOrders:
+    """
+    confirm many draft sale orders in the caller's transaction,
+    stock is allocated FIFO by purchase and orders are served by id,
+    an order is confirmed only when all of its items can be filled.
+    an order takes the stock of its location first, then of the others
+    """
+
+    def __init__(self, data: AutoFillSaleOrdersReq):
+        self.sale_ids = data.sale_ids or None
+        self.limit = data.limit or (
+            len(data.sale_ids) if data.sale_ids else AUTO_FILL_BATCH_LIMIT
+        )
+
+    async def auto_fill(self) -> AutoFillSaleOrdersRes:
+        conn = Tortoise.get_connection(TORTOISE_DEFAULT_CONN_NAME)
+        locations = await self.lock_draft_orders(conn)
+        if not locations:
+            return AutoFillSaleOrdersRes(confirmed_ids=[], short_ids=[])
+
+        sale_ids = list(locations)
+        _, sale_order_items = await conn.execute_query(
+            """
+            SELECT id, sale_order_id, product_id, sku, quantity
+            FROM sale_order_item
+            WHERE sale_order_id = ANY($1::int[])
+            ORDER BY sale_order_id
+            """,
+            [sale_ids],
+        )
+        items_by_order: Dict[int, List[dict]] = {
+            sale_id: [] for sale_id in sale_ids
+        }
+        # quantity per location of every (product_id, sku)
+        demand: Dict[tuple, Dict[str, int]] = {}
+        for item in sale_order_items:
+            items_by_order[item["sale_order_id"]].append(item)
+            by_location = demand.setdefault(
+                (item["product_id"], item["sku"]), {}
+            )
+            location = locations[item["sale_order_id"]]
+            by_location[location] = (
+                by_location.get(location, 0) + item["quantity"]
+            )
+
+        stock = {
+            key: await self.select_available_entities(
+                await shard_connection(shard_of(key[0])), key, by_location
+            )
+            for key, by_location in demand.items()
+        }
+
+        confirmed_ids, short_ids, links = [], [], []
+        entities_by_shard: Dict[str, List[uuid.UUID]] = {}
+        transfers: Dict[tuple, int] = {}
+        for sale_id in sale_ids:
+            items = items_by_order[sale_id]
+            if not items or any(
+                sum(
+                    len(pool)
+                    for pool in stock[(ele["product_id"], ele["sku"])].values()
+                )
+                < ele["quantity"]
+                for ele in self.merge_items(items)
+            ):
+                short_ids.append(sale_id)
+                continue
+
+            confirmed_ids.append(sale_id)
+            location = locations[sale_id]
+            for item in items:
+                pools = stock[(item["product_id"], item["sku"])]
+                entity_ids = entities_by_shard.setdefault(
+                    shard_of(item["product_id"]), []
+                )
+                for _ in range(item["quantity"]):
+                    entity_location, entity_id = self.take_entity(
+                        pools, location
+                    )
+                    links.append((sale_id, item["id"], entity_id))
+                    entity_ids.append(entity_id)
+                    if entity_location != location:
+                        key = (
+                            sale_id,
+                            entity_location,
+                            location,
+                            item["product_id"],
+                            item["sku"],
+                        )
+                        transfers[key] = transfers.get(key, 0) + 1
+
+        await self.save_allocation(
+            conn, confirmed_ids, links, entities_by_shard
+        )
+        await add_transfers(transfers)
+        return AutoFillSaleOrdersRes(
+            confirmed_ids=confirmed_ids, short_ids=short_ids
+        )
+
+    async def lock_draft_orders(self, conn) -> Dict[int, str]:
+        """
+        return the location of the locked orders by id
+        """
+        _, list_values = await conn.execute_query(
+            """
+            SELECT id, location FROM sale_order
+            WHERE status = $1
+                AND ($2::int[] IS NULL OR id = ANY($2::int[]))
+            ORDER BY id
+            LIMIT $3
+            FOR UPDATE SKIP LOCKED
+            """,
+            [SaleOrderStatusType.DRAFT.value, self.sale_ids, self.limit],
+        )
+        return {ele["id"]: ele["location"] for ele in list_values}
+
+    @classmethod
+    def merge_items(cls, items: List[dict]) -> List[dict]:
+        """
+        an order may list the same sku twice, check the summed quantity
+        """
+        merged: Dict[tuple, dict] = {}
+        for ele in items:
+            key = (ele["product_id"], ele["sku"])
+            if key in merged:
+                merged[key]["quantity"] += ele["quantity"]
+            else:
+                merged[key] = dict(ele)
+        return list(merged.values())
+
+    @classmethod
+    async def select_available_entities(
+        cls, conn, key: tuple, demand: Dict[str, int]
+    ) -> Dict[str, deque]:
+        """
+        lock the entities each location needs in that location, the
+        shortfall is then taken from any location, oldest purchase first
+        """
+        product_id, sku = key
+        pools = {location: deque() for location in demand}
+        selected: List[uuid.UUID] = []
+        for location, quantity in demand.items():
+            _, list_values = await conn.execute_query(
+                _AVAILABLE_ENTITIES_SQL,
+                [
+                    [location],
+                    product_id,
+                    sku,
+                    EntityStockStatusType.AVAILABLE.value,
+                    [],
+                    quantity,
+                ],
+            )
+            pools[location].extend(ele["id"] for ele in list_values)
+            selected.extend(ele["id"] for ele in list_values)
+
+        shortfall = sum(demand.values()) - len(selected)
+        if shortfall > 0:
+            _, list_values = await conn.execute_query(
+                _AVAILABLE_ENTITIES_SQL,
+                [
+                    STOCK_LOCATIONS,
+                    product_id,
+                    sku,
+                    EntityStockStatusType.AVAILABLE.value,
+                    selected,
+                    shortfall,
+                ],
+            )
+            for ele in list_values:
+                pools.setdefault(ele["location"], deque()).append(ele["id"])
+        return pools
+
+    @classmethod
+    def take_entity(
+        cls, pools: Dict[str, deque], location: str
+    ) -> Tuple[str, uuid.UUID]:
+        """
+        the next entity of the location, of another one when it is empty
+        """
+        if not pools.get(location):
+            location = next(key for key, pool in pools.items() if pool)
+        return location, pools[location].popleft()
+
+    @classmethod
+    async def save_allocation(
+        cls,
+        conn,
+        confirmed_ids: List[int],
+        links: List[tuple],
+        entities_by_shard: Dict[str, List[uuid.UUID]],
+    ):
+        if not confirmed_ids:
+            return
+
+        if links:
+            for shard, entity_ids in entities_by_shard.items():
+                shard_conn = await shard_connection(shard)
+                await shard_conn.execute_query(
+                    """
+                    UPDATE purchase_item_entity
+                    SET status = $2, modified = now()
+                    WHERE id = ANY($1::uuid[]) AND status = $3
+                    """,
+                    [
+                        entity_ids,
+                        EntityStockStatusType.SOLD.value,
+                        EntityStockStatusType.AVAILABLE.value,
+                    ],
+                )
+            await conn.execute_query(
+                """
+                INSERT INTO sale_order_item_entity (
+                    id, sale_order_id, sale_order_item_id,
+                    purchase_item_entity_id
+                )
+                SELECT * FROM unnest(
+                    $1::uuid[], $2::int[], $3::uuid[], $4::uuid[]
+                )
+                """,
+                [
+                    uuid7_batch(len(links)),
+                    [sale_id for sale_id, _, _ in links],
+                    [item_id for _, item_id, _ in links],
+                    [entity_id for _, _, entity_id in links],
+                ],
+            )
+        await conn.execute_query(
+            """
+            UPDATE sale_order SET status = $2, modified = now()
+            WHERE id = ANY($1::int[])
+            """,
+            [confirmed_ids, SaleOrderStatusType.CONFIRMED.value],
+        )
+
+
+SALE_ORDER_LIST_FIELDS = [
+    "id",
+    "status",
+    "location",
+    "created",
+    "modified",
+    "total_price",
+    "total_units",
+]
+_SALE_ORDER_LIST_COLUMNS = {
+    "id": "sale_order.id",
+    "status": "sale_order.status",
+    "location": "sale_order.location",
+    "created": "sale_order.created",
+    "modified": "sale_order.modified",
+    "total_price": "COALESCE(sub_query.total_price, 0) as total_price",
+    "total_units": "COALESCE(sub_query.total_units, 0) as total_units",
+}
+
+
 class GetListSaleOrderService:
-    def __init__(self, sale_order_ids: Union[List[int], None] = None):
+    def __init__(
+        self,
+        sale_order_ids: Union[List[int], None] = None,
+        fields: Union[Iterable[str], None] = None,
+    ):
         self.sale_order_ids = sale_order_ids if sale_order_ids else []
+        self.fields = select_fields(fields, SALE_ORDER_LIST_FIELDS)
+
+    async def get_version(
+        self, status_filter: SaleOrderStatusType = None
+    ) -> ListVersion:
+        """
+        changes whenever a sale order of the list is created or changes
+        status, every status change sets modified. same scope as
+        get_list_sale_orders: the ids plus the orders of status_filter,
+        every order when that is empty
+        """
+        if not status_filter and not self.sale_order_ids:
+            return await get_list_version(SaleOrderModel.all())
+
+        scope = Q(id__in=self.sale_order_ids)
+        if status_filter:
+            scope |= Q(status=status_filter.value)
+        version = await get_list_version(SaleOrderModel.filter(scope))
+        if version.total:
+            return version
+        return await get_list_version(SaleOrderModel.all())
 
     async def get_list_sale_orders(
         self,
@@ -265,13 +1219,17 @@ class GetListSaleOrderService:
         offset: int,
         status_filter: SaleOrderStatusType = None,
     ) -> GetListSaleOrderRes:
-        _selected_fields = f"""
-            sub_query.sale_order_id,
-            sub_query.total_price,
-            sub_query.total_units,
-            sale_order.status,
-            sale_order.created,
-            sale_order.modified"""
+        """
+        the sale orders are paged by their primary key, their items are only
+        aggregated when a total is in the fields, a sale order without items
+        totals 0
+        """
+        _selected_fields = ", ".join(
+            _SALE_ORDER_LIST_COLUMNS[ele] for ele in self.fields
+        )
+        with_totals = "total_price" in self.fields or (
+            "total_units" in self.fields
+        )
 
         if status_filter:
             sale_order_ids = await SaleOrderModel.filter(
@@ -281,43 +1239,43 @@ class GetListSaleOrderService:
 
         if not self.sale_order_ids:
             queryset = SaleOrderModel.all()
-            raw_sql = f"""
-            SELECT %s
-            FROM (
-                SELECT sale_order_id, SUM(price * quantity) as total_price, SUM(quantity) as total_units
-                FROM sale_order_item
-                GROUP BY sale_order_id
-                ORDER BY sale_order_id DESC
-                LIMIT $1
-                OFFSET $2) as sub_query
-            INNER JOIN sale_order ON sub_query.sale_order_id = sale_order.id
-            ORDER BY sub_query.sale_order_id DESC
-            """
+            where_clause = ""
             params = [limit, offset]
         else:
             queryset = SaleOrderModel.filter(id__in=self.sale_order_ids)
             len_order_ids = len(self.sale_order_ids)
-
-            where_clause = ", ".join(
+            where_clause = "WHERE {column} IN (%s)" % ", ".join(
                 [f"${i + 1}" for i in range(len_order_ids)]
             )
+            params = [ele for ele in self.sale_order_ids] + [
+                limit,
+                offset,
+            ]
+
+        if with_totals:
             raw_sql = f"""
                 SELECT %s
                 FROM (
-                    SELECT sale_order_id, SUM(price * quantity) as total_price, SUM(quantity) as total_units
+                    SELECT * FROM sale_order
+                    {where_clause.format(column="sale_order.id")}
+                    ORDER BY sale_order.id DESC
+                    LIMIT ${len(params) - 1}
+                    OFFSET ${len(params)}) as sale_order
+                LEFT JOIN LATERAL (
+                    SELECT SUM(price * quantity) as total_price, SUM(quantity) as total_units
                     FROM sale_order_item
-                    WHERE sale_order_id IN ({where_clause})
-                    GROUP BY sale_order_id
-                    ORDER BY sale_order_id DESC
-                    LIMIT ${len_order_ids + 1}
-                    OFFSET ${len_order_ids + 2}) as sub_query
-                INNER JOIN sale_order ON sub_query.sale_order_id = sale_order.id
-                ORDER BY sub_query.sale_order_id DESC
+                    WHERE sale_order_item.sale_order_id = sale_order.id) as sub_query ON TRUE
+                ORDER BY sale_order.id DESC
+                """
+        else:
+            raw_sql = f"""
+                SELECT %s
+                FROM sale_order
+                {where_clause.format(column="sale_order.id")}
+                ORDER BY sale_order.id DESC
+                LIMIT ${len(params) - 1}
+                OFFSET ${len(params)}
                 """
-            params = [ele for ele in self.sale_order_ids] + [
-                limit,
-                offset,
-            ]
 
         total_promise = queryset.count()
         sql_promise = Tortoise.get_connection(
@@ -327,16 +1285,326 @@ class GetListSaleOrderService:
             total_promise, sql_promise
         )
 
-        results: List[SaleOrderResV2] = []
-        for sale_order in list_values:
-            sale_order_res = SaleOrderResV2(
-                id=sale_order.get("sale_order_id"),
-                total_price=sale_order.get("total_price"),
-                total_units=sale_order.get("total_units"),
-                created=sale_order.get("created"),
-                modified=sale_order.get("modified"),
-                status=sale_order.get("status"),
+        results = [
+            SaleOrderResV2(**{name: sale_order[name] for name in self.fields})
+            for sale_order in list_values
+        ]
+        return GetListSaleOrderRes(results=results, total=total)
+
+
+class ExportSaleOrderService:
+    """
+    the sale orders of status_filter created in [created_from, created_to)
+    with their totals, in id order, aggregated in one pass instead of a
+    GROUP BY per page
+    """
+
+    columns = [
+        "id",
+        "status",
+        "location",
+        "created",
+        "modified",
+        "total_price",
+        "total_units",
+    ]
+
+    def __init__(
+        self,
+        status_filter: Union[SaleOrderStatusType, None] = None,
+        created_from: Union[datetime, None] = None,
+        created_to: Union[datetime, None] = None,
+    ):
+        self.status_filter = status_filter
+        self.created_from = created_from
+        self.created_to = created_to
+
+    def batches(
+        self, batch_size: int = EXPORT_STREAM_BATCH_SIZE
+    ) -> AsyncIterator[List[dict]]:
+        params: list = []
+        conditions = created_between(
+            "sale_order.created", self.created_from, self.created_to, params
+        )
+        if self.status_filter:
+            params.append(self.status_filter.value)
+            conditions.append(f"sale_order.status = ${len(params)}")
+        where_clause = (
+            "WHERE " + " AND ".join(conditions) if conditions else ""
+        )
+        raw_sql = f"""
+            SELECT sale_order.id, sale_order.status, sale_order.location,
+                sale_order.created, sale_order.modified,
+                COALESCE(SUM(item.price * item.quantity), 0) as total_price,
+                COALESCE(SUM(item.quantity), 0) as total_units
+            FROM sale_order
+            LEFT JOIN sale_order_item item ON item.sale_order_id = sale_order.id
+            {where_clause}
+            GROUP BY sale_order.id
+            ORDER BY sale_order.id
+            """
+        return stream_query(raw_sql, params, batch_size)
+
+
+# target status: statuses it can be reached from
+_SALE_ORDER_TRANSITIONS = {
+    SaleOrderStatusType.SHIPPED: (SaleOrderStatusType.CONFIRMED,),
+    SaleOrderStatusType.DELIVERED: (SaleOrderStatusType.SHIPPED,),
+    SaleOrderStatusType.CANCELLED: (
+        SaleOrderStatusType.DRAFT,
+        SaleOrderStatusType.CONFIRMED,
+    ),
+}
+
+
+class BulkTransitionSaleOrders:
+    """
+    move many sale orders to a new status, batch_size orders per
+    transaction, orders not in an allowed source status are skipped
+
+    cancelling gives the stock back: the RETURN ledger rows offset the
+    SALE rows written at creation and the entities allocated by auto-fill
+    are unlinked and AVAILABLE again in their location
+    """
+
+    def __init__(
+        self,
+        data: TransitionSaleOrdersReq,
+        batch_size: int = SALE_ORDER_TRANSITION_BATCH_SIZE,
+    ):
+        if data.status not in _SALE_ORDER_TRANSITIONS:
+            raise ValueError(
+                f"Sale orders can not be moved to {data.status.value}"
             )
-            results.append(sale_order_res)
+        self.sale_ids = list(dict.fromkeys(data.sale_ids))
+        self.status = data.status
+        self.from_statuses = [
+            ele.value for ele in _SALE_ORDER_TRANSITIONS[data.status]
+        ]
+        self.batch_size = batch_size
 
-        return GetListSaleOrderRes(results=results, total=total)
+    async def transition(self) -> TransitionSaleOrdersRes:
+        res = TransitionSaleOrdersRes(
+            status=self.status,
+            transitioned_ids=[],
+            skipped_ids=[],
+            released_entities=0,
+        )
+        for i in range(0, len(self.sale_ids), self.batch_size):
+            batch = self.sale_ids[i : i + self.batch_size]
+            async with sharded_transaction() as conn:
+                if self.status == SaleOrderStatusType.CANCELLED:
+                    sale_ids, released, deltas = await self.cancel(conn, batch)
+                    await get_stock_counter().publish(deltas)
+                    res.released_entities += released
+                else:
+                    sale_ids = await self.update_status(conn, batch)
+
+            transitioned = set(sale_ids)
+            res.transitioned_ids.extend(
+                ele for ele in batch if ele in transitioned
+            )
+            res.skipped_ids.extend(
+                ele for ele in batch if ele not in transitioned
+            )
+        logger.info(
+            "[%s] %s orders moved to %s, %s skipped"
+            % (
+                self.__class__.__name__,
+                len(res.transitioned_ids),
+                self.status.value,
+                len(res.skipped_ids),
+            )
+        )
+        return res
+
+    async def update_status(self, conn, sale_ids: List[int]) -> List[int]:
+        _, list_values = await conn.execute_query(
+            """
+            UPDATE sale_order SET status = $2, modified = now()
+            WHERE id = ANY($1::int[]) AND status = ANY($3::varchar[])
+            RETURNING id
+            """,
+            [sale_ids, self.status.value, self.from_statuses],
+        )
+        return [ele["id"] for ele in list_values]
+
+    async def cancel(
+        self, conn, sale_ids: List[int]
+    ) -> Tuple[List[int], int, Dict[Tuple[str, str], int]]:
+        """
+        return the cancelled ids, the number of released entities and the
+        stock deltas of the RETURN rows
+        """
+        # lock first so the next statement's snapshot sees the links of
+        # an auto-fill that committed while we waited
+        _, list_values = await conn.execute_query(
+            """
+            SELECT id FROM sale_order
+            WHERE id = ANY($1::int[]) AND status = ANY($2::varchar[])
+            ORDER BY id
+            FOR UPDATE
+            """,
+            [sale_ids, self.from_statuses],
+        )
+        locked_ids = [ele["id"] for ele in list_values]
+        if not locked_ids:
+            return [], 0, {}
+
+        # the orders and their links are on the default connection, the
+        # entities and the ledger on the shard of each product
+        _, list_values = await conn.execute_query(
+            """
+            WITH cancelled AS (
+                UPDATE sale_order SET status = $2, modified = now()
+                WHERE id = ANY($1::int[])
+                RETURNING id
+            ), unlinked AS (
+                DELETE FROM sale_order_item_entity
+                WHERE sale_order_id = ANY($1::int[])
+                RETURNING sale_order_id, sale_order_item_id,
+                    purchase_item_entity_id
+            )
+            SELECT (SELECT array_agg(id) FROM cancelled) AS sale_ids,
+                array_agg(unlinked.sale_order_id) AS link_sale_ids,
+                array_agg(unlinked.purchase_item_entity_id) AS entity_ids,
+                array_agg(soi.product_id) AS product_ids
+            FROM unlinked
+            INNER JOIN sale_order_item soi
+                ON soi.id = unlinked.sale_order_item_id
+            """,
+            [locked_ids, SaleOrderStatusType.CANCELLED.value],
+        )
+        row = list_values[0]
+        links = list(
+            zip(
+                row["link_sale_ids"] or [],
+                row["entity_ids"] or [],
+                row["product_ids"] or [],
+            )
+        )
+        _, items = await conn.execute_query(
+            """
+            SELECT soi.sale_order_id, so.location, soi.product_id, soi.sku,
+                soi.quantity
+            FROM sale_order_item soi
+            INNER JOIN sale_order so ON so.id = soi.sale_order_id
+            WHERE soi.sale_order_id = ANY($1::int[])
+            """,
+            [locked_ids],
+        )
+        locations = {ele["sale_order_id"]: ele["location"] for ele in items}
+
+        released = 0
+        deltas: Dict[Tuple[str, str], int] = {}
+        items_by_shard = group_by_shard(items, lambda ele: ele["product_id"])
+        links_by_shard = group_by_shard(links, lambda ele: ele[2])
+        for shard, shard_items in items_by_shard.items():
+            shard_released, shard_deltas = await self.cancel_shard(
+                await shard_connection(shard),
+                shard_items,
+                [
+                    (sale_id, entity_id, locations[sale_id])
+                    for sale_id, entity_id, _ in links_by_shard.get(shard, [])
+                ],
+            )
+            released += shard_released
+            deltas.update(shard_deltas)
+        return row["sale_ids"] or [], released, deltas
+
+    @classmethod
+    async def cancel_shard(
+        cls, conn, items: List[dict], links: List[Tuple[int, str, str]]
+    ) -> Tuple[int, Dict[Tuple[str, str], int]]:
+        """
+        release the unlinked entities of the shard and write the RETURN
+        rows of the sale items, links are (sale_order_id,
+        purchase_item_entity_id, sale order location). return the number
+        of released entities and the stock deltas
+        """
+        _, list_values = await conn.execute_query(
+            """
+            WITH link AS (
+                SELECT * FROM unnest($1::int[], $2::uuid[], $3::varchar[])
+                    AS l(sale_order_id, purchase_item_entity_id, to_location)
+            ), released AS (
+                UPDATE purchase_item_entity SET status = $9, modified = now()
+                WHERE status = $10
+                    AND id IN (SELECT purchase_item_entity_id FROM link)
+                RETURNING id, location, product_id, sku
+            ), returned AS (
+                INSERT INTO inventory_transaction (
+                    id, sale_order_id, location, product_id, sku, quantity,
+                    transaction_type
+                )
+                SELECT uuid_generate_v7(), i.sale_order_id, i.location,
+                    i.product_id, i.sku, i.quantity, $11::varchar
+                FROM unnest(
+                    $4::int[], $5::varchar[], $6::uuid[], $7::varchar[],
+                    $8::int[]
+                ) AS i(sale_order_id, location, product_id, sku, quantity)
+                RETURNING product_id, sku, quantity
+            ), transferred_back AS (
+                -- undo the transfers of the entities auto-fill took from
+                -- another location than the sale order's
+                INSERT INTO inventory_transaction (
+                    id, sale_order_id, location, product_id, sku, quantity,
+                    transaction_type
+                )
+                SELECT uuid_generate_v7(), moved.sale_order_id, t.location,
+                    moved.product_id, moved.sku, t.quantity, $12::varchar
+                FROM (
+                    SELECT link.sale_order_id, link.to_location,
+                        released.location AS from_location,
+                        released.product_id, released.sku,
+                        COUNT(*)::int AS quantity
+                    FROM released
+                    INNER JOIN link
+                        ON link.purchase_item_entity_id = released.id
+                    WHERE link.to_location <> released.location
+                    GROUP BY link.sale_order_id, link.to_location,
+                        released.location, released.product_id, released.sku
+                ) moved
+                CROSS JOIN LATERAL (
+                    VALUES (moved.from_location, moved.quantity),
+                        (moved.to_location, -moved.quantity)
+                ) AS t(location, quantity)
+            ), deltas AS (
+                SELECT product_id, sku, SUM(quantity) AS quantity
+                FROM returned
+                GROUP BY product_id, sku
+            )
+            SELECT (SELECT COUNT(*) FROM released) AS released,
+                agg.product_ids, agg.skus, agg.quantities
+            FROM (
+                SELECT array_agg(product_id) AS product_ids,
+                    array_agg(sku) AS skus,
+                    array_agg(quantity) AS quantities
+                FROM deltas
+            ) agg
+            """,
+            [
+                [ele[0] for ele in links],
+                [ele[1] for ele in links],
+                [ele[2] for ele in links],
+                [ele["sale_order_id"] for ele in items],
+                [ele["location"] for ele in items],
+                [ele["product_id"] for ele in items],
+                [ele["sku"] for ele in items],
+                [ele["quantity"] for ele in items],
+                EntityStockStatusType.AVAILABLE.value,
+                EntityStockStatusType.SOLD.value,
+                TransactionType.RETURN.value,
+                TransactionType.TRANSFER.value,
+            ],
+        )
+        row = list_values[0]
+        deltas = {
+            (str(product_id), sku): quantity
+            for product_id, sku, quantity in zip(
+                row["product_ids"] or [],
+                row["skus"] or [],
+                row["quantities"] or [],
+            )
+        }
+        return row["released"], deltas
@@ -0,0 +1,283 @@
+"""
+stock sharding
+
+the ledger (inventory_transaction, inventory_checkpoint and the archive)
+and purchase_item_entity are split by product_id over
+STOCK_SHARD_CONN_NAMES, purchases, sale orders, their items and the sale
+order entity links stay on the default connection. with no shard
+configured the only shard is the default connection
+
+writes spanning several databases use two-phase commit:
+1. every shard transaction is prepared (PREPARE TRANSACTION)
+2. the default transaction records the gid in shard_commit and commits,
+   this commit is the decision
+3. the prepared shard transactions are committed (COMMIT PREPARED)
+
+a failure before 2 rolls every shard back. after a crash between 2 and 3
+`python manageShards.py resolve` commits the prepared transactions whose
+gid is in shard_commit and rolls back the others, once they are older
+than SHARD_RESOLVE_GRACE_SECONDS so a live transaction between 1 and 2 is
+not rolled back. the shards need max_prepared_transactions > 0
+"""
+
+import asyncio
+import contextvars
+import uuid
+from functools import wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    TypeVar,
+    Union,
+)
+
+from services.logger import logger
+from settings import (
+    SHARD_RESOLVE_GRACE_SECONDS,
+    STOCK_SHARD_CONN_NAMES,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
+from tortoise import BaseDBAsyncClient, Tortoise
+from tortoise.transactions import in_transaction
+
+T = TypeVar("T")
+_SHARD_COMMIT_GID_PREFIX = "inventory-"
+
+
+def is_sharded() -> bool:
+    return STOCK_SHARD_CONN_NAMES != [TORTOISE_DEFAULT_CONN_NAME]
+
+
+def shard_of(product_id: Union[uuid.UUID, str]) -> str:
+    """
+    product ids are random, the modulo spreads them evenly. the shard
+    count can't change once data is written
+    """
+    if not is_sharded():
+        return TORTOISE_DEFAULT_CONN_NAME
+    index = uuid.UUID(str(product_id)).int % len(STOCK_SHARD_CONN_NAMES)
+    return STOCK_SHARD_CONN_NAMES[index]
+
+
+def group_by_shard(
+    items: Iterable[T], product_id: Callable[[T], Any]
+) -> Dict[str, List[T]]:
+    groups: Dict[str, List[T]] = {}
+    for ele in items:
+        groups.setdefault(shard_of(product_id(ele)), []).append(ele)
+    return groups
+
+
+async def fan_out(
+    func: Callable[[str], Awaitable[T]],
+    shards: Union[Iterable[str], None] = None,
+) -> Dict[str, T]:
+    """
+    run func(shard) on the given or all shards concurrently
+    """
+    shards = list(STOCK_SHARD_CONN_NAMES if shards is None else shards)
+    results = await asyncio.gather(*[func(shard) for shard in shards])
+    return dict(zip(shards, results))
+
+
+class ShardedTransaction:
+    """
+    a transaction on the default connection, the shard transactions are
+    opened on first use by shard_connection() and committed with
+    two-phase commit, see the module docstring
+
+    shard_connection() must be awaited in the task that entered the
+    transaction, not in a task started by asyncio.gather
+    """
+
+    def __init__(self):
+        self.gid = f"{_SHARD_COMMIT_GID_PREFIX}{uuid.uuid4().hex}"
+        self.main_context = in_transaction(TORTOISE_DEFAULT_CONN_NAME)
+        self.shard_contexts: Dict[str, Any] = {}
+        self.prepared: List[str] = []
+        self.token: Union[contextvars.Token, None] = None
+
+    async def __aenter__(self) -> BaseDBAsyncClient:
+        conn = await self.main_context.__aenter__()
+        self.token = _current_transaction.set(self)
+        return conn
+
+    async def enlist(self, shard: str) -> BaseDBAsyncClient:
+        if shard == TORTOISE_DEFAULT_CONN_NAME:
+            return Tortoise.get_connection(shard)
+        if shard not in self.shard_contexts:
+            context = in_transaction(shard)
+            await context.__aenter__()
+            self.shard_contexts[shard] = context
+        return self.shard_contexts[shard].connection
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _current_transaction.reset(self.token)
+        if exc_type is not None:
+            await self.rollback(exc_type, exc_val, exc_tb)
+            return False
+        try:
+            await self.prepare()
+        except BaseException as e:
+            await self.rollback(type(e), e, e.__traceback__)
+            raise
+
+        # a prepared transaction is no longer open, the COMMIT sent by
+        # the shard contexts is a no-op
+        await self.exit_shards(None, None, None)
+        try:
+            await self.main_context.__aexit__(None, None, None)
+        except BaseException:
+            await self.finish_prepared("ROLLBACK")
+            raise
+        await self.finish_prepared("COMMIT")
+        return False
+
+    async def exit_shards(self, exc_type, exc_val, exc_tb):
+        # in reverse order, each context restores the connection storage
+        # it replaced when entered
+        for shard in reversed(list(self.shard_contexts)):
+            await self.shard_contexts[shard].__aexit__(
+                exc_type, exc_val, exc_tb
+            )
+
+    async def rollback(self, exc_type, exc_val, exc_tb):
+        await self.exit_shards(exc_type, exc_val, exc_tb)
+        await self.main_context.__aexit__(exc_type, exc_val, exc_tb)
+        await self.finish_prepared("ROLLBACK")
+
+    async def prepare(self):
+        if not self.shard_contexts:
+            return
+        for shard, context in self.shard_contexts.items():
+            await context.connection.execute_script(
+                f"PREPARE TRANSACTION '{_prepared_gid(self.gid, shard)}'"
+            )
+            self.prepared.append(shard)
+        await self.main_context.connection.execute_query(
+            "INSERT INTO shard_commit (gid) VALUES ($1)", [self.gid]
+        )
+
+    async def finish_prepared(self, action: str):
+        """
+        COMMIT or ROLLBACK PREPARED on every prepared shard, a failure is
+        left to manageShards.py resolve
+        """
+        if not self.prepared:
+            return
+        for shard in self.prepared:
+            try:
+                await Tortoise.get_connection(shard).execute_script(
+                    f"{action} PREPARED '{_prepared_gid(self.gid, shard)}'"
+                )
+            except Exception as e:
+                logger.error(
+                    "[%s] %s PREPARED %s on %s failed, error: %s"
+                    % (self.__class__.__name__, action, self.gid, shard, e)
+                )
+                return
+        if action == "COMMIT":
+            await Tortoise.get_connection(
+                TORTOISE_DEFAULT_CONN_NAME
+            ).execute_query(
+                "DELETE FROM shard_commit WHERE gid = $1", [self.gid]
+            )
+
+
+def _prepared_gid(gid: str, shard: str) -> str:
+    # gids are unique per postgres cluster, shards may share one
+    return f"{gid}:{shard}"
+
+
+_current_transaction: contextvars.ContextVar[
+    Union[ShardedTransaction, None]
+] = contextvars.ContextVar("sharded_transaction", default=None)
+
+
+def sharded_transaction() -> Union[ShardedTransaction, Any]:
+    """
+    use instead of in_transaction(TORTOISE_DEFAULT_CONN_NAME) around
+    writes to the stock tables
+    """
+    if not is_sharded():
+        return in_transaction(TORTOISE_DEFAULT_CONN_NAME)
+    return ShardedTransaction()
+
+
+def sharded_atomic():
+    """
+    use instead of tortoise.transactions.atomic() around writes to the
+    stock tables
+    """
+
+    def wrapper(func):
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            async with sharded_transaction():
+                return await func(*args, **kwargs)
+
+        return wrapped
+
+    return wrapper
+
+
+async def shard_connection(shard: str) -> BaseDBAsyncClient:
+    """
+    connection of the shard, enlisted in the current sharded transaction
+    if there is one
+    """
+    transaction = _current_transaction.get()
+    if transaction is not None:
+        return await transaction.enlist(shard)
+    return Tortoise.get_connection(shard)
+
+
+async def resolve_prepared_transactions(
+    grace_seconds: int = SHARD_RESOLVE_GRACE_SECONDS,
+) -> Dict[str, List[str]]:
+    """
+    finish the prepared shard transactions left by a crash, prepared
+    more than grace_seconds ago, return the gids committed and rolled back
+    per shard
+    """
+    main_conn = Tortoise.get_connection(TORTOISE_DEFAULT_CONN_NAME)
+    resolved: Dict[str, List[str]] = {}
+    for shard in STOCK_SHARD_CONN_NAMES:
+        conn = Tortoise.get_connection(shard)
+        _, list_values = await conn.execute_query(
+            """
+            SELECT gid FROM pg_prepared_xacts
+            WHERE gid LIKE $1 AND database = current_database()
+                AND prepared < now() - make_interval(secs => $2)
+            """,
+            [f"{_SHARD_COMMIT_GID_PREFIX}%", grace_seconds],
+        )
+        resolved[shard] = []
+        for ele in list_values:
+            gid = ele["gid"]
+            _, decided = await main_conn.execute_query(
+                "SELECT 1 FROM shard_commit WHERE gid = $1",
+                [gid.rsplit(":", 1)[0]],
+            )
+            action = "COMMIT" if decided else "ROLLBACK"
+            await conn.execute_script(f"{action} PREPARED '{gid}'")
+            resolved[shard].append(f"{action} {gid}")
+            logger.info(
+                "[resolve] %s PREPARED %s on %s" % (action, gid, shard)
+            )
+    # every shard finished, the decisions are not needed anymore. the
+    # ones within the grace period may belong to a transaction left for
+    # the next run
+    await main_conn.execute_query(
+        """
+        DELETE FROM shard_commit
+        WHERE created < now() - interval '1 hour'
+            - make_interval(secs => $1)
+        """,
+        [grace_seconds],
+    )
+    return resolved
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Dict, List, Tuple, Union
+
+from services import quantity, sale_order, stock_counter
+from services.logger import logger
+from settings import (
+    STOCK_SHARD_CONN_NAMES,
+    TORTOISE_DEFAULT_CONN_NAME,
+    TORTOISE_ORM,
+)
+from tortoise import Tortoise
+
+
+class Readiness:
+    """
+    ready once the pools are open and the hot statements prepared, not
+    ready again from the start of the shutdown so the load balancer
+    drains the process first, liveness is answering at all
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.startup_seconds: Union[float, None] = None
+        self.changed = asyncio.Event()
+
+    def set_ready(self, ready: bool):
+        self.ready = ready
+        # wake the watchers up, then arm a new event for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def mark_started(self, started: float):
+        """
+        started is the time.perf_counter() taken before the first import
+        of the server module, so imports are counted too
+        """
+        self.startup_seconds = time.perf_counter() - started
+        self.set_ready(True)
+        logger.info(
+            "[%s] ready in %.3fs"
+            % (self.__class__.__name__, self.startup_seconds)
+        )
+
+
+_readiness: Union[Readiness, None] = None
+
+
+def get_readiness() -> Readiness:
+    global _readiness
+    if _readiness is None:
+        _readiness = Readiness()
+    return _readiness
+
+
+async def warm_up_connection(
+    conn_name: str, statements: List[Tuple[str, list]]
+):
+    """
+    open the pool of conn_name with its minsize connections, then run the
+    statements on each of them so asyncpg has them prepared before the
+    first request
+    """
+    client = Tortoise.get_connection(conn_name)
+    await client.create_connection(with_db=True)
+    # every task holds its connection until all of them got one
+    barrier = asyncio.Barrier(client.pool_minsize)
+
+    async def _prepare():
+        async with client.acquire_connection() as connection:
+            for raw_sql, params in statements:
+                await connection.fetch(raw_sql, *params)
+            await barrier.wait()
+
+    await asyncio.gather(*[_prepare() for _ in range(client.pool_minsize)])
+
+
+async def init_db():
+    """
+    replaces a throwaway connection check: a database that can not be
+    reached fails the pool creation
+    """
+    start = time.perf_counter()
+    await Tortoise.init(config=TORTOISE_ORM)
+    statements: Dict[str, List[Tuple[str, list]]] = {
+        TORTOISE_DEFAULT_CONN_NAME: sale_order.warm_up_statements()
+        + stock_counter.warm_up_statements()
+    }
+    for conn_name in STOCK_SHARD_CONN_NAMES:
+        statements.setdefault(conn_name, []).extend(
+            quantity.warm_up_statements()
+        )
+    await asyncio.gather(
+        *[
+            warm_up_connection(conn_name, conn_statements)
+            for conn_name, conn_statements in statements.items()
+        ]
+    )
+    logger.info(
+        "Warmed up %s connection pools in %.3fs"
+        % (len(statements), time.perf_counter() - start)
+    )
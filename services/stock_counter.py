@@ -0,0 +1,532 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+import asyncpg
+from services.logger import logger
+from services.sharding import fan_out, group_by_shard, shard_connection
+from settings import (
+    DATABASE_URI,
+    STOCK_CHECK_ENABLED,
+    STOCK_RECONCILE_INTERVAL,
+    STOCK_WATCH_ENABLED,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
+from tortoise import Tortoise
+
+STOCK_CHANNEL = "inventory_stock"
+# NOTIFY payloads are limited to 8000 bytes
+_NOTIFY_CHUNK_SIZE = 50
+_RECONCILE_CHUNK_SIZE = 1000
+# seconds between two attempts to open the LISTEN connection again
+_RECONNECT_DELAY = 1
+_NOTIFY_SQL = (
+    "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload"
+)
+# add the deltas to stock_level in key order, so two writers lock the rows
+# in the same order. with $4 a negative delta only applies to a row that
+# stays >= 0, the keys left out are short
+_UPDATE_STOCK_LEVEL_SQL = """
+    INSERT INTO stock_level AS sl (product_id, sku, quantity, version)
+    SELECT d.product_id, d.sku, d.delta, 1
+    FROM unnest($1::uuid[], $2::varchar[], $3::bigint[])
+        AS d(product_id, sku, delta)
+    WHERE NOT $4 OR d.delta >= 0 OR EXISTS (
+        SELECT 1 FROM stock_level
+        WHERE product_id = d.product_id AND sku = d.sku
+    )
+    ORDER BY d.product_id, d.sku
+    ON CONFLICT (product_id, sku) DO UPDATE
+    SET quantity = sl.quantity + excluded.quantity,
+        version = sl.version + 1,
+        modified = now()
+    WHERE NOT $4 OR excluded.quantity >= 0
+        OR sl.quantity + excluded.quantity >= 0
+    RETURNING product_id, sku, version
+    """
+_STOCK_LEVEL_BY_KEYS_SQL = """
+    SELECT sl.product_id, sl.sku, sl.quantity, sl.version
+    FROM stock_level sl
+    INNER JOIN unnest($1::uuid[], $2::varchar[]) AS k(product_id, sku)
+        USING (product_id, sku)
+    """
+
+StockKey = Tuple[str, str]
+
+# stock_level versions written by the transactions of a reservation
+_published: ContextVar[Union[Dict[StockKey, int], None]] = ContextVar(
+    "stock_published", default=None
+)
+
+
+class OutOfStockError(Exception):
+    def __init__(self, keys: List[StockKey]):
+        self.keys = keys
+        super().__init__(
+            "Not enough stock for %s"
+            % ", ".join(f"{product_id}/{sku}" for product_id, sku in keys)
+        )
+
+
+def stock_deltas(items: Iterable, sign: int = 1) -> Dict[StockKey, int]:
+    """
+    sum the quantity of purchase or sale items by (product_id, sku)
+    """
+    deltas: Dict[StockKey, int] = {}
+    for ele in items:
+        key = (str(ele.product_id), ele.sku)
+        deltas[key] = deltas.get(key, 0) + sign * ele.quantity
+    return deltas
+
+
+def published_versions() -> Union[Dict[StockKey, int], None]:
+    """
+    the versions collected for the reservation of the current task, to
+    hand over to the task running its transaction
+    """
+    return _published.get()
+
+
+@contextmanager
+def collect_published(versions: Union[Dict[StockKey, int], None]):
+    """
+    collect the stock_level versions written by publish() into versions,
+    see SaleOrderGroupCommitter
+    """
+    token = _published.set(versions)
+    try:
+        yield versions
+    finally:
+        _published.reset(token)
+
+
+async def get_stock_levels(
+    keys: List[StockKey],
+) -> Dict[StockKey, Tuple[int, int]]:
+    """
+    quantity and version of exact (product_id, sku) pairs, missing pairs
+    are (0, 0)
+    """
+    keys_by_shard = group_by_shard(keys, lambda key: key[0])
+    results = await fan_out(
+        lambda shard: Tortoise.get_connection(shard).execute_query(
+            _STOCK_LEVEL_BY_KEYS_SQL,
+            [
+                [key[0] for key in keys_by_shard[shard]],
+                [key[1] for key in keys_by_shard[shard]],
+            ],
+        ),
+        keys_by_shard,
+    )
+    levels = {key: (0, 0) for key in keys}
+    for _, list_values in results.values():
+        for ele in list_values:
+            levels[(str(ele["product_id"]), ele["sku"])] = (
+                ele["quantity"],
+                ele["version"],
+            )
+    return levels
+
+
+def warm_up_statements() -> List[Tuple[str, list]]:
+    """
+    the hot statements run on the default connection, an empty payload list
+    notifies nobody, see services/startup.py
+    """
+    return [(_NOTIFY_SQL, [STOCK_CHANNEL, []])]
+
+
+class StockCounter:
+    """
+    in-memory quantity per (product_id, sku) of this process
+
+    - every ledger write adds its deltas to stock_level, which bumps the
+      version of the key, and sends them with pg_notify in the same
+      transaction. every process, this one included, applies them in
+      version order once delivered, so a delta is never lost or counted
+      twice when it arrives while the key is being read
+    - seeded from stock_level the first time a key is seen
+    - check and reserve run without await, so they are atomic in the loop,
+      a reservation is held until the quantity includes the version its
+      transaction wrote
+    - the sale deltas only apply to stock_level if it stays >= 0, which
+      settles the orders two processes accepted for the same last units
+    - reconciled against stock_level every STOCK_RECONCILE_INTERVAL
+      seconds and after the LISTEN connection is opened again
+    - the deltas of every commit are handed to the subscribers, see
+      services/stock_watch.py
+    """
+
+    def __init__(
+        self,
+        enabled: bool = STOCK_CHECK_ENABLED,
+        watching: bool = STOCK_WATCH_ENABLED,
+    ):
+        self.enabled = enabled
+        # publish and listen for the subscribers only
+        self.watching = watching
+        self.quantities: Dict[StockKey, int] = {}
+        self.versions: Dict[StockKey, int] = {}
+        # deltas by version received ahead of the next version of a key,
+        # or while the key is seeded
+        self.early: Dict[StockKey, Dict[int, int]] = {}
+        # reservations not in the quantities yet, with the versions they
+        # wait for once their transaction committed
+        self.pending: Dict[StockKey, int] = {}
+        self.settling: Dict[StockKey, List[Tuple[int, int]]] = {}
+        self.loading: Dict[StockKey, asyncio.Future] = {}
+        self.listener: Union[asyncpg.Connection, None] = None
+        self.reconnect_task: Union[asyncio.Task, None] = None
+        self.reconcile_task: Union[asyncio.Task, None] = None
+        self.stopping = False
+        self.subscribers: List[Callable[[Dict[StockKey, int]], None]] = []
+
+    async def start(self):
+        if not self.enabled and not self.watching:
+            return
+        await self.listen()
+        if self.enabled:
+            self.reconcile_task = asyncio.create_task(self.reconcile_forever())
+        logger.info(
+            "[%s] listening on %s" % (self.__class__.__name__, STOCK_CHANNEL)
+        )
+
+    async def stop(self):
+        self.stopping = True
+        for task in (self.reconcile_task, self.reconnect_task):
+            if task:
+                task.cancel()
+        if self.listener:
+            await self.listener.close()
+
+    async def listen(self):
+        self.listener = await asyncpg.connect(DATABASE_URI)
+        self.listener.add_termination_listener(self.on_disconnect)
+        await self.listener.add_listener(STOCK_CHANNEL, self.on_notify)
+
+    def on_disconnect(self, connection):
+        if self.stopping or connection is not self.listener:
+            return
+        logger.warning("[%s] LISTEN connection lost" % self.__class__.__name__)
+        self.reconnect_task = asyncio.create_task(self.reconnect())
+
+    async def reconnect(self):
+        """
+        open the LISTEN connection again, then reconcile every key since
+        the deltas committed meanwhile were not delivered
+        """
+        while True:
+            await asyncio.sleep(_RECONNECT_DELAY)
+            try:
+                await self.listen()
+                break
+            except Exception as e:
+                logger.error(
+                    "[%s] reconnect failed, error: %s"
+                    % (self.__class__.__name__, e)
+                )
+        logger.info(
+            "[%s] listening on %s again"
+            % (self.__class__.__name__, STOCK_CHANNEL)
+        )
+        if self.enabled:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                # left to reconcile_forever
+                logger.error(
+                    "[%s] reconcile failed, error: %s"
+                    % (self.__class__.__name__, e)
+                )
+
+    async def seed(self, keys: Iterable[StockKey]):
+        keys = set(keys)
+        loading = {self.loading[key] for key in keys if key in self.loading}
+        missing = [
+            key
+            for key in keys
+            if key not in self.quantities and key not in self.loading
+        ]
+        if missing:
+            await self.load(missing)
+        if loading:
+            # seeded by a concurrent request
+            await asyncio.wait(loading)
+
+    async def load(self, keys: List[StockKey]):
+        """
+        read the keys from stock_level, the deltas of a key not seeded yet
+        received meanwhile are kept and applied on top
+        """
+        done = asyncio.get_running_loop().create_future()
+        seeding = [key for key in keys if key not in self.versions]
+        for key in seeding:
+            self.loading[key] = done
+        try:
+            levels = await get_stock_levels(keys)
+        except BaseException:
+            for key in seeding:
+                self.early.pop(key, None)
+            raise
+        finally:
+            for key in seeding:
+                del self.loading[key]
+            done.set_result(None)
+        for key, (quantity, version) in levels.items():
+            self.set_level(key, quantity, version)
+
+    def set_level(self, key: StockKey, quantity: int, version: int):
+        current = self.versions.get(key)
+        if current is not None and current >= version:
+            # the deltas up to current were received since the read
+            if current == version and self.quantities[key] != quantity:
+                logger.warning(
+                    "[%s] %s drifted: %s, stock level: %s"
+                    % (
+                        self.__class__.__name__,
+                        key,
+                        self.quantities[key],
+                        quantity,
+                    )
+                )
+                self.quantities[key] = quantity
+            return
+        self.quantities[key] = quantity
+        self.versions[key] = version
+        self.advance(key)
+
+    def receive(self, key: StockKey, delta: int, version: int):
+        if key not in self.versions:
+            if key in self.loading:
+                self.early.setdefault(key, {})[version] = delta
+            return
+        if version <= self.versions[key]:
+            # already in the quantity
+            return
+        self.early.setdefault(key, {})[version] = delta
+        self.advance(key)
+
+    def advance(self, key: StockKey):
+        """
+        apply the deltas following the version of the key, a gap left by
+        an undelivered NOTIFY waits for the next reconciliation
+        """
+        early = self.early.pop(key, {})
+        version = self.versions[key]
+        while version + 1 in early:
+            version += 1
+            self.quantities[key] += early.pop(version)
+        self.versions[key] = version
+        early = {ele: delta for ele, delta in early.items() if ele > version}
+        if early:
+            self.early[key] = early
+
+        settling = self.settling.pop(key, [])
+        for ele, delta in settling:
+            if ele <= version:
+                self.release(key, delta)
+        settling = [ele for ele in settling if ele[0] > version]
+        if settling:
+            self.settling[key] = settling
+
+    def try_reserve(self, deltas: Dict[StockKey, int]) -> List[StockKey]:
+        """
+        reserve the negative deltas if no quantity goes below 0,
+        return the keys that are short otherwise
+        """
+        short_keys = [
+            key
+            for key, delta in deltas.items()
+            if delta < 0
+            and self.quantities.get(key, 0) + self.pending.get(key, 0) + delta
+            < 0
+        ]
+        if short_keys:
+            return short_keys
+        for key, delta in deltas.items():
+            if delta < 0:
+                self.pending[key] = self.pending.get(key, 0) + delta
+        return []
+
+    def release(self, key: StockKey, delta: int):
+        self.pending[key] -= delta
+        if not self.pending[key]:
+            del self.pending[key]
+
+    def settle(
+        self, deltas: Dict[StockKey, int], published: Dict[StockKey, int]
+    ):
+        """
+        release the reservation of a finished transaction once the quantity
+        includes the version it published, right away if it published none
+        """
+        for key, delta in deltas.items():
+            if delta >= 0:
+                continue
+            version = published.get(key)
+            if version is None or self.versions.get(key, version) >= version:
+                self.release(key, delta)
+            else:
+                self.settling.setdefault(key, []).append((version, delta))
+
+    @asynccontextmanager
+    async def reservations(self, deltas: Dict[int, Dict[StockKey, int]]):
+        """
+        wrap the transaction writing the deltas of several orders by id,
+        the stock they take out is reserved before. yield the short keys
+        of the orders left out, those are not reserved
+        """
+        if not self.enabled:
+            yield {}
+            return
+
+        await self.seed(
+            key
+            for order_deltas in deltas.values()
+            for key, delta in order_deltas.items()
+            if delta < 0
+        )
+        short: Dict[int, List[StockKey]] = {}
+        reserved: List[Dict[StockKey, int]] = []
+        for order_id, order_deltas in deltas.items():
+            short_keys = self.try_reserve(order_deltas)
+            if short_keys:
+                short[order_id] = short_keys
+            else:
+                reserved.append(order_deltas)
+
+        with collect_published({}) as published:
+            try:
+                yield short
+            except BaseException:
+                for ele in reserved:
+                    self.settle(ele, {})
+                raise
+        for ele in reserved:
+            self.settle(ele, published)
+
+    @asynccontextmanager
+    async def reservation(self, deltas: Dict[StockKey, int]):
+        """
+        reservations() of one order, raise OutOfStockError when it is short
+        """
+        async with self.reservations({0: deltas}) as short:
+            if short:
+                raise OutOfStockError(short[0])
+            yield
+
+    async def publish(self, deltas: Dict[StockKey, int], guard: bool = False):
+        """
+        add the deltas to stock_level and pg_notify them in the caller's
+        transaction, delivered only on commit. with guard and the counter
+        enabled raise OutOfStockError if a quantity would go below 0
+        """
+        versions = await self.update_levels(deltas, guard)
+        await self.notify(deltas, versions)
+
+    async def update_levels(
+        self, deltas: Dict[StockKey, int], guard: bool = False
+    ) -> Dict[StockKey, int]:
+        """
+        the stock_level half of publish(), return the version written per
+        key
+        """
+        if not deltas:
+            return {}
+        guard = guard and self.enabled
+        versions: Dict[StockKey, int] = {}
+        for shard, keys in group_by_shard(
+            sorted(deltas), lambda key: key[0]
+        ).items():
+            conn = await shard_connection(shard)
+            _, list_values = await conn.execute_query(
+                _UPDATE_STOCK_LEVEL_SQL,
+                [
+                    [key[0] for key in keys],
+                    [key[1] for key in keys],
+                    [deltas[key] for key in keys],
+                    guard,
+                ],
+            )
+            for ele in list_values:
+                versions[(str(ele["product_id"]), ele["sku"])] = ele["version"]
+        short_keys = [key for key in deltas if key not in versions]
+        if short_keys:
+            raise OutOfStockError(short_keys)
+
+        published = _published.get()
+        if published is not None:
+            published.update(versions)
+        return versions
+
+    async def notify(
+        self, deltas: Dict[StockKey, int], versions: Dict[StockKey, int]
+    ):
+        """
+        the pg_notify half of publish(), on the default connection. a
+        transaction that can't be prepared calls it after its commit, a
+        NOTIFY lost meanwhile is caught up by the reconciliation
+        """
+        if not deltas or not (self.enabled or self.watching):
+            return
+        items = list(deltas.items())
+        payloads = [
+            json.dumps(
+                {
+                    "deltas": [
+                        [product_id, sku, delta, versions[(product_id, sku)]]
+                        for (product_id, sku), delta in items[
+                            i : i + _NOTIFY_CHUNK_SIZE
+                        ]
+                    ],
+                }
+            )
+            for i in range(0, len(items), _NOTIFY_CHUNK_SIZE)
+        ]
+        # one round trip however many payloads
+        await Tortoise.get_connection(
+            TORTOISE_DEFAULT_CONN_NAME
+        ).execute_query(_NOTIFY_SQL, [STOCK_CHANNEL, payloads])
+
+    def subscribe(self, callback: Callable[[Dict[StockKey, int]], None]):
+        """
+        call back with the deltas of every commit, in the event loop
+        """
+        self.subscribers.append(callback)
+
+    def on_notify(self, connection, pid, channel, payload):
+        data = json.loads(payload)
+        deltas = {}
+        for product_id, sku, delta, version in data["deltas"]:
+            deltas[(product_id, sku)] = delta
+            self.receive((product_id, sku), delta, version)
+        for callback in self.subscribers:
+            callback(deltas)
+
+    async def reconcile(self):
+        keys = list(self.versions)
+        for i in range(0, len(keys), _RECONCILE_CHUNK_SIZE):
+            await self.load(keys[i : i + _RECONCILE_CHUNK_SIZE])
+
+    async def reconcile_forever(self):
+        while True:
+            await asyncio.sleep(STOCK_RECONCILE_INTERVAL)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(
+                    "[%s] reconcile failed, error: %s"
+                    % (self.__class__.__name__, e)
+                )
+
+
+_stock_counter: Union[StockCounter, None] = None
+
+
+def get_stock_counter() -> StockCounter:
+    global _stock_counter
+    if _stock_counter is None:
+        _stock_counter = StockCounter()
+    return _stock_counter
@@ -0,0 +1,266 @@
+import uuid
+from typing import Dict, List, Tuple, Union
+
+from models import EntityStockStatusType, TransactionType
+from pydantic import BaseModel
+from services.location import resolve_location
+from services.logger import logger
+from services.quantity import ledger_totals_sql
+from services.sharding import fan_out, group_by_shard
+from services.stock_counter import get_stock_counter
+from services.utils import retry_moved_rows, uuid7_batch
+from settings import STOCK_TAKE_LOAD_CHUNK_SIZE
+from tortoise.transactions import in_transaction
+
+
+class StockCountReq(BaseModel):
+    product_id: uuid.UUID
+    sku: str
+    counted: int
+
+
+class StockTakeReq(BaseModel):
+    # the counted location, DEFAULT_LOCATION when missing
+    location: Union[str, None] = None
+    counts: List[StockCountReq]
+    # report the differences without writing adjustments
+    dry_run: bool = False
+
+
+class StockTakeDiff(BaseModel):
+    product_id: uuid.UUID
+    sku: str
+    expected: int
+    counted: int
+    adjustment: int
+
+
+class StockTakeRes(BaseModel):
+    location: str
+    dry_run: bool
+    counted_skus: int
+    adjusted_skus: int
+    units_added: int
+    units_removed: int
+    entities_written_off: int
+    entities_restored: int
+    diffs: List[StockTakeDiff]
+
+
+class StockTakeService:
+    """
+    reconcile a recount of one location with its ledger, in one
+    transaction per shard
+
+    - the counts are loaded into a temp table and joined with the ledger
+      totals, skus that were not counted are left alone
+    - every difference gets one ADJUSTMENT ledger row
+    - a shortage marks the oldest AVAILABLE entities as ADJUSTED,
+      a surplus restores ADJUSTED entities first, a surplus beyond them
+      only exists in the ledger since entities need a purchase item
+    - the shards are reconciled concurrently, a temp table can't be
+      prepared so each commits on its own. after a failure the shards
+      already adjusted match their counts, sending the same counts again
+      only adjusts the others
+    """
+
+    def __init__(self, data: StockTakeReq):
+        self.data = data
+        self.location = resolve_location(data.location)
+
+    def unique_counts(self) -> Dict[Tuple[str, str], int]:
+        """
+        the last count of a (product_id, sku) listed twice wins
+        """
+        counts: Dict[Tuple[str, str], int] = {}
+        for ele in self.data.counts:
+            if ele.counted < 0:
+                raise ValueError(
+                    f"Counted quantity of {ele.product_id}/{ele.sku} "
+                    "must not be negative"
+                )
+            counts[(str(ele.product_id), ele.sku)] = ele.counted
+        return counts
+
+    async def reconcile(self) -> StockTakeRes:
+        counts = self.unique_counts()
+        counts_by_shard = group_by_shard(counts, lambda key: key[0])
+        results = await fan_out(
+            lambda shard: self.reconcile_shard(
+                shard, {key: counts[key] for key in counts_by_shard[shard]}
+            ),
+            counts_by_shard,
+        )
+        diffs = sorted(
+            (
+                ele
+                for shard_diffs, _, _ in results.values()
+                for ele in shard_diffs
+            ),
+            key=lambda ele: (str(ele.product_id), ele.sku),
+        )
+        res = StockTakeRes(
+            location=self.location,
+            dry_run=self.data.dry_run,
+            counted_skus=len(counts),
+            adjusted_skus=len(diffs),
+            units_added=sum(
+                ele.adjustment for ele in diffs if ele.adjustment > 0
+            ),
+            units_removed=-sum(
+                ele.adjustment for ele in diffs if ele.adjustment < 0
+            ),
+            entities_written_off=sum(ele[1] for ele in results.values()),
+            entities_restored=sum(ele[2] for ele in results.values()),
+            diffs=diffs,
+        )
+        if self.data.dry_run or not diffs:
+            return res
+
+        logger.info(
+            "[%s] adjusted %s of %s skus in %s, +%s -%s units"
+            % (
+                self.__class__.__name__,
+                res.adjusted_skus,
+                res.counted_skus,
+                self.location,
+                res.units_added,
+                res.units_removed,
+            )
+        )
+        return res
+
+    @retry_moved_rows()
+    async def reconcile_shard(
+        self, shard: str, counts: Dict[Tuple[str, str], int]
+    ) -> Tuple[List[StockTakeDiff], int, int]:
+        """
+        return the diffs of the shard's counts and the number of entities
+        written off and restored
+        """
+        stock_counter = get_stock_counter()
+        async with in_transaction(shard) as conn:
+            await self.load_counts(conn, counts)
+            diffs = await self.compute_diffs(conn)
+            if self.data.dry_run or not diffs:
+                return diffs, 0, 0
+
+            deltas = {
+                (str(ele.product_id), ele.sku): ele.adjustment for ele in diffs
+            }
+            written_off, restored = await self.save_adjustments(conn, diffs)
+            versions = await stock_counter.update_levels(deltas)
+        await stock_counter.notify(deltas, versions)
+        return diffs, written_off, restored
+
+    @classmethod
+    async def load_counts(cls, conn, counts: Dict[Tuple[str, str], int]):
+        await conn.execute_script(
+            """
+            CREATE TEMP TABLE stock_count (
+                product_id UUID NOT NULL,
+                sku VARCHAR(20) NOT NULL,
+                counted INT NOT NULL,
+                PRIMARY KEY (product_id, sku)
+            ) ON COMMIT DROP
+            """
+        )
+        items = list(counts.items())
+        for i in range(0, len(items), STOCK_TAKE_LOAD_CHUNK_SIZE):
+            chunk = items[i : i + STOCK_TAKE_LOAD_CHUNK_SIZE]
+            await conn.execute_query(
+                """
+                INSERT INTO stock_count (product_id, sku, counted)
+                SELECT * FROM unnest($1::uuid[], $2::varchar[], $3::int[])
+                """,
+                [
+                    [product_id for (product_id, _), _ in chunk],
+                    [sku for (_, sku), _ in chunk],
+                    [counted for _, counted in chunk],
+                ],
+            )
+        # temp tables are never auto-analyzed
+        await conn.execute_script("ANALYZE stock_count")
+
+    async def compute_diffs(self, conn) -> List[StockTakeDiff]:
+        raw_sql = f"""
+            SELECT sc.product_id, sc.sku,
+                COALESCE(ledger.total_quantity, 0) as expected,
+                sc.counted,
+                sc.counted - COALESCE(ledger.total_quantity, 0) as adjustment
+            FROM stock_count sc
+            LEFT JOIN ({ledger_totals_sql("stock_count", "$1")}) as ledger
+                USING (product_id, sku)
+            WHERE sc.counted <> COALESCE(ledger.total_quantity, 0)
+            ORDER BY sc.product_id, sc.sku
+            """
+        _, list_values = await conn.execute_query(raw_sql, [[self.location]])
+        return [StockTakeDiff(**ele) for ele in list_values]
+
+    async def save_adjustments(
+        self, conn, diffs: List[StockTakeDiff]
+    ) -> Tuple[int, int]:
+        """
+        write the ledger rows and move the entities in one statement,
+        return the number of entities written off and restored
+        """
+        raw_sql = """
+            WITH diff AS (
+                SELECT * FROM unnest(
+                    $1::uuid[], $2::uuid[], $3::varchar[], $4::int[]
+                ) AS d(id, product_id, sku, adjustment)
+            ), ledger AS (
+                INSERT INTO inventory_transaction (
+                    id, location, product_id, sku, quantity, transaction_type
+                )
+                SELECT id, $8::varchar, product_id, sku, adjustment,
+                    $5::varchar
+                FROM diff
+            ), written_off AS (
+                UPDATE purchase_item_entity SET status = $6, modified = now()
+                WHERE status = $7 AND id IN (
+                    SELECT entity.id
+                    FROM diff
+                    CROSS JOIN LATERAL (
+                        SELECT id FROM purchase_item_entity
+                        WHERE location = $8 AND product_id = diff.product_id
+                            AND sku = diff.sku AND status = $7
+                        ORDER BY purchase_id, created
+                        LIMIT -diff.adjustment
+                    ) entity
+                    WHERE diff.adjustment < 0
+                )
+                RETURNING id
+            ), restored AS (
+                UPDATE purchase_item_entity SET status = $7, modified = now()
+                WHERE status = $6 AND id IN (
+                    SELECT entity.id
+                    FROM diff
+                    CROSS JOIN LATERAL (
+                        SELECT id FROM purchase_item_entity
+                        WHERE location = $8 AND product_id = diff.product_id
+                            AND sku = diff.sku AND status = $6
+                        ORDER BY purchase_id, created
+                        LIMIT diff.adjustment
+                    ) entity
+                    WHERE diff.adjustment > 0
+                )
+                RETURNING id
+            )
+            SELECT (SELECT COUNT(*) FROM written_off) AS written_off,
+                (SELECT COUNT(*) FROM restored) AS restored
+            """
+        _, list_values = await conn.execute_query(
+            raw_sql,
+            [
+                uuid7_batch(len(diffs)),
+                [str(ele.product_id) for ele in diffs],
+                [ele.sku for ele in diffs],
+                [ele.adjustment for ele in diffs],
+                TransactionType.ADJUSTMENT.value,
+                EntityStockStatusType.ADJUSTED.value,
+                EntityStockStatusType.AVAILABLE.value,
+                self.location,
+            ],
+        )
+        return list_values[0]["written_off"], list_values[0]["restored"]
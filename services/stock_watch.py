@@ -0,0 +1,179 @@
+import asyncio
+import uuid
+from typing import AsyncIterator, Dict, List, Set, Union
+
+from pydantic import BaseModel
+from services.logger import logger
+from services.quantity import get_quantity, get_quantity_by_keys
+from services.stock_counter import StockKey, get_stock_counter
+from settings import STOCK_WATCH_INTERVAL_MS
+
+
+class QuantityChange(BaseModel):
+    product_id: uuid.UUID
+    sku: str
+    # summed over all locations
+    quantity: int
+    # since the previous message of the stream, 0 in the snapshot
+    delta: int
+
+
+class WatchQuantityRes(BaseModel):
+    snapshot: bool
+    changes: List[QuantityChange]
+
+
+class QuantityWatch:
+    """
+    one WatchQuantity stream, keeps only the latest quantity of the keys
+    changed since its last message, a slow client skips the intermediate
+    quantities instead of queueing them
+    """
+
+    def __init__(self, product_ids: List[str], skus: List[str]):
+        self.product_ids = set(product_ids)
+        self.skus = set(skus)
+        self.sent: Dict[StockKey, int] = {}
+        self.pending: Dict[StockKey, int] = {}
+        self.changed = asyncio.Event()
+
+    async def snapshot(self) -> List[QuantityChange]:
+        results = await asyncio.gather(
+            *[
+                get_quantity(product_id=uuid.UUID(product_id))
+                for product_id in self.product_ids
+            ],
+            *([get_quantity(skus=list(self.skus))] if self.skus else []),
+        )
+        for res in results:
+            for ele in res.results:
+                self.sent[(str(ele.product_id), ele.sku)] = ele.quantity
+        return [
+            QuantityChange(
+                product_id=product_id, sku=sku, quantity=quantity, delta=0
+            )
+            for (product_id, sku), quantity in self.sent.items()
+        ]
+
+    def push(self, key: StockKey, quantity: int):
+        self.pending[key] = quantity
+        self.changed.set()
+
+    def take(self) -> List[QuantityChange]:
+        changes = [
+            QuantityChange(
+                product_id=product_id,
+                sku=sku,
+                quantity=quantity,
+                delta=quantity - self.sent.get((product_id, sku), 0),
+            )
+            for (product_id, sku), quantity in self.pending.items()
+            if quantity != self.sent.get((product_id, sku))
+        ]
+        self.sent.update(self.pending)
+        self.pending = {}
+        self.changed.clear()
+        return changes
+
+
+class StockWatcher:
+    """
+    fan out the commits received by the stock counter listener, one
+    LISTEN connection per process, to the WatchQuantity streams
+
+    - the keys changed within an interval are re-read with one ledger
+      query for all the streams, so a stream never drifts from the ledger
+    - each stream sends at most one message per interval
+    """
+
+    def __init__(self, interval_ms: int = STOCK_WATCH_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.by_product_id: Dict[str, Set[QuantityWatch]] = {}
+        self.by_sku: Dict[str, Set[QuantityWatch]] = {}
+        self.changed_keys: Set[StockKey] = set()
+        self.flush_task: Union[asyncio.Task, None] = None
+        get_stock_counter().subscribe(self.on_deltas)
+
+    def watches_of(self, key: StockKey) -> Set[QuantityWatch]:
+        product_id, sku = key
+        return self.by_product_id.get(product_id, set()) | self.by_sku.get(
+            sku, set()
+        )
+
+    def add(self, watch: QuantityWatch):
+        for product_id in watch.product_ids:
+            self.by_product_id.setdefault(product_id, set()).add(watch)
+        for sku in watch.skus:
+            self.by_sku.setdefault(sku, set()).add(watch)
+
+    def remove(self, watch: QuantityWatch):
+        for index, values in (
+            (self.by_product_id, watch.product_ids),
+            (self.by_sku, watch.skus),
+        ):
+            for ele in values:
+                index[ele].discard(watch)
+                if not index[ele]:
+                    del index[ele]
+
+    def on_deltas(self, deltas: Dict[StockKey, int]):
+        self.changed_keys.update(
+            key
+            for key in deltas
+            if key[0] in self.by_product_id or key[1] in self.by_sku
+        )
+        if self.changed_keys and (
+            self.flush_task is None or self.flush_task.done()
+        ):
+            self.flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        while self.changed_keys:
+            # coalesce the commits of one interval
+            await asyncio.sleep(self.interval)
+            keys = list(self.changed_keys)
+            self.changed_keys.clear()
+            try:
+                quantities = await get_quantity_by_keys(keys)
+            except Exception as e:
+                logger.error(
+                    "[%s] flush failed, error: %s"
+                    % (self.__class__.__name__, e)
+                )
+                self.changed_keys.update(keys)
+                continue
+            for key, quantity in quantities.items():
+                for watch in self.watches_of(key):
+                    watch.push(key, quantity)
+
+    async def watch(
+        self, product_ids: List[str], skus: List[str]
+    ) -> AsyncIterator[WatchQuantityRes]:
+        """
+        the current quantities of the keys, then their changes
+        """
+        watch = QuantityWatch(product_ids, skus)
+        # before the snapshot, so no commit after it is missed
+        self.add(watch)
+        try:
+            yield WatchQuantityRes(
+                snapshot=True, changes=await watch.snapshot()
+            )
+            while True:
+                await watch.changed.wait()
+                changes = watch.take()
+                if changes:
+                    yield WatchQuantityRes(snapshot=False, changes=changes)
+                await asyncio.sleep(self.interval)
+        finally:
+            self.remove(watch)
+
+
+_stock_watcher: Union[StockWatcher, None] = None
+
+
+def get_stock_watcher() -> StockWatcher:
+    global _stock_watcher
+    if _stock_watcher is None:
+        _stock_watcher = StockWatcher()
+    return _stock_watcher
@@ -1,6 +1,158 @@
-from typing import List, Type, Union
+import os
+import time
+import uuid
+from datetime import datetime
+from functools import wraps
+from typing import AsyncIterator, Dict, Iterable, List, Type, Union
 
+import asyncpg
 from models import PurchaseItemEntityModel, SaleOrderItemEntityModel
+from pydantic import BaseModel
+from services.logger import logger
+from settings import (
+    BULK_MIN_BATCH_SIZE,
+    BULK_TARGET_LATENCY_MS,
+    CHUNK_SIZE,
+    TORTOISE_DEFAULT_CONN_NAME,
+)
+from tortoise import BaseDBAsyncClient, Tortoise
+from tortoise.functions import Count, Max
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+# asyncpg / postgres limit of bind parameters in one statement
+MAX_BIND_PARAMS = 32767
+# weight of the latest batch in the per-row latency average
+_LATENCY_SMOOTHING = 0.3
+# runs of a transaction aborted by a concurrent move of its rows
+_MOVED_ROW_ATTEMPTS = 3
+
+
+class BatcherStats(BaseModel):
+    model: str
+    batch_size: int
+    max_batch_size: int
+    batches: int
+    rows: int
+    avg_batch_latency_ms: float
+    row_latency_us: float
+
+
+class AdaptiveBatcher:
+    """
+    insert model instances with multi-row INSERT statements,
+    the batch size is capped by the bind parameter limit for the model's
+    column count and converges on target_latency_ms per batch. it is
+    rounded down to a power of two, the few statement texts stay in
+    asyncpg's prepared statement cache
+    """
+
+    def __init__(
+        self,
+        model: Type[Model],
+        target_latency_ms: int = BULK_TARGET_LATENCY_MS,
+        min_batch_size: int = BULK_MIN_BATCH_SIZE,
+        initial_batch_size: int = CHUNK_SIZE,
+    ):
+        self.model = model
+        self.target_latency = target_latency_ms / 1000
+        self.columns = list(model._meta.fields_db_projection)
+        self.max_batch_size = MAX_BIND_PARAMS // len(self.columns)
+        self.min_batch_size = min(min_batch_size, self.max_batch_size)
+        self.batch_size = self._clamp(initial_batch_size)
+        self.row_latency: Union[float, None] = None
+        self.batches = 0
+        self.rows = 0
+        self.total_latency = 0.0
+
+    def _clamp(self, batch_size: int) -> int:
+        batch_size = 1 << (max(batch_size, 1).bit_length() - 1)
+        return max(self.min_batch_size, min(batch_size, self.max_batch_size))
+
+    def observe(self, rows: int, latency: float):
+        row_latency = latency / rows
+        if self.row_latency is None:
+            self.row_latency = row_latency
+        else:
+            self.row_latency = (
+                _LATENCY_SMOOTHING * row_latency
+                + (1 - _LATENCY_SMOOTHING) * self.row_latency
+            )
+        self.batch_size = self._clamp(
+            int(self.target_latency / self.row_latency)
+        )
+        self.batches += 1
+        self.rows += rows
+        self.total_latency += latency
+
+    async def bulk_create(
+        self,
+        items: List[Model],
+        using_db: Union[BaseDBAsyncClient, None] = None,
+    ):
+        """
+        insert and clear items, the caller keeps reusing the same list
+        """
+        conn = using_db or Tortoise.get_connection(TORTOISE_DEFAULT_CONN_NAME)
+        executor = conn.executor_class(model=self.model, db=conn)
+        db_columns = ", ".join(
+            f'"{self.model._meta.fields_db_projection[ele]}"'
+            for ele in self.columns
+        )
+        start = 0
+        while start < len(items):
+            chunk = items[start : start + self.batch_size]
+            start += len(chunk)
+
+            values = []
+            placeholders = []
+            for instance in chunk:
+                offset = len(values)
+                values.extend(
+                    executor.column_map[ele](getattr(instance, ele), instance)
+                    for ele in self.columns
+                )
+                placeholders.append(
+                    "(%s)"
+                    % ", ".join(
+                        f"${offset + i + 1}" for i in range(len(self.columns))
+                    )
+                )
+            raw_sql = 'INSERT INTO "%s" (%s) VALUES %s' % (
+                self.model._meta.db_table,
+                db_columns,
+                ", ".join(placeholders),
+            )
+            started = time.perf_counter()
+            await conn.execute_query(raw_sql, values)
+            self.observe(len(chunk), time.perf_counter() - started)
+        items.clear()
+
+    def stats(self) -> BatcherStats:
+        return BatcherStats(
+            model=self.model.__name__,
+            batch_size=self.batch_size,
+            max_batch_size=self.max_batch_size,
+            batches=self.batches,
+            rows=self.rows,
+            avg_batch_latency_ms=(
+                self.total_latency / self.batches * 1000 if self.batches else 0
+            ),
+            row_latency_us=(self.row_latency or 0) * 1_000_000,
+        )
+
+
+_batchers: Dict[Type[Model], AdaptiveBatcher] = {}
+
+
+def get_batcher(model: Type[Model]) -> AdaptiveBatcher:
+    if model not in _batchers:
+        _batchers[model] = AdaptiveBatcher(model)
+    return _batchers[model]
+
+
+def get_batcher_stats() -> List[BatcherStats]:
+    return [ele.stats() for ele in _batchers.values()]
 
 
 async def bulk_create_model(
@@ -8,19 +160,161 @@ async def bulk_create_model(
         Type[PurchaseItemEntityModel], Type[SaleOrderItemEntityModel]
     ],
     items: List[Union[PurchaseItemEntityModel, SaleOrderItemEntityModel]],
+    using_db: Union[BaseDBAsyncClient, None] = None,
 ):
     if items:
-        await model.bulk_create(items)
-        items.clear()
+        await get_batcher(model).bulk_create(items, using_db=using_db)
+
 
+class ListVersion(BaseModel):
+    total: int
+    last_modified: Union[datetime, None]
 
-def chunk_size_splitter(chunk_size: int, number_value: int) -> List[int]:
-    if number_value < chunk_size:
-        return [number_value]
 
-    left_part = int(number_value / chunk_size)
-    right_part = number_value % chunk_size
-    res = [chunk_size] * left_part
-    if right_part:
-        res.append(right_part)
+def created_between(
+    column: str,
+    created_from: Union[datetime, None],
+    created_to: Union[datetime, None],
+    params: list,
+) -> List[str]:
+    """
+    the conditions of a [created_from, created_to) range on column, the
+    bounds given are appended to params
+    """
+    conditions = []
+    if created_from:
+        params.append(created_from)
+        conditions.append(f"{column} >= ${len(params)}")
+    if created_to:
+        params.append(created_to)
+        conditions.append(f"{column} < ${len(params)}")
+    return conditions
+
+
+def select_fields(
+    fields: Union[Iterable[str], None], allowed: List[str]
+) -> List[str]:
+    """
+    the fields of a sparse fieldset in the order of allowed, all of them
+    when none is given. the first allowed field, the id, is always
+    selected and unknown fields are rejected
+    """
+    if not fields:
+        return list(allowed)
+    requested = {ele.strip() for ele in fields if ele.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(
+            "Unknown fields %s, allowed: %s"
+            % (", ".join(sorted(unknown)), ", ".join(allowed))
+        )
+    requested.add(allowed[0])
+    return [ele for ele in allowed if ele in requested]
+
+
+async def stream_query(
+    raw_sql: str,
+    params: list,
+    batch_size: int,
+    conn_name: str = TORTOISE_DEFAULT_CONN_NAME,
+) -> AsyncIterator[List[dict]]:
+    """
+    the rows of raw_sql batch_size at a time from a server-side cursor,
+    only one batch is in memory. the cursor lives in a read-only
+    repeatable read transaction, a consistent snapshot holding one pooled
+    connection until the last batch is read
+    """
+    client = Tortoise.get_connection(conn_name)
+    async with client.acquire_connection() as connection:
+        async with connection.transaction(
+            isolation="repeatable_read", readonly=True
+        ):
+            cursor = await connection.cursor(raw_sql, *params)
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+
+
+async def get_list_version(queryset: QuerySet) -> ListVersion:
+    """
+    version marker of a list: number and latest modified of its rows,
+    one aggregate instead of the list queries
+    """
+    (row,) = await queryset.annotate(
+        total=Count("id"), last_modified=Max("modified")
+    ).values("total", "last_modified")
+    return ListVersion(**row)
+
+
+_RAND_B_MASK = (1 << 62) - 1
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7_batch(count: int) -> List[uuid.UUID]:
+    """
+    time-ordered UUIDv7 (RFC 9562) keys, generated count at a time:
+    one clock read and one urandom call per batch, the 12 bits of rand_a
+    hold a counter so keys stay ascending inside the same millisecond
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    now_ms = time.time_ns() // 1_000_000
+    if now_ms > _uuid7_last_ms:
+        _uuid7_last_ms, _uuid7_counter = now_ms, 0
+
+    random_bytes = os.urandom(8 * count)
+    res = []
+    for i in range(count):
+        if _uuid7_counter > 0xFFF:
+            # counter exhausted, borrow the next millisecond
+            _uuid7_last_ms, _uuid7_counter = _uuid7_last_ms + 1, 0
+        rand_b = (
+            int.from_bytes(random_bytes[i * 8 : i * 8 + 8], "big")
+            & _RAND_B_MASK
+        )
+        res.append(
+            uuid.UUID(
+                int=_uuid7_last_ms << 80
+                | 0x7 << 76
+                | _uuid7_counter << 64
+                | 0b10 << 62
+                | rand_b
+            )
+        )
+        _uuid7_counter += 1
     return res
+
+
+def uuid7() -> uuid.UUID:
+    return uuid7_batch(1)[0]
+
+
+def retry_moved_rows(attempts: int = _MOVED_ROW_ATTEMPTS):
+    """
+    run the decorated transaction again when postgres aborted it because
+    a row it updates or locks was moved to another partition meanwhile.
+    purchase_item_entity is partitioned by status, a concurrent auto-fill
+    or stock-take moves the entities it takes. put it above the
+    transaction decorator, each run is a new transaction
+    """
+
+    def wrapper(func):
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return await func(*args, **kwargs)
+                except asyncpg.exceptions.SerializationError as e:
+                    if attempt == attempts:
+                        raise
+                    logger.warning(
+                        "[%s] attempt %s aborted, error: %s"
+                        % (func.__qualname__, attempt, e)
+                    )
+
+        return wrapped
+
+    return wrapper
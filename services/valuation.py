@@ -0,0 +1,383 @@
+"""
+inventory valuation
+
+auto-fill links every sold unit to an entity, oldest purchase first, and
+the entity to its purchase item, so the FIFO cost of a sold unit is the
+price of that purchase item:
+
+- cost of goods sold: the links created since the last run are costed in
+  batches and added to sale_order_item_cost, one row per sale order item.
+  the batch and the move of the (xact_id, created, id) mark in
+  valuation_cursor commit together, under a lock on the mark, so a link
+  is costed once whatever the crashes and the concurrent runs. like the
+  Parquet export, only the links of transactions older than the xmin of
+  the current snapshot are read, a late commit can't land below the mark
+- stock value: the AVAILABLE entities are the layers left, grouped per
+  purchase item on the shards and priced on the default connection
+
+the links of a cancelled order are deleted with the order's cancellation,
+its costed rows stay but are left out of the cost of goods
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from models import (
+    EntityStockStatusType,
+    SaleOrderStatusType,
+    ValuationCursorModel,
+)
+from pydantic import BaseModel
+from services.location import query_locations
+from services.logger import logger
+from services.report import copy_frame, to_frame
+from services.sharding import fan_out, group_by_shard
+from services.utils import created_between
+from settings import TORTOISE_DEFAULT_CONN_NAME, VALUATION_BATCH_SIZE
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+_COGS_CURSOR = "cost_of_goods"
+_START_CREATED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_START_ID = uuid.UUID(int=0)
+_KEY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+# $1, $2, $3 the mark, $4 the batch size. the links of delivered orders
+# may have been archived already
+_LINK_BATCH_SQL = """
+    SELECT link.xact_id, link.id, link.created, link.sale_order_item_id,
+        link.purchase_item_entity_id, soi.product_id
+    FROM %s link
+    INNER JOIN sale_order_item soi ON soi.id = link.sale_order_item_id
+    WHERE link.xact_id >= $1
+        AND (link.xact_id, link.created, link.id) > ($1, $2, $3)
+        AND link.xact_id < (
+            SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+        )
+    ORDER BY link.xact_id, link.created, link.id
+    LIMIT $4
+    """
+_LINKS_SQL = """
+    (%s) UNION ALL (%s)
+    ORDER BY xact_id, created, id
+    LIMIT $4
+    """ % (
+    _LINK_BATCH_SQL % "sale_order_item_entity",
+    _LINK_BATCH_SQL % "sale_order_item_entity_archive",
+)
+_ENTITIES_SQL = """
+    SELECT id, purchase_item_id FROM purchase_item_entity
+    WHERE id = ANY($1::uuid[])
+    UNION ALL
+    SELECT id, purchase_item_id FROM purchase_item_entity_archive
+    WHERE id = ANY($1::uuid[])
+    """
+# the links of a batch are added to what earlier batches costed
+_COST_UPSERT_SQL = """
+    INSERT INTO sale_order_item_cost (
+        sale_order_id, sale_order_item_id, product_id, sku, units, cost
+    )
+    SELECT soi.sale_order_id, soi.id, soi.product_id, soi.sku,
+        COUNT(*), SUM(pi.price)
+    FROM unnest($1::uuid[], $2::uuid[])
+        AS link(sale_order_item_id, purchase_item_id)
+    INNER JOIN sale_order_item soi ON soi.id = link.sale_order_item_id
+    INNER JOIN purchase_item pi ON pi.id = link.purchase_item_id
+    GROUP BY soi.id
+    ON CONFLICT (sale_order_item_id) DO UPDATE SET
+        units = sale_order_item_cost.units + EXCLUDED.units,
+        cost = sale_order_item_cost.cost + EXCLUDED.cost,
+        modified = now()
+    """
+_COST_OF_GOODS_SQL = """
+    SELECT soi.sale_order_id,
+        COALESCE(SUM(cost.units), 0)::int AS units,
+        COALESCE(SUM(cost.cost), 0)::bigint AS cost,
+        SUM(soi.price::bigint * soi.quantity)::bigint AS revenue
+    FROM sale_order so
+    INNER JOIN sale_order_item soi ON soi.sale_order_id = so.id
+    LEFT JOIN sale_order_item_cost cost ON cost.sale_order_item_id = soi.id
+    WHERE so.status <> $1 AND %s
+    GROUP BY soi.sale_order_id
+    ORDER BY soi.sale_order_id
+    """
+# $1 the status, $2 the locations, $3 the product_id or null, $4 the
+# skus or null
+_LAYERS_SQL = """
+    SELECT product_id, sku, purchase_item_id, COUNT(*) AS units
+    FROM purchase_item_entity
+    WHERE status = $1 AND location = ANY($2::varchar[])
+        AND ($3::uuid IS NULL OR product_id = $3::uuid)
+        AND ($4::varchar[] IS NULL OR sku = ANY($4::varchar[]))
+    GROUP BY product_id, sku, purchase_item_id
+    """
+_LAYERS_TYPES = {
+    "product_id": _KEY_TYPE,
+    "sku": _KEY_TYPE,
+    "purchase_item_id": pa.string(),
+    "units": pa.int64(),
+}
+_PRICES_SQL = """
+    SELECT id, price FROM purchase_item WHERE id = ANY($1::uuid[])
+    """
+_PRICES_TYPES = {"purchase_item_id": pa.string(), "price": pa.int64()}
+
+
+class ValuationRes(BaseModel):
+    costed_links: int
+    last_created: Union[datetime, None]
+    links_per_second: float
+
+
+class CostOfGoodsRow(BaseModel):
+    sale_order_id: int
+    # the units allocated by auto-fill, 0 while the order is a draft
+    units: int
+    cost: int
+    revenue: int
+
+
+class CostOfGoodsRes(BaseModel):
+    # the links created up to then are costed
+    costed_until: Union[datetime, None]
+    units: int
+    cost: int
+    revenue: int
+    results: List[CostOfGoodsRow]
+
+
+class StockValueRow(BaseModel):
+    product_id: uuid.UUID
+    sku: str
+    units: int
+    value: int
+    unit_cost: float
+
+
+class StockValueRes(BaseModel):
+    units: int
+    value: int
+    results: List[StockValueRow]
+
+
+class CostOfGoodsService:
+    """
+    cost the entity links created since the last run, the memory is
+    bounded by one batch whatever the backlog
+    """
+
+    def __init__(
+        self,
+        batch_size: int = VALUATION_BATCH_SIZE,
+    ):
+        self.batch_size = batch_size
+
+    async def run(self) -> ValuationRes:
+        await ValuationCursorModel.get_or_create(name=_COGS_CURSOR)
+        started = time.perf_counter()
+        costed_links = 0
+        while True:
+            async with in_transaction(TORTOISE_DEFAULT_CONN_NAME) as conn:
+                # a concurrent run waits here, then continues from our mark
+                cursor = (
+                    await ValuationCursorModel.select_for_update()
+                    .using_db(conn)
+                    .get(name=_COGS_CURSOR)
+                )
+                count = await self.cost_batch(conn, cursor)
+            costed_links += count
+            if count < self.batch_size:
+                break
+
+        elapsed = time.perf_counter() - started
+        return ValuationRes(
+            costed_links=costed_links,
+            last_created=cursor.last_created,
+            links_per_second=costed_links / elapsed if elapsed else 0,
+        )
+
+    async def cost_batch(self, conn, cursor: ValuationCursorModel) -> int:
+        """
+        return the number of links read
+        """
+        _, links = await conn.execute_query(
+            _LINKS_SQL,
+            [
+                cursor.last_xact_id,
+                cursor.last_created or _START_CREATED,
+                cursor.last_id or _START_ID,
+                self.batch_size,
+            ],
+        )
+        if not links:
+            return 0
+
+        purchase_items = await self.purchase_items(links)
+        costed = [
+            ele
+            for ele in links
+            if ele["purchase_item_entity_id"] in purchase_items
+        ]
+        if len(costed) < len(links):
+            logger.warning(
+                "[%s] %s links without entity"
+                % (self.__class__.__name__, len(links) - len(costed))
+            )
+        await conn.execute_query(
+            _COST_UPSERT_SQL,
+            [
+                [ele["sale_order_item_id"] for ele in costed],
+                [
+                    purchase_items[ele["purchase_item_entity_id"]]
+                    for ele in costed
+                ],
+            ],
+        )
+        cursor.last_xact_id = links[-1]["xact_id"]
+        cursor.last_created = links[-1]["created"]
+        cursor.last_id = links[-1]["id"]
+        cursor.processed_rows += len(links)
+        await cursor.save(
+            using_db=conn,
+            update_fields=[
+                "last_xact_id",
+                "last_created",
+                "last_id",
+                "processed_rows",
+                "modified",
+            ],
+        )
+        logger.info(
+            "[%s] %s links costed, cursor %s"
+            % (
+                self.__class__.__name__,
+                cursor.processed_rows,
+                cursor.last_created,
+            )
+        )
+        return len(links)
+
+    @classmethod
+    async def purchase_items(
+        cls, links: List[dict]
+    ) -> Dict[uuid.UUID, uuid.UUID]:
+        """
+        the purchase item of the entity of every link, live or archived
+        """
+        links_by_shard = group_by_shard(links, lambda ele: ele["product_id"])
+        results = await fan_out(
+            lambda shard: Tortoise.get_connection(shard).execute_query(
+                _ENTITIES_SQL,
+                [
+                    [
+                        ele["purchase_item_entity_id"]
+                        for ele in links_by_shard[shard]
+                    ]
+                ],
+            ),
+            links_by_shard,
+        )
+        return {
+            ele["id"]: ele["purchase_item_id"]
+            for _, shard_values in results.values()
+            for ele in shard_values
+        }
+
+
+async def get_cost_of_goods(
+    sale_order_ids: Union[List[int], None] = None,
+    created_from: Union[datetime, None] = None,
+    created_to: Union[datetime, None] = None,
+) -> CostOfGoodsRes:
+    """
+    cost of goods sold and revenue of the sale orders, given by id or
+    created in [created_from, created_to), cancelled ones excluded
+    """
+    params: list = [SaleOrderStatusType.CANCELLED.value]
+    if sale_order_ids:
+        params.append(sale_order_ids)
+        conditions = [f"so.id = ANY(${len(params)}::int[])"]
+    else:
+        conditions = created_between(
+            "so.created", created_from, created_to, params
+        )
+    if not conditions:
+        raise ValueError("sale_order_ids or created_from must be provided")
+
+    conn = Tortoise.get_connection(TORTOISE_DEFAULT_CONN_NAME)
+    _, list_values = await conn.execute_query(
+        _COST_OF_GOODS_SQL % " AND ".join(conditions), params
+    )
+    cursor = await ValuationCursorModel.get_or_none(name=_COGS_CURSOR)
+    return CostOfGoodsRes(
+        costed_until=cursor.last_created if cursor else None,
+        units=sum(ele["units"] for ele in list_values),
+        cost=sum(ele["cost"] for ele in list_values),
+        revenue=sum(ele["revenue"] for ele in list_values),
+        results=[CostOfGoodsRow(**ele) for ele in list_values],
+    )
+
+
+def stock_value_frame(
+    layers: pd.DataFrame, prices: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    units, value and average unit cost per (product_id, sku) of the
+    layers, one row per purchase item still in stock
+    """
+    frame = layers.merge(prices, on="purchase_item_id", how="left")
+    frame["value"] = frame["units"] * frame["price"].fillna(0).astype(np.int64)
+    frame = (
+        frame.groupby(["product_id", "sku"], observed=True)[["units", "value"]]
+        .sum()
+        .reset_index()
+    )
+    frame["unit_cost"] = frame["value"] / frame["units"]
+    frame["product_id"] = frame["product_id"].astype(str)
+    frame["sku"] = frame["sku"].astype(str)
+    return frame.sort_values(["product_id", "sku"], ignore_index=True)
+
+
+async def get_stock_value(
+    product_id: Union[uuid.UUID, None] = None,
+    skus: Union[List[str], None] = None,
+    location: Union[str, None] = None,
+) -> StockValueRes:
+    """
+    value at purchase price of the available entities, of one location or
+    all of them, of a product or skus or the whole catalog
+    """
+    params = [
+        EntityStockStatusType.AVAILABLE.value,
+        query_locations(location),
+        str(product_id) if product_id else None,
+        list(skus) if skus else None,
+    ]
+    tables = await fan_out(
+        lambda shard: copy_frame(shard, _LAYERS_SQL, params, _LAYERS_TYPES)
+    )
+    layers = to_frame(list(tables.values()))
+    prices = to_frame(
+        [
+            await copy_frame(
+                TORTOISE_DEFAULT_CONN_NAME,
+                _PRICES_SQL,
+                [layers["purchase_item_id"].unique().tolist()],
+                _PRICES_TYPES,
+            )
+        ]
+    )
+    frame = await asyncio.to_thread(stock_value_frame, layers, prices)
+    return StockValueRes(
+        units=int(frame["units"].sum()),
+        value=int(frame["value"].sum()),
+        results=[
+            StockValueRow(**ele) for ele in frame.to_dict(orient="records")
+        ],
+    )
@@ -1,6 +1,5 @@
 import os
 
-import asyncpg
 from dotenv import load_dotenv
 
 #
@@ -14,13 +13,41 @@ ENABLED_TLS: bool = os.environ.get("ENABLED_TLS", "False") in [
 VERSION = os.environ.get("BUILD_VERSION", "1")
 LISTEN_ADDRESS = os.environ.get("LISTEN_ADDRESS", "0.0.0.0")
 GRPC_PORT = os.environ.get("GRPC_PORT", "50051")
+# seconds the in-flight calls get to finish on SIGTERM
+GRPC_SHUTDOWN_GRACE = int(os.environ.get("GRPC_SHUTDOWN_GRACE", "10"))
+# server_combined.py: the HTTP port next to GRPC_PORT, and uvloop as the
+# event loop when installed
+HTTP_PORT = os.environ.get("HTTP_PORT", "8000")
+UVLOOP_ENABLED: bool = os.environ.get("UVLOOP_ENABLED", "False") in [
+    "True",
+    "true",
+    "1",
+]
 #
 DATABASE_URI = os.environ.get("DATABASE_URI")
 TORTOISE_DEFAULT_CONN_NAME = os.environ.get(
     "TORTOISE_DEFAULT_CONN_NAME", "default"
 )
+# comma separated database uris the stock tables are sharded over,
+# see services/sharding.py, the default connection holds them when empty
+STOCK_SHARD_URIS = [
+    ele.strip()
+    for ele in os.environ.get("STOCK_SHARD_URIS", "").split(",")
+    if ele.strip()
+]
+# manageShards.py resolve leaves the prepared transactions younger than
+# this alone, they may still be committing
+SHARD_RESOLVE_GRACE_SECONDS = int(
+    os.environ.get("SHARD_RESOLVE_GRACE_SECONDS", "300")
+)
+STOCK_SHARD_CONN_NAMES = [
+    f"stock_shard_{i}" for i in range(len(STOCK_SHARD_URIS))
+] or [TORTOISE_DEFAULT_CONN_NAME]
 TORTOISE_ORM = {
-    "connections": {TORTOISE_DEFAULT_CONN_NAME: DATABASE_URI},
+    "connections": {
+        TORTOISE_DEFAULT_CONN_NAME: DATABASE_URI,
+        **{f"stock_shard_{i}": uri for i, uri in enumerate(STOCK_SHARD_URIS)},
+    },
     "apps": {
         "inventory": {
             "models": [
@@ -32,7 +59,114 @@ TORTOISE_ORM = {
         },
     },
 }
+# initial batch size of bulk inserts, adapted per model afterwards
 CHUNK_SIZE = int(os.environ.get("CHUNK_SIZE", "5000"))
+BULK_TARGET_LATENCY_MS = int(os.environ.get("BULK_TARGET_LATENCY_MS", "200"))
+BULK_MIN_BATCH_SIZE = int(os.environ.get("BULK_MIN_BATCH_SIZE", "100"))
+# max ids handed out by one id allocation call
+ID_BLOCK_MAX_SIZE = int(os.environ.get("ID_BLOCK_MAX_SIZE", "10000"))
+# comma separated stock locations (warehouses), the first one is the
+# default, a location can be added but not removed once stock is in it
+STOCK_LOCATIONS = [
+    ele.strip()
+    for ele in os.environ.get("STOCK_LOCATIONS", "default").split(",")
+    if ele.strip()
+]
+DEFAULT_LOCATION = STOCK_LOCATIONS[0]
+# drafts confirmed by one bulk auto-fill when no sale ids are given
+AUTO_FILL_BATCH_LIMIT = int(os.environ.get("AUTO_FILL_BATCH_LIMIT", "1000"))
+# streaming purchase import
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", "100"))
+IMPORT_MAX_LINE_LENGTH = int(os.environ.get("IMPORT_MAX_LINE_LENGTH", "65536"))
+# counts loaded per statement by a stock-take
+STOCK_TAKE_LOAD_CHUNK_SIZE = int(
+    os.environ.get("STOCK_TAKE_LOAD_CHUNK_SIZE", "10000")
+)
+# sale orders moved to a new status per transaction
+SALE_ORDER_TRANSITION_BATCH_SIZE = int(
+    os.environ.get("SALE_ORDER_TRANSITION_BATCH_SIZE", "1000")
+)
+# group commit of concurrent CreateSaleOrder calls
+GROUP_COMMIT_ENABLED: bool = os.environ.get(
+    "GROUP_COMMIT_ENABLED", "False"
+) in ["True", "true", "1"]
+GROUP_COMMIT_MAX_DELAY_MS = int(
+    os.environ.get("GROUP_COMMIT_MAX_DELAY_MS", "5")
+)
+GROUP_COMMIT_MAX_BATCH_SIZE = int(
+    os.environ.get("GROUP_COMMIT_MAX_BATCH_SIZE", "100")
+)
+# reject sale orders above the in-memory stock counters
+STOCK_CHECK_ENABLED: bool = os.environ.get("STOCK_CHECK_ENABLED", "False") in [
+    "True",
+    "true",
+    "1",
+]
+STOCK_RECONCILE_INTERVAL = int(
+    os.environ.get("STOCK_RECONCILE_INTERVAL", "60")
+)
+# WatchQuantity streams, stock changes are sent to watchers at most once
+# per interval
+STOCK_WATCH_ENABLED: bool = os.environ.get("STOCK_WATCH_ENABLED", "False") in [
+    "True",
+    "true",
+    "1",
+]
+STOCK_WATCH_INTERVAL_MS = int(
+    os.environ.get("STOCK_WATCH_INTERVAL_MS", "1000")
+)
+STOCK_WATCH_MAX_KEYS = int(os.environ.get("STOCK_WATCH_MAX_KEYS", "1000"))
+# ledger compaction
+LEDGER_RETENTION_DAYS = int(os.environ.get("LEDGER_RETENTION_DAYS", "30"))
+LEDGER_COMPACTION_BATCH_SIZE = int(
+    os.environ.get("LEDGER_COMPACTION_BATCH_SIZE", "500")
+)
+# archival of the entities of delivered sale orders
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_THROTTLE_MS = int(os.environ.get("ARCHIVE_THROTTLE_MS", "100"))
+# incremental Parquet export of the ledger and the order items
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "exports")
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "10000"))
+# rows fetched at a time from the cursor of /purchases/export/ and
+# /sale-orders/export/
+EXPORT_STREAM_BATCH_SIZE = int(
+    os.environ.get("EXPORT_STREAM_BATCH_SIZE", "1000")
+)
+# sales and stock reports of /reports/ and salesReport.py: the default
+# and the longest window in days. a window ending before today is final
+# and cached until evicted, the others for REPORT_CACHE_SECONDS
+REPORT_DEFAULT_DAYS = int(os.environ.get("REPORT_DEFAULT_DAYS", "28"))
+REPORT_MAX_DAYS = int(os.environ.get("REPORT_MAX_DAYS", "366"))
+REPORT_CACHE_SECONDS = int(os.environ.get("REPORT_CACHE_SECONDS", "300"))
+REPORT_CACHE_MAX_ENTRIES = int(
+    os.environ.get("REPORT_CACHE_MAX_ENTRIES", "64")
+)
+# entity links costed per transaction by valuateStock.py
+VALUATION_BATCH_SIZE = int(os.environ.get("VALUATION_BATCH_SIZE", "10000"))
+# monthly partitions of inventory_transaction created in advance
+LEDGER_PARTITION_MONTHS_AHEAD = int(
+    os.environ.get("LEDGER_PARTITION_MONTHS_AHEAD", "3")
+)
+# response compression negotiated with the clients, smaller responses are
+# sent as is, see benchmarkCompression.py to choose the thresholds,
+# GRPC_COMPRESSION is gzip, deflate or none
+GRPC_COMPRESSION = os.environ.get("GRPC_COMPRESSION", "gzip")
+GRPC_COMPRESSION_MIN_SIZE = int(
+    os.environ.get("GRPC_COMPRESSION_MIN_SIZE", "1024")
+)
+HTTP_GZIP_ENABLED: bool = os.environ.get("HTTP_GZIP_ENABLED", "True") in [
+    "True",
+    "true",
+    "1",
+]
+HTTP_GZIP_MIN_SIZE = int(os.environ.get("HTTP_GZIP_MIN_SIZE", "1024"))
+HTTP_GZIP_LEVEL = int(os.environ.get("HTTP_GZIP_LEVEL", "1"))
+# Cache-Control max-age of the purchase items, they never change
+PURCHASE_ITEMS_MAX_AGE = int(
+    os.environ.get("PURCHASE_ITEMS_MAX_AGE", "31536000")
+)
 
 
 def _load_credential_from_file(filepath):
@@ -63,14 +197,3 @@ if ENABLED_TLS is True:
         SERVER_CERTIFICATE_KEY_FILE_PATH
     )
     ROOT_CERTIFICATE = _load_credential_from_file(ROOT_CERTIFICATE_FILE_PATH)
-
-
-async def check_db_connection(uri: str) -> bool:
-    try:
-        connection = await asyncpg.connect(uri)
-        connection.get_settings()
-        await connection.close()
-        return True
-    except Exception as error:
-        print(error)
-        return False
@@ -0,0 +1,44 @@
+"""_summary_ command to cost the sold entities at their purchase price
+    the entity links created since the last run are added to
+    sale_order_item_cost, read by /valuation/cost-of-goods/, an
+    interrupted run continues from the last committed batch, the links of
+    transactions still open wait for the next run
+
+    python valuateStock.py [--batch-size 10000] [--interval 0]
+"""
+
+import argparse
+import asyncio
+
+import settings
+from services.valuation import CostOfGoodsService
+from tortoise import Tortoise, run_async
+
+
+async def main(batch_size: int, interval: int):
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    handler = CostOfGoodsService(batch_size=batch_size)
+    while True:
+        res = await handler.run()
+        print(
+            f"{res.costed_links} links costed, "
+            f"{res.links_per_second:.0f} links/s, up to {res.last_created}"
+        )
+        if not interval:
+            break
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.VALUATION_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=0,
+        help="seconds between runs, run once when 0",
+    )
+    args = parser.parse_args()
+    run_async(main(args.batch_size, args.interval))